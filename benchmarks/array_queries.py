@@ -0,0 +1,171 @@
+"""Plans and timings of tag searches with the array lookups of utils.fields, against the SQL
+they replace, without an index, with a GIN index and with a GIN index on array_lowercase,
+on a local PostgreSQL. Exits with status 1 if a lookup misses its index.
+
+    PGDATABASE=bench python benchmarks/array_queries.py [rows]
+
+Connects with the usual PG* environment variables. Creates and drops the table
+bench_tagged and the array_lowercase functions; rows defaults to 2 million. Articles
+have 1 to 8 tags in mixed case out of 5000, the first ones much more frequent.
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import json
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure(
+    USE_TZ=True,
+    INSTALLED_APPS=['django.contrib.contenttypes', 'utils'],
+    DATABASES={'default': {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': os.environ.get('PGDATABASE', 'bench'),
+        'USER': os.environ.get('PGUSER', ''),
+        'PASSWORD': os.environ.get('PGPASSWORD', ''),
+        'HOST': os.environ.get('PGHOST', ''),
+        'PORT': os.environ.get('PGPORT', ''),
+    }},
+)
+
+import django
+django.setup()
+
+from django.apps import apps
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection, models
+from django.db.migrations.state import ProjectState
+from django.utils import six
+
+from utils.fields import UUIDField
+from utils.operations import ArrayLowercaseFunction, CreateGinIndex
+
+
+class Tagged(models.Model):
+    ref = UUIDField(db_index=True)
+    tags = ArrayField(models.CharField(max_length=40))
+
+    class Meta:
+        app_label = 'utils'
+        db_table = 'bench_tagged'
+
+
+REFS = [uuid.UUID(int=n) for n in range(1, 101)]
+REFS_SQL = 'ARRAY[%s]::uuid[]' % ', '.join("'%s'" % ref for ref in REFS)
+
+# name, lookup, the SQL it replaces, and from which index on the lookup has to use one
+QUERIES = (
+    ('all tag42', lambda: Tagged.objects.filter(tags__all='tag42'),
+     "tags @> ARRAY['tag42']", 'gin'),
+    ('all tag42, tag7', lambda: Tagged.objects.filter(tags__all=['tag42', 'tag7']),
+     "tags @> ARRAY['tag42', 'tag7']", 'gin'),
+    ('any of 3 rare tags', lambda: Tagged.objects.filter(tags__any=['tag4000', 'tag4001', 'tag4002']),
+     "tags && ARRAY['tag4000', 'tag4001', 'tag4002']", 'gin'),
+    ('lowercase all Tag42', lambda: Tagged.objects.filter(tags__array_lowercase__all='Tag42'),
+     "array_lowercase(tags) @> ARRAY['tag42']", 'lower_gin'),
+    ('lowercase any 3 rare', lambda: Tagged.objects.filter(
+        tags__array_lowercase__any=['TAG4000', 'Tag4001', 'tag4002']),
+     "array_lowercase(tags) && ARRAY['tag4000', 'tag4001', 'tag4002']", 'lower_gin'),
+    ('ref contained_by 100', lambda: Tagged.objects.filter(ref__contained_by=REFS),
+     'ARRAY[ref] <@ %s' % REFS_SQL, 'none'),
+)
+STAGES = ('none', 'gin', 'lower_gin')
+
+
+def run(operation, state):
+    with connection.schema_editor() as editor:
+        operation.database_forwards('utils', editor, state, state)
+
+
+def undo(operation, state):
+    with connection.schema_editor() as editor:
+        operation.database_backwards('utils', editor, state, state)
+
+
+def load(rows, cursor):
+    cursor.execute("SELECT setseed(0)")
+    cursor.execute("""
+        INSERT INTO bench_tagged (ref, tags)
+        SELECT md5(n::text)::uuid, ARRAY(
+            SELECT CASE WHEN random() < 0.5 THEN 'Tag' ELSE 'tag' END || (power(random(), 3) * 5000)::int
+            FROM generate_series(1, 1 + n %% 8))
+        FROM generate_series(1, %s) n
+    """, [rows])
+    cursor.execute("UPDATE bench_tagged SET ref = %s WHERE id <= 100", [REFS[0]])
+    cursor.execute("ANALYZE bench_tagged")
+
+
+def scans(plan):
+    """Scan nodes of an EXPLAIN plan, e.g. 'Bitmap Index Scan on bench_tagged_tags_gin'."""
+    found = []
+    if 'Scan' in plan['Node Type']:
+        found.append(plan['Node Type'] + (' on %s' % plan['Index Name'] if 'Index Name' in plan else ''))
+    for child in plan.get('Plans', ()):
+        found.extend(scans(child))
+    return found
+
+
+def explain(sql, params, cursor):
+    cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, params)
+    result = cursor.fetchone()[0]
+    result = (json.loads(result) if isinstance(result, six.string_types) else result)[0]
+    return result['Plan']['Actual Rows'], result['Execution Time'], scans(result['Plan'])
+
+
+def report(stage, title, cursor):
+    """Prints the plans at ``stage``, returns the names of the lookups that should have used an index but didn't."""
+    print()
+    print(title)
+    missed = []
+    for name, query, legacy, indexed_from in QUERIES:
+        sql, params = query().query.sql_with_params()
+        for label, (rows, elapsed, plan) in (('lookup', explain(sql, params, cursor)),
+                                             ('before', explain('SELECT * FROM bench_tagged WHERE ' + legacy, [],
+                                                                cursor))):
+            indexed = any('Index' in node for node in plan)
+            if label == 'lookup' and STAGES.index(stage) >= STAGES.index(indexed_from) and not indexed:
+                missed.append(name)
+            print('%-22s %-6s %8d rows %10.1f ms   %s' % (name, label, rows, elapsed, ', '.join(plan)))
+    return missed
+
+
+def main(rows=2 * 10 ** 6):
+    rows = int(rows)
+    state = ProjectState.from_apps(apps)
+    with connection.schema_editor() as editor:
+        editor.create_model(Tagged)
+    function = ArrayLowercaseFunction()
+    missed = []
+    try:
+        run(function, state)
+        cursor = connection.cursor()
+        start = time.time()
+        load(rows, cursor)
+        print('loaded %d articles in %.1fs' % (rows, time.time() - start))
+        missed += report('none', 'btree on ref only', cursor)
+
+        for stage, operation in (('gin', CreateGinIndex('tagged', ['tags'])),
+                                 ('lower_gin', CreateGinIndex('tagged', ['tags'], lowercase=True))):
+            start = time.time()
+            run(operation, state)
+            cursor.execute('ANALYZE bench_tagged')
+            cursor.execute("SELECT pg_size_pretty(pg_relation_size(%s))", [operation.index(Tagged)[0]])
+            missed += report(stage, '%s, built in %.1fs, %s' % (operation.describe(), time.time() - start,
+                                                                cursor.fetchone()[0]), cursor)
+    finally:
+        with connection.schema_editor() as editor:
+            editor.delete_model(Tagged)
+            undo(function, state)
+    if missed:
+        print()
+        print('no index used by: %s' % ', '.join(sorted(set(missed))))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,55 @@
+"""Cost of building a fragment cache key with the old template_cache_key against utils.cachekeys.
+
+    python benchmarks/cachekeys.py
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import hashlib
+import timeit
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+
+import django
+django.setup()
+
+from django.utils.http import urlquote
+
+from utils.cachekeys import KeyBuilder, hasher
+
+VARY_ON = ('12345', 'fr', datetime.datetime(2016, 5, 4, 12, 30).isoformat(), 'list/page/3/')
+
+
+def legacy_key(fragment_name, *vary_on):
+    args = hashlib.md5(':'.join([urlquote(var) for var in vary_on]).encode('utf-8'))
+    return 'template.cache.%s.%s' % (fragment_name, args.hexdigest())
+
+
+def main():
+    builders = [('legacy template_cache_key', legacy_key)]
+    builders.append(('compat', KeyBuilder(compat=True, memo_size=0).fragment_key))
+    builders.append(('compat, memoized', KeyBuilder(compat=True).fragment_key))
+    for name in ('md5', 'blake2b', 'xxhash'):
+        try:
+            hasher(name)
+        except Exception as e:
+            print('%-28s skipped: %s' % (name, e))
+            continue
+        builders.append((name, KeyBuilder(name, compat=False, memo_size=0).fragment_key))
+        builders.append((name + ', memoized', KeyBuilder(name, compat=False).fragment_key))
+
+    print('%-28s %12s' % ('', 'us per key'))
+    for name, build in builders:
+        number = 100000
+        elapsed = min(timeit.repeat(lambda: build('item_card', *VARY_ON), number=number, repeat=3))
+        print('%-28s %12.2f' % (name, elapsed / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Cost of CookieAllowlistMiddleware against the StripCookieMiddleware regex on a realistic 4 KB cookie header.
+
+    python benchmarks/cookies.py
+"""
+from __future__ import print_function
+
+import os
+import sys
+import random
+import string
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure(
+    INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.sites', 'django.contrib.redirects'],
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+)
+
+import django
+django.setup()
+
+from utils.middleware import CookieAllowlistMiddleware, StripCookieMiddleware
+
+TRACKING_COOKIES = ['__utma', '__utmb', '__utmc', '__utmz', '__utmv', '_ga', '_gid', '_gat', '_fbp', '__qca',
+                    'optimizelyEndUserId', 'optimizelySegments', 'optimizelyBuckets', '_hjid', 'ajs_user_id',
+                    'ajs_anonymous_id', 'mp_mixpanel', '__stripe_mid', 'intercom-id', 'AMCV_adobe']
+
+
+def random_value(rng, length):
+    return ''.join(rng.choice(string.ascii_letters + string.digits + '.%-_') for _ in range(length))
+
+
+def cookie_header(rng, size=4096, session=True):
+    cookies = []
+    if session:
+        cookies.append('sessionid=' + random_value(rng, 32))
+        cookies.append('csrftoken=' + random_value(rng, 32))
+    while len('; '.join(cookies)) < size:
+        cookies.append('%s=%s' % (rng.choice(TRACKING_COOKIES), random_value(rng, rng.randint(20, 300))))
+    rng.shuffle(cookies)
+    return '; '.join(cookies)[:size]
+
+
+class Request(object):
+    def __init__(self, cookie):
+        self.META = {'HTTP_COOKIE': cookie}
+
+
+def main(number=20000):
+    rng = random.Random(1)
+    headers = [('logged in', cookie_header(rng)), ('anonymous', cookie_header(rng, session=False))]
+    for name, middleware in (('strip regex', StripCookieMiddleware()), ('allowlist', CookieAllowlistMiddleware())):
+        for label, header in headers:
+            seconds = timeit.timeit(lambda: middleware.process_request(Request(header)), number=number)
+            request = Request(header)
+            middleware.process_request(request)
+            print("%-12s %-10s %7.2f us/request, %4d bytes left" % (
+                name, label, seconds / number * 1e6, len(request.META['HTTP_COOKIE'])))
+    print(CookieAllowlistMiddleware.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""The json template filter and JSONRestEncoderForHTML before and after utils.encoders,
+on large payloads embedded in a page.
+
+    python benchmarks/encoders.py
+
+The payloads are lists of article records as views embed them for the front end:
+HTML bodies, Decimals, UUIDs, aware datetimes, nested tag lists.
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import decimal
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure(USE_TZ=True)
+
+import django
+django.setup()
+
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from utils import encoders
+
+try:
+    from simplejson.encoder import JSONEncoderForHTML
+except ImportError:
+    JSONEncoderForHTML = None
+
+WORDS = 'the of and to in is that for it as was with market council weather football election festival'.split()
+
+
+def record(rng, n):
+    body = ' '.join('<p>%s & <a href="/news/%d/">%s</a></p>' % (' '.join(rng.choice(WORDS) for _ in range(30)),
+                                                              rng.randint(1, 99999), rng.choice(WORDS))
+                    for _ in range(rng.randint(1, 4)))
+    return {
+        'id': n,
+        'uuid': uuid.UUID(int=rng.getrandbits(128)),
+        'title': ' '.join(rng.choice(WORDS) for _ in range(8)).capitalize(),
+        'body': body,
+        'price': decimal.Decimal('%d.%02d' % (rng.randint(0, 999), rng.randint(0, 99))),
+        'published': datetime.datetime(2016, 1, 1, tzinfo=timezone.utc) + datetime.timedelta(seconds=rng.randint(0, 10 ** 7)),
+        'tags': [rng.choice(WORDS) for _ in range(rng.randint(0, 6))],
+        'score': rng.random(),
+        'visible': rng.random() < 0.9,
+    }
+
+
+def timed(func, obj, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.time()
+        func(obj)
+        best = min(best, time.time() - start)
+    return best
+
+
+def legacy_filter(obj):
+    # the old filter was json.dumps(obj), which can't encode these types at all and didn't escape
+    return json.dumps(obj, cls=JSONEncoder)
+
+
+def main():
+    rng = random.Random(0)
+    candidates = [('json.dumps, unescaped (old filter)', legacy_filter)]
+    if JSONEncoderForHTML is not None:
+        legacy_html = type(str('LegacyJSONRestEncoderForHTML'), (JSONEncoderForHTML,), dict(JSONEncoder.__dict__))
+        candidates.append(('simplejson JSONRestEncoderForHTML', lambda obj: json.dumps(obj, cls=legacy_html)))
+    candidates.append(('JSONRestEncoderForHTML', lambda obj: json.dumps(obj, cls=encoders.JSONRestEncoderForHTML)))
+    for name in ('json', 'ujson', 'orjson'):
+        try:
+            candidates.append(('dumps(html=True), %s' % name, (lambda dumps: lambda obj: dumps(obj, True))(
+                encoders.backend(name))))
+        except Exception as e:
+            print('%-36s skipped: %s' % (name, e))
+
+    for count in (100, 1000, 10000, 50000):
+        obj = [record(rng, n) for n in range(count)]
+        size = len(encoders.dumps(obj))
+        print()
+        print('%d records, %.1f MB of JSON' % (count, size / 2 ** 20))
+        repeat = max(3, 1000 // count)
+        for name, func in candidates:
+            elapsed = timed(func, obj, repeat)
+            print('%-36s %9.1f ms %8.1f MB/s' % (name, elapsed * 1000, size / 2 ** 20 / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""textDiff against the original character loop tokenizer and difflib.SequenceMatcher,
+CachedDiffer on a revision history view, and peak memory of a 1 MB diff.
+
+    python benchmarks/htmldiff.py [revisions.jsonl]
+
+The corpus is a JSON lines file of {"name": ..., "a": html, "b": html} revision pairs,
+e.g. consecutive article revisions exported from the CMS. Without one, synthetic
+revision pairs are generated: articles of 20 KB to 200 KB with typical editor changes
+(reworded sentences, added and removed paragraphs, moved sections, a markup rewrite).
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import json
+import time
+import random
+import string
+import difflib
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.htmldiff import CachedDiffer, html2list, iterTextDiff, structuredDiff, textDiff
+
+WORDS = ('the of and to in is that for it as was with be by on not he this are or his from at which but have an they '
+         'you were her she there been one all we their has would when if so no what up out who them some could more '
+         'market council weather football election festival harbour museum railway').split()
+
+
+def legacy_html2list(x, b=0):
+    mode = 'char'
+    cur = ''
+    out = []
+    for c in x:
+        if mode == 'tag':
+            if c == '>':
+                cur += ']' if b else c
+                out.append(cur)
+                cur = ''
+                mode = 'char'
+            else:
+                cur += c
+        elif mode == 'char':
+            if c == '<':
+                out.append(cur)
+                cur = '[' if b else c
+                mode = 'tag'
+            elif c in string.whitespace:
+                out.append(cur + c)
+                cur = ''
+            else:
+                cur += c
+    out.append(cur)
+    return [t for t in out if t != '']
+
+
+def legacy_text_diff(a, b):
+    out = []
+    a, b = legacy_html2list(a), legacy_html2list(b)
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes():
+        if tag == 'replace':
+            out.append('<del class="diff modified">' + ''.join(a[i1:i2]) + '</del><ins class="diff modified">' +
+                       ''.join(b[j1:j2]) + '</ins>')
+        elif tag == 'delete':
+            out.append('<del class="diff">' + ''.join(a[i1:i2]) + '</del>')
+        elif tag == 'insert':
+            out.append('<ins class="diff">' + ''.join(b[j1:j2]) + '</ins>')
+        else:
+            out.append(''.join(b[j1:j2]))
+    return ''.join(out)
+
+
+def sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 25))]
+    if rng.random() < 0.2:
+        k = rng.randrange(len(words))
+        words[k] = '<a href="/news/%d/">%s</a>' % (rng.randint(1, 99999), words[k])
+    return ' '.join(words).capitalize() + '.'
+
+
+def paragraph(rng):
+    return '<p>%s</p>\n' % ' '.join(sentence(rng) for _ in range(rng.randint(2, 7)))
+
+
+def article(rng, size):
+    blocks = ['<h1>%s</h1>\n' % sentence(rng)]
+    while sum(map(len, blocks)) < size:
+        if rng.random() < 0.08:
+            blocks.append('<h2>%s</h2>\n' % sentence(rng))
+        else:
+            blocks.append(paragraph(rng))
+    return blocks
+
+
+def revise(rng, blocks, edits):
+    blocks = list(blocks)
+    for _ in range(edits):
+        k = rng.randrange(len(blocks))
+        kind = rng.random()
+        if kind < 0.5:
+            words = blocks[k].split(' ')
+            for _ in range(rng.randint(1, 4)):
+                words[rng.randrange(len(words))] = rng.choice(WORDS)
+            blocks[k] = ' '.join(words)
+        elif kind < 0.7:
+            blocks.insert(k, paragraph(rng))
+        elif kind < 0.85 and len(blocks) > 2:
+            del blocks[k]
+        else:
+            j = rng.randrange(len(blocks))
+            blocks.insert(j, blocks.pop(k))
+    return blocks
+
+
+def synthetic_corpus():
+    rng = random.Random(0)
+    corpus = []
+    for size in (20000, 100000, 200000):
+        blocks = article(rng, size)
+        for edits in (1, 10, 50):
+            corpus.append(('%dKB, %d edits' % (size // 1000, edits), ''.join(blocks), ''.join(revise(rng, blocks, edits))))
+        rewritten = [block.replace('<p>', '<p class="body">') if rng.random() < 0.5 else block for block in blocks]
+        corpus.append(('%dKB, markup rewrite' % (size // 1000), ''.join(blocks), ''.join(rewritten)))
+    return corpus
+
+
+def timed(func, *args, **kwargs):
+    start = time.time()
+    result = func(*args, **kwargs)
+    return time.time() - start, result
+
+
+def peak_memory(func, *args):
+    """Peak traced allocation in MB while func runs, and its time."""
+    tracemalloc.start()
+    start = time.time()
+    func(*args)
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20, elapsed
+
+
+def stream(a, b):
+    for chunk in iterTextDiff(a, b):
+        pass  # written to the response and dropped
+
+
+def main(path=None):
+    if path:
+        with open(path) as f:
+            corpus = [(row.get('name', str(n)), row['a'], row['b']) for n, row in enumerate(map(json.loads, f))]
+    else:
+        corpus = synthetic_corpus()
+
+    print('%-28s %10s %10s %10s %10s %12s' % ('pair', 'tokenize', 'legacy', 'tokenize', 'textDiff', 'max_time=.2'))
+    for name, a, b in corpus:
+        assert html2list(a) == legacy_html2list(a)
+        legacy_tokenize = timed(legacy_html2list, a)[0] + timed(legacy_html2list, b)[0]
+        tokenize = timed(html2list, a)[0] + timed(html2list, b)[0]
+        legacy = timed(legacy_text_diff, a, b)[0]
+        new = timed(textDiff, a, b)[0]
+        bounded = timed(textDiff, a, b, max_time=0.2)[0]
+        print('%-28s %9.3fs %9.3fs %9.3fs %9.3fs %11.3fs' % (name, legacy_tokenize, legacy, tokenize, new, bounded))
+
+    # a history view diffs every consecutive pair, and is viewed again after each new revision
+    rng = random.Random(1)
+    revisions = [article(rng, 200000)]
+    for _ in range(20):
+        revisions.append(revise(rng, revisions[-1], rng.randint(1, 5)))
+    revisions = [''.join(blocks) for blocks in revisions]
+    pairs = list(zip(revisions, revisions[1:]))
+    differ = CachedDiffer()
+    print()
+    print('history of %d revisions of a 200KB article' % len(revisions))
+    print('%-28s %10.3fs' % ('textDiff', timed(lambda: [textDiff(a, b) for a, b in pairs])[0]))
+    print('%-28s %10.3fs' % ('CachedDiffer, cold', timed(lambda: [differ.diff(a, b) for a, b in pairs])[0]))
+    print('%-28s %10.3fs' % ('CachedDiffer, warm', timed(lambda: [differ.diff(a, b) for a, b in pairs])[0]))
+
+    rng = random.Random(2)
+    blocks = article(rng, 1000000)
+    a, b = ''.join(blocks), ''.join(revise(rng, blocks, 20))
+    print()
+    print('1 MB article, 20 edits; the inputs themselves take %.1f MB' % ((len(a) + len(b)) / 2 ** 20))
+    print('%-28s %10s %10s' % ('', 'peak MB', 'time'))
+    for name, func in (('legacy textDiff', legacy_text_diff), ('textDiff', textDiff),
+                       ('iterTextDiff, streamed', stream), ('structuredDiff', structuredDiff)):
+        print('%-28s %10.1f %9.2fs' % ((name,) + peak_memory(func, a, b)))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,101 @@
+"""Per-request cost of PrivateBetaMiddleware.process_view, compared with the original implementation.
+
+    python benchmarks/privatebeta.py
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure(
+    USE_TZ=True,
+    INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.sites', 'django.contrib.redirects'],
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+    PRIVATEBETA_ALWAYS_ALLOW_MODULES=['account.views', 'pages.views', 'blog.feeds', 'api.public'],
+    PRIVATEBETA_NEVER_ALLOW_VIEWS=['account.views.delete'],
+    PRIVATEBETA_ALWAYS_ALLOW_VIEWS=['shop.views.landing'],
+    PRIVATEBETA_REDIRECT_URL='/beta/',
+    PRIVATEBETA_END_TIME=datetime.datetime(2100, 1, 1, tzinfo=datetime.timezone.utc),
+)
+
+import django
+django.setup()
+
+from django.http import HttpResponseRedirect
+from django.utils import timezone
+
+from utils.middleware import PrivateBetaMiddleware
+
+
+class LegacyPrivateBetaMiddleware(object):
+    """The implementation this benchmark compares against."""
+    def __init__(self):
+        self.enable_beta = getattr(settings, 'PRIVATEBETA_ENABLE_BETA', True)
+        self.beta_end_time = getattr(settings, 'PRIVATEBETA_END_TIME', None)
+        self.always_allow_modules = getattr(settings, 'PRIVATEBETA_ALWAYS_ALLOW_MODULES', [])
+        self.redirect_url = getattr(settings, 'PRIVATEBETA_REDIRECT_URL', '/')
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.path == self.redirect_url or request.user.is_authenticated() or not self.enable_beta or (self.beta_end_time and timezone.now() >= self.beta_end_time):
+            return
+        whitelisted_modules = ['django.contrib.auth.views', 'django.views.static', ]
+        if self.always_allow_modules:
+            whitelisted_modules += self.always_allow_modules
+        if '%s' % view_func.__module__ in whitelisted_modules:
+            return
+        else:
+            return HttpResponseRedirect(self.redirect_url)
+
+
+class User(object):
+    def __init__(self, authenticated):
+        self.authenticated = authenticated
+
+    def is_authenticated(self):
+        return self.authenticated
+
+
+class Request(object):
+    def __init__(self, path, authenticated=False):
+        self.path = path
+        self.user = User(authenticated)
+
+
+def make_view(module, name):
+    def view(request):
+        pass
+    view.__module__ = module
+    view.__name__ = name
+    return view
+
+
+CASES = [
+    ('anonymous, allowed module', Request('/blog/feed/'), make_view('blog.feeds', 'latest')),
+    ('anonymous, denied view', Request('/shop/'), make_view('shop.views', 'index')),
+    ('authenticated', Request('/shop/', True), make_view('shop.views', 'index')),
+]
+
+
+def main(number=200000):
+    middlewares = [('legacy', LegacyPrivateBetaMiddleware()), ('compiled', PrivateBetaMiddleware())]
+    for label, request, view in CASES:
+        for name, middleware in middlewares:
+            seconds = timeit.timeit(lambda: middleware.process_view(request, view, (), {}), number=number)
+            print("%-28s %-9s %6.0f ns/request" % (label, name, seconds / number * 1e9))
+
+    ended = PrivateBetaMiddleware()
+    ended.end_timestamp = 0
+    request, view = CASES[1][1:]
+    ended.process_view(request, view, (), {})
+    seconds = timeit.timeit(lambda: ended.process_view(request, view, (), {}), number=number)
+    print("%-28s %-9s %6.0f ns/request" % ('after PRIVATEBETA_END_TIME', 'compiled', seconds / number * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Plans and timings of the DateTimeRange lookups without an index, with GiST and with SP-GiST,
+and inserts under an exclusion constraint, on a local PostgreSQL.
+
+    PGDATABASE=bench python benchmarks/range_queries.py [rows]
+
+Connects with the usual PG* environment variables. Creates and drops the tables
+bench_booking and bench_booking_excl; rows defaults to 10 million, about 1 GB
+with the indexes. Bookings of 1 to 72 hours over 3 years, for 10000 rooms.
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import json
+import time
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure(
+    USE_TZ=True,
+    INSTALLED_APPS=['django.contrib.contenttypes', 'utils'],
+    DATABASES={'default': {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': os.environ.get('PGDATABASE', 'bench'),
+        'USER': os.environ.get('PGUSER', ''),
+        'PASSWORD': os.environ.get('PGPASSWORD', ''),
+        'HOST': os.environ.get('PGHOST', ''),
+        'PORT': os.environ.get('PGPORT', ''),
+    }},
+)
+
+import django
+django.setup()
+
+from django.apps import apps
+from django.db import IntegrityError, connection, models, transaction
+from django.db.migrations.state import ProjectState
+from django.utils import six, timezone
+from psycopg2.extras import DateTimeTZRange
+
+from utils.fields import DateTimeRange
+from utils.operations import AddExclusionConstraint, BtreeGistExtension, CreateGistIndex
+
+ROOMS = 10000
+START = datetime.datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+
+class Booking(models.Model):
+    room = models.IntegerField()
+    during = DateTimeRange()
+
+    class Meta:
+        app_label = 'utils'
+        db_table = 'bench_booking'
+
+
+class ExclusiveBooking(models.Model):
+    room = models.IntegerField()
+    during = DateTimeRange()
+
+    class Meta:
+        app_label = 'utils'
+        db_table = 'bench_booking_excl'
+
+
+def hours(start, end):
+    return DateTimeTZRange(START + datetime.timedelta(hours=start), START + datetime.timedelta(hours=end))
+
+
+QUERIES = (
+    ('contains a datetime', lambda: Booking.objects.filter(during__contains=START + datetime.timedelta(days=400))),
+    ('overlap a day', lambda: Booking.objects.filter(during__overlap=hours(9600, 9624))),
+    ('room, overlap a week', lambda: Booking.objects.filter(room=42, during__overlap=hours(9600, 9768))),
+    ('contained_by a day', lambda: Booking.objects.filter(during__contained_by=hours(9600, 9624))),
+    ('adjacent_to', lambda: Booking.objects.filter(during__adjacent_to=hours(9600, 9624))),
+    ('fully_lt the first day', lambda: Booking.objects.filter(during__fully_lt=hours(24, 48))),
+    ('fully_gt the last day', lambda: Booking.objects.filter(during__fully_gt=hours(26256, 26280))),
+)
+
+
+def run(operation, state):
+    with connection.schema_editor() as editor:
+        operation.database_forwards('utils', editor, state, state)
+
+
+def undo(operation, state):
+    with connection.schema_editor() as editor:
+        operation.database_backwards('utils', editor, state, state)
+
+
+def load(table, rows, cursor):
+    cursor.execute("SELECT setseed(0)")
+    cursor.execute("""
+        INSERT INTO {table} (room, during)
+        SELECT (random() * %s)::int, tstzrange(t, t + (1 + (random() * 71)::int) * interval '1 hour')
+        FROM (SELECT %s + random() * interval '1095 days' AS t FROM generate_series(1, %s)) s
+    """.format(table=table), [ROOMS - 1, START, rows])
+    cursor.execute("ANALYZE %s" % table)
+
+
+def scans(plan):
+    """Scan nodes of an EXPLAIN plan, e.g. 'Bitmap Index Scan on bench_booking_during_gist'."""
+    found = []
+    if 'Scan' in plan['Node Type']:
+        found.append(plan['Node Type'] + (' on %s' % plan['Index Name'] if 'Index Name' in plan else ''))
+    for child in plan.get('Plans', ()):
+        found.extend(scans(child))
+    return found
+
+
+def explain(queryset, cursor):
+    sql, params = queryset.query.sql_with_params()
+    cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, params)
+    result = cursor.fetchone()[0]
+    result = (json.loads(result) if isinstance(result, six.string_types) else result)[0]
+    return result['Plan']['Actual Rows'], result['Execution Time'], ', '.join(scans(result['Plan']))
+
+
+def report(title, cursor):
+    print()
+    print(title)
+    for name, query in QUERIES:
+        rows, elapsed, plan = explain(query(), cursor)
+        print('%-24s %9d rows %10.1f ms   %s' % (name, rows, elapsed, plan))
+
+
+def main(rows=10 ** 7):
+    rows = int(rows)
+    state = ProjectState.from_apps(apps)
+    with connection.schema_editor() as editor:
+        editor.create_model(Booking)
+        editor.create_model(ExclusiveBooking)
+    try:
+        cursor = connection.cursor()
+        start = time.time()
+        load(Booking._meta.db_table, rows, cursor)
+        print('loaded %d bookings in %.1fs' % (rows, time.time() - start))
+        report('no index', cursor)
+
+        run(BtreeGistExtension(), state)
+        for operation in (CreateGistIndex('booking', ['during']), CreateGistIndex('booking', ['during'], method='spgist'),
+                          CreateGistIndex('booking', ['room', 'during'])):
+            start = time.time()
+            run(operation, state)
+            cursor.execute('ANALYZE bench_booking')
+            cursor.execute("SELECT pg_size_pretty(pg_relation_size(%s))", [operation.index(Booking)[0]])
+            report('%s, built in %.1fs, %s' % (operation.describe(), time.time() - start, cursor.fetchone()[0]), cursor)
+            undo(operation, state)
+
+        # one booking per room and day, then how fast non-conflicting bookings go in under the constraint
+        run(AddExclusionConstraint('exclusivebooking', 'bench_booking_no_overlap', [('room', '='), ('during', '&&')]),
+            state)
+        cursor.execute("""
+            INSERT INTO bench_booking_excl (room, during)
+            SELECT room, tstzrange(%s + day * interval '1 day', %s + day * interval '1 day' + interval '8 hours')
+            FROM generate_series(0, 999) room, generate_series(0, 364) day
+        """, [START, START])
+        inserts = 1000
+        start = time.time()
+        for room in range(inserts):
+            ExclusiveBooking.objects.create(room=room, during=hours(10, 12))
+        print()
+        print('exclusion constraint: %.2f ms per insert next to 365000 bookings' % (
+            (time.time() - start) * 1000 / inserts))
+        try:
+            with transaction.atomic():
+                ExclusiveBooking.objects.create(room=1, during=hours(11, 13))
+        except IntegrityError as e:
+            print('overlapping booking refused: %s' % str(e).splitlines()[0])
+    finally:
+        with connection.schema_editor() as editor:
+            editor.delete_model(Booking)
+            editor.delete_model(ExclusiveBooking)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
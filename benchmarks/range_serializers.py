@@ -0,0 +1,126 @@
+"""List endpoint representation of bookings with DRF's ListSerializer against BulkListSerializer,
+on model instances and on values() rows, at 1k, 10k and 100k rows.
+
+    python benchmarks/range_serializers.py
+
+No database is needed: rows are made up as the adapter would return them, and
+"from rows" includes building the model instances or dicts from those rows.
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import random
+import datetime
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure(
+    USE_TZ=True,
+    INSTALLED_APPS=['django.contrib.contenttypes', 'utils'],
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+)
+
+import django
+django.setup()
+
+from django.db import models
+from psycopg2.extras import DateTimeTZRange
+from psycopg2.tz import FixedOffsetTimezone
+from rest_framework import serializers
+
+from utils.fields import DateTimeRange
+from utils.serializers import BaseModelSerializer
+
+FIELDS = ('id', 'room', 'title', 'during', 'slot', 'created')
+
+
+class Booking(models.Model):
+    room = models.IntegerField()
+    title = models.CharField(max_length=100)
+    during = DateTimeRange()
+    slot = DateTimeRange(null=True)
+    created = models.DateTimeField()
+
+    class Meta:
+        app_label = 'utils'
+
+
+class LegacySerializer(BaseModelSerializer):
+    class Meta:
+        model = Booking
+        fields = FIELDS
+        list_serializer_class = serializers.ListSerializer
+
+
+class BookingSerializer(BaseModelSerializer):
+    class Meta:
+        model = Booking
+        fields = FIELDS
+
+
+class BookingValuesSerializer(BaseModelSerializer):
+    class Meta:
+        model = Booking
+        fields = FIELDS
+        bulk_values = True
+
+
+def rows(count):
+    """Rows as psycopg2 returns them, with timestamps in UTC."""
+    rng = random.Random(0)
+    utc = FixedOffsetTimezone(offset=0)
+    start = datetime.datetime(2016, 1, 1, tzinfo=utc)
+    result = []
+    for n in range(count):
+        lower = start + datetime.timedelta(minutes=rng.randint(0, 10 ** 6))
+        during = DateTimeTZRange(lower, lower + datetime.timedelta(hours=rng.randint(1, 72)))
+        slot = DateTimeTZRange(lower, None) if n % 3 else None
+        result.append((n + 1, rng.randint(1, 10000), 'Booking %d' % n, during, slot, lower))
+    return result
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.time()
+        result = func()
+        best = min(best, time.time() - start)
+    return best, result
+
+
+def main():
+    print('%-36s %10s %10s %10s' % ('', '1k rows', '10k rows', '100k rows'))
+    results = OrderedDict()
+    for count in (1000, 10000, 100000):
+        data = rows(count)
+        instances = [Booking.from_db('default', FIELDS, row) for row in data]
+        dicts = [dict(zip(FIELDS, row)) for row in data]
+        cases = (
+            ('ListSerializer, instances', lambda: LegacySerializer(instances, many=True).data),
+            ('BulkListSerializer, instances', lambda: BookingSerializer(instances, many=True).data),
+            ('BulkListSerializer, values rows', lambda: BookingValuesSerializer(dicts, many=True).data),
+            ('ListSerializer, from rows', lambda: LegacySerializer(
+                [Booking.from_db('default', FIELDS, row) for row in data], many=True).data),
+            ('BulkListSerializer, from rows', lambda: BookingSerializer(
+                [Booking.from_db('default', FIELDS, row) for row in data], many=True).data),
+            ('BulkListSerializer, values from rows', lambda: BookingValuesSerializer(
+                [dict(zip(FIELDS, row)) for row in data], many=True).data),
+        )
+        expected = None
+        for name, func in cases:
+            elapsed, output = timed(func)
+            if expected is None:
+                expected = output
+            assert output == expected, name
+            results.setdefault(name, []).append(elapsed)
+    for name, times in results.items():
+        print('%-36s %9.1fms %9.1fms %9.1fms' % ((name,) + tuple(t * 1000 for t in times)))
+
+
+if __name__ == '__main__':
+    main()
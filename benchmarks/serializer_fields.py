@@ -0,0 +1,117 @@
+"""Serializers built once per object, as by SerializerMethodFields and per-row views,
+with the field cache of utils.serializers on and off, and the SerializerProfile of each run.
+
+    python benchmarks/serializer_fields.py
+
+No database is needed: the instances are made up in memory.
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure(
+    USE_TZ=True,
+    INSTALLED_APPS=['django.contrib.contenttypes', 'utils'],
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+)
+
+import django
+django.setup()
+
+from django.db import models
+from django.utils import timezone
+from rest_framework import serializers
+
+from utils import serializers as utils_serializers
+from utils.profiling import SerializerProfile, SerializerProfiler
+from utils.serializers import BaseModelSerializer
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=100)
+    email = models.EmailField()
+    bio = models.TextField(blank=True)
+
+    class Meta:
+        app_label = 'utils'
+
+
+class Article(models.Model):
+    author = models.ForeignKey(Author)
+    title = models.CharField(max_length=200)
+    slug = models.SlugField()
+    body = models.TextField()
+    score = models.FloatField()
+    views = models.IntegerField()
+    published = models.DateTimeField()
+
+    class Meta:
+        app_label = 'utils'
+
+
+class AuthorSerializer(BaseModelSerializer):
+    class Meta:
+        model = Author
+        fields = ('id', 'name', 'email', 'bio')
+
+
+class ArticleSerializer(BaseModelSerializer):
+    author = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Article
+        fields = ('id', 'title', 'slug', 'body', 'score', 'views', 'published', 'author')
+
+    def get_author(self, obj):
+        return AuthorSerializer(obj.author).data
+
+
+def articles(count):
+    authors = [Author(id=n + 1, name='Author %d' % n, email='a%d@example.com' % n, bio='Bio') for n in range(50)]
+    now = timezone.now()
+    return [Article(id=n + 1, author=authors[n % 50], title='Title %d' % n, slug='title-%d' % n, body='Body ' * 20,
+                    score=n / 7, views=n, published=now) for n in range(count)]
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        profile = SerializerProfile()
+        start = time.time()
+        with SerializerProfiler(profile):
+            result = func()
+        elapsed = time.time() - start
+        if elapsed < best:
+            best, best_profile = elapsed, profile
+    return best, best_profile, result
+
+
+def main():
+    cases = (
+        ('one serializer per article', lambda objects: [ArticleSerializer(obj).data for obj in objects]),
+        ('many=True, one author per row', lambda objects: ArticleSerializer(objects, many=True).data),
+    )
+    for count in (100, 1000, 5000):
+        objects = articles(count)
+        print()
+        print('%d articles' % count)
+        for name, func in cases:
+            outputs = []
+            for cache in (False, True):
+                utils_serializers.SERIALIZER_FIELD_CACHE = cache
+                utils_serializers.field_cache.clear()
+                elapsed, profile, output = timed(lambda: func(objects))
+                outputs.append(output)
+                print('%-32s cache %-3s %9.1f ms   fields %8.1f ms, serialize %8.1f ms' % (
+                    name, 'on' if cache else 'off', elapsed * 1000, profile.build * 1000, profile.serialize * 1000))
+            assert outputs[0] == outputs[1], name
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Startup time and memory of N workers that each build the alias table, against N workers mapping one saved table.
+
+    python benchmarks/shared_alias_table.py [weights] [workers]
+
+Workers stay alive together while they measure, so PSS (proportional set size, shared
+pages divided between the processes that map them) shows what the whole pool costs.
+RSS counts shared pages in every worker. PSS needs Linux.
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.weighted_sampling import WalkerRandomSampling
+
+
+def memory():
+    usage = {}
+    for path, fields in (('/proc/self/status', ('VmRSS',)), ('/proc/self/smaps_rollup', ('Pss',))):
+        try:
+            with open(path) as f:
+                for line in f:
+                    name = line.split(':')[0]
+                    if name in fields:
+                        usage[name] = int(line.split()[1]) / 1024
+        except IOError:
+            pass
+    return usage
+
+
+def worker(mode, weights_path, table_path):
+    started = time.time()
+    if mode == 'build':
+        # the catalogue weights come from elsewhere in production, reading them is part of the cost
+        sampler = WalkerRandomSampling(numpy.load(weights_path), keys=numpy.load(weights_path + '.keys.npy'))
+    else:
+        sampler = WalkerRandomSampling.load(table_path)
+    sampler.random(10 ** 6)
+    print(json.dumps({'startup': time.time() - started}))
+    sys.stdout.flush()
+    sys.stdin.readline()
+    print(json.dumps(memory()))
+    sys.stdout.flush()
+
+
+def pool(mode, workers, weights_path, table_path):
+    processes = [subprocess.Popen([sys.executable, __file__, '--worker', mode, weights_path, table_path],
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True)
+                 for _ in range(workers)]
+    startups = [json.loads(process.stdout.readline())['startup'] for process in processes]
+    for process in processes:
+        process.stdin.write('\n')
+        process.stdin.flush()
+    usages = [json.loads(process.stdout.readline()) for process in processes]
+    for process in processes:
+        process.wait()
+    return startups, usages
+
+
+def main(n, workers):
+    directory = tempfile.mkdtemp()
+    weights_path = os.path.join(directory, 'weights.npy')
+    table_path = os.path.join(directory, 'table.walker')
+    rng = numpy.random.default_rng(0)
+    numpy.save(weights_path, rng.pareto(1.5, n))
+    numpy.save(weights_path + '.keys.npy', numpy.arange(10 ** 9, 10 ** 9 + n))
+
+    started = time.time()
+    WalkerRandomSampling(numpy.load(weights_path), keys=numpy.load(weights_path + '.keys.npy')).save(table_path)
+    print('%d weights, %d workers, table saved in %.2fs, %.0f MB' % (
+        n, workers, time.time() - started, os.path.getsize(table_path) / 2 ** 20))
+    print('%-8s %14s %14s %14s %14s' % ('', 'mean startup', 'max startup', 'RSS MB/worker', 'PSS MB total'))
+    for mode in ('build', 'mmap'):
+        startups, usages = pool(mode, workers, weights_path, table_path)
+        print('%-8s %13.3fs %13.3fs %14.0f %14s' % (
+            mode, sum(startups) / workers, max(startups), sum(usage.get('VmRSS', 0) for usage in usages) / workers,
+            '%.0f' % sum(usage['Pss'] for usage in usages) if all('Pss' in usage for usage in usages) else '-'))
+
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--worker']:
+        worker(*sys.argv[2:5])
+    else:
+        main(int(float(sys.argv[1])) if len(sys.argv) > 1 else 10 ** 7, int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,127 @@
+"""Insert throughput of AutoUUIDField primary keys, random v4 against time-ordered v7,
+by ReturningQuerySet.bulk_create on a local PostgreSQL, and the Python generators.
+
+    PGDATABASE=bench python benchmarks/uuid_inserts.py [rows]
+
+Connects with the usual PG* environment variables. Creates and drops the tables
+bench_event_v4 and bench_event_v7 and uuid_generate_v7(), and creates the uuid-ossp
+extension if missing. rows defaults to 5 million per table, inserted in rounds
+of 250000 in batches of 1000; the slowdown shows once the primary key index
+outgrows shared_buffers, as v4 keys write all over it.
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import uuid
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure(
+    USE_TZ=True,
+    INSTALLED_APPS=['django.contrib.contenttypes', 'utils'],
+    DATABASES={'default': {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': os.environ.get('PGDATABASE', 'bench'),
+        'USER': os.environ.get('PGUSER', ''),
+        'PASSWORD': os.environ.get('PGPASSWORD', ''),
+        'HOST': os.environ.get('PGHOST', ''),
+        'PORT': os.environ.get('PGPORT', ''),
+    }},
+)
+
+import django
+django.setup()
+
+from django.apps import apps
+from django.db import connection, models
+from django.db.migrations.state import ProjectState
+
+from utils.fields import AutoUUIDField, uuid7
+from utils.models import ReturningQuerySet
+from utils.operations import UUIDGenerateV7Function, UUIDOsspExtension
+
+ROUND = 250000
+BATCH = 1000
+
+
+class EventV4(models.Model):
+    id = AutoUUIDField()
+    name = models.CharField(max_length=40)
+    value = models.IntegerField()
+
+    objects = ReturningQuerySet.as_manager()
+
+    class Meta:
+        app_label = 'utils'
+        db_table = 'bench_event_v4'
+
+
+class EventV7(models.Model):
+    id = AutoUUIDField(version=7)
+    name = models.CharField(max_length=40)
+    value = models.IntegerField()
+
+    objects = ReturningQuerySet.as_manager()
+
+    class Meta:
+        app_label = 'utils'
+        db_table = 'bench_event_v7'
+
+
+def generators():
+    for name, func in (('uuid.uuid4', uuid.uuid4), ('uuid7', uuid7)):
+        print('%-12s %6.2f us per key' % (name, min(timeit.repeat(func, number=100000, repeat=3)) * 10))
+
+
+def pkey_size(model, cursor):
+    cursor.execute("""
+        SELECT pg_size_pretty(pg_relation_size(indexrelid)) FROM pg_index
+        WHERE indrelid = %s::regclass AND indisprimary
+    """, [model._meta.db_table])
+    return cursor.fetchone()[0]
+
+
+def insert(model, rows, cursor):
+    print()
+    print(model._meta.db_table)
+    total = 0.0
+    for start in range(0, rows, ROUND):
+        count = min(ROUND, rows - start)
+        objs = [model(name='event %d' % n, value=n) for n in range(start, start + count)]
+        began = time.time()
+        model.objects.bulk_create(objs, batch_size=BATCH)
+        elapsed = time.time() - began
+        total += elapsed
+        assert objs[-1].pk is not None
+        print('%9d rows %9.0f rows/s   pkey %s' % (start + count, count / elapsed, pkey_size(model, cursor)))
+    print('%9d rows %9.0f rows/s overall' % (rows, rows / total))
+
+
+def main(rows=5 * 10 ** 6):
+    rows = int(rows)
+    generators()
+    state = ProjectState.from_apps(apps)
+    function = UUIDGenerateV7Function()
+    with connection.schema_editor() as editor:
+        UUIDOsspExtension().database_forwards('utils', editor, state, state)
+        function.database_forwards('utils', editor, state, state)
+        editor.create_model(EventV4)
+        editor.create_model(EventV7)
+    try:
+        cursor = connection.cursor()
+        for model in (EventV4, EventV7):
+            insert(model, rows, cursor)
+    finally:
+        with connection.schema_editor() as editor:
+            editor.delete_model(EventV4)
+            editor.delete_model(EventV7)
+            function.database_backwards('utils', editor, state, state)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
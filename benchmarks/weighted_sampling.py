@@ -0,0 +1,121 @@
+"""Construction and sampling cost of WalkerRandomSampling against the original per-item alias loop,
+an update-heavy workload for DynamicWeightedSampling against rebuilding the alias table, and
+drawing 10 distinct items with weighted_sample and WeightedReservoir against resampling and deduping.
+
+    python benchmarks/weighted_sampling.py
+
+The original loop is only timed up to 1e6 weights, at 1e7 it takes minutes.
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.weighted_sampling import DynamicWeightedSampling, WalkerRandomSampling, WeightedReservoir, weighted_sample
+
+SIZES = (10 ** 3, 10 ** 6, 10 ** 7)
+SAMPLES = 10 ** 6
+UPDATE_ROUNDS = 20
+
+
+def legacy_table(weights):
+    """The alias construction this module shipped with, one item at a time."""
+    n = len(weights)
+    prob = weights * n / weights.sum()
+    inx = -numpy.ones(n, dtype=int)
+    short = numpy.where(prob < 1)[0].tolist()
+    long = numpy.where(prob > 1)[0].tolist()
+    while short and long:
+        j = short.pop()
+        k = long[-1]
+        inx[j] = k
+        prob[k] -= (1 - prob[j])
+        if prob[k] < 1:
+            short.append(k)
+            long.pop()
+    return prob, inx
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main():
+    rng = numpy.random.default_rng(0)
+    print('%10s %14s %14s %16s' % ('weights', 'legacy build', 'build', 'samples/s'))
+    for n in SIZES:
+        weights = rng.pareto(1.5, n) + 1e-9
+        legacy = '%.3fs' % best_of(lambda: legacy_table(weights), 1) if n <= 10 ** 6 else '-'
+        build = best_of(lambda: WalkerRandomSampling(weights, random_state=1))
+        sampler = WalkerRandomSampling(weights, random_state=1)
+        sample = best_of(lambda: sampler.random(SAMPLES))
+        print('%10d %14s %13.3fs %16.0f' % (n, legacy, build, SAMPLES / sample))
+
+    print()
+    print('%d rounds of <updates> weight changes followed by 1000 samples, 1e6 weights' % UPDATE_ROUNDS)
+    print('%10s %16s %16s' % ('updates', 'walker rebuild', 'dynamic'))
+    weights = rng.pareto(1.5, 10 ** 6) + 1e-9
+    for updates in (1, 100, 10000):
+        changes = [(rng.integers(len(weights), size=updates), rng.random(updates)) for _ in range(UPDATE_ROUNDS)]
+
+        def rebuild():
+            current = weights.copy()
+            for slots, values in changes:
+                current[slots] = values
+                WalkerRandomSampling(current, random_state=1).random(1000)
+
+        dynamic = DynamicWeightedSampling(weights, random_state=1)
+
+        def update():
+            for slots, values in changes:
+                for slot, value in zip(slots.tolist(), values.tolist()):
+                    dynamic.update(slot, value)
+                dynamic.random(1000)
+
+        print('%10d %15.3fs %15.3fs' % (updates, best_of(rebuild, 1), best_of(update, 1)))
+
+    print()
+    print('10 distinct items out of 1e6 weights, in ms')
+    print('%-36s %12s %12s' % ('', 'pareto', 'one at 99.9%'))
+    pareto = rng.pareto(0.8, 10 ** 6)
+    dominated = pareto.copy()
+    dominated[0] = pareto.sum() * 1000
+    results = []
+    for weights in (pareto, dominated):
+        sampler = WalkerRandomSampling(weights, random_state=1)
+        weight_list = weights.tolist()
+        pairs = list(zip(range(len(weights)), weight_list))
+
+        def dedupe():
+            chosen = []
+            while len(chosen) < 10:
+                item = sampler.random()
+                if item not in chosen:
+                    chosen.append(item)
+
+        def reservoir():
+            WeightedReservoir(10, random_state=1).extend(pairs)
+
+        results.append([
+            best_of(dedupe),
+            best_of(lambda: weighted_sample(weights, 10, random_state=1)),
+            best_of(lambda: weighted_sample(iter(weight_list), 10, random_state=1)),
+            best_of(reservoir),
+        ])
+    names = ('walker resample and dedupe (built)', 'weighted_sample, array', 'weighted_sample, iterator',
+             'WeightedReservoir.extend, pairs')
+    for name, pareto_time, dominated_time in zip(names, *results):
+        print('%-36s %12.2f %12.2f' % (name, pareto_time * 1000, dominated_time * 1000))
+
+if __name__ == '__main__':
+    main()
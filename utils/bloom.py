@@ -0,0 +1,51 @@
+from __future__ import unicode_literals, division
+
+import math
+import struct
+import hashlib
+
+
+class BloomFilter(object):
+    """
+    Fixed size Bloom filter over strings.
+
+    ``item in bloom`` is ``False`` only if ``item`` was never added; it is ``True``
+    for added items and for roughly ``error_rate`` of everything else, as long as
+    no more than ``capacity`` items are added.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.num_bits = int(math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        if not isinstance(item, bytes):
+            item = item.encode('utf-8')
+        # Kirsch-Mitzenmacher double hashing: k positions from one digest
+        h1, h2 = struct.unpack(b'<QQ', hashlib.md5(item).digest())
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        bits = self.bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
@@ -0,0 +1,184 @@
+from __future__ import unicode_literals
+
+import time
+import uuid
+import hashlib
+import warnings
+import threading
+from collections import OrderedDict
+
+try:
+    from functools import lru_cache
+except ImportError:  # Python 2
+    lru_cache = None
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.encoding import force_bytes
+from django.utils.http import urlquote
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+CACHE_KEY_HASH = getattr(settings, 'CACHE_KEY_HASH', 'md5')
+# reproduces the keys of the old template_cache_key until the fragment cache has been migrated
+CACHE_KEY_COMPAT = getattr(settings, 'CACHE_KEY_COMPAT', True)
+CACHE_KEY_MEMO_SIZE = getattr(settings, 'CACHE_KEY_MEMO_SIZE', 4096)
+CACHE_KEY_NAMESPACE_CHECK_SECONDS = getattr(settings, 'CACHE_KEY_NAMESPACE_CHECK_SECONDS', 5)
+
+FRAGMENT_KEY_PREFIX = 'template.cache'
+NAMESPACE_KEY_PREFIX = 'template.cache.namespace'
+
+# vary values that can't change behind a memoized key, and that are only equal to values
+# with the same text: not Decimal('1.0') == Decimal('1.00'), aware datetimes in different
+# time zones or 0.0 == -0.0
+MEMO_TYPES = frozenset((type(''), bytes, int, bool, type(None), uuid.UUID))
+try:
+    MEMO_TYPES |= frozenset((long,))
+except NameError:
+    pass
+
+
+def hasher(name):
+    """Hex digest function for ``CACHE_KEY_HASH``: md5, blake2b or xxhash."""
+    if name == 'md5':
+        return lambda data: hashlib.md5(data).hexdigest()
+    if name == 'blake2b':
+        if not hasattr(hashlib, 'blake2b'):
+            raise ImproperlyConfigured("CACHE_KEY_HASH = 'blake2b' needs Python 3.6 or later")
+        return lambda data: hashlib.blake2b(data, digest_size=16).hexdigest()
+    if name == 'xxhash':
+        if xxhash is None:
+            raise ImproperlyConfigured("CACHE_KEY_HASH = 'xxhash' needs the xxhash package")
+        if hasattr(xxhash, 'xxh3_128_hexdigest'):
+            return xxhash.xxh3_128_hexdigest
+        return lambda data: xxhash.xxh64(data).hexdigest()
+    raise ImproperlyConfigured("Unknown CACHE_KEY_HASH %r, use 'md5', 'blake2b' or 'xxhash'" % name)
+
+
+class Namespaces(object):
+    """
+    Version counters of fragment families, kept in the cache.
+
+    ``bump(name)`` invalidates every fragment called ``name`` at once, on every
+    process, by moving the family to a new version instead of deleting keys.
+    Processes read the counters at most every ``CACHE_KEY_NAMESPACE_CHECK_SECONDS``.
+    """
+
+    def __init__(self, check_interval=CACHE_KEY_NAMESPACE_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self.versions = {}
+
+    def key(self, name):
+        return '%s.%s' % (NAMESPACE_KEY_PREFIX, name)
+
+    def version(self, name):
+        now = time.time()
+        entry = self.versions.get(name)
+        if entry is not None and now - entry[1] < self.check_interval:
+            return entry[0]
+        key = self.key(name)
+        version = cache.get(key)
+        if version is None:
+            # counters start at the current time, so a lost counter never brings back old versions
+            cache.add(key, int(now), None)
+            version = cache.get(key, int(now))
+        self.versions[name] = (version, now)
+        return version
+
+    def bump(self, name):
+        """Invalidates the fragments called ``name``, returns the new version."""
+        key = self.key(name)
+        version = int(time.time())
+        if not cache.add(key, version, None):
+            try:
+                version = cache.incr(key)
+            except ValueError:
+                cache.set(key, version, None)  # expired in between
+        self.versions[name] = (version, time.time())
+        return version
+
+
+class KeyBuilder(object):
+    """
+    Builds fragment cache keys.
+
+    In compat mode the keys are those of the old ``template_cache_key``: MD5 of the
+    ``urlquote``d values joined by colons. Otherwise every value is length-prefixed,
+    so no two lists of values join to the same string, the digest comes from
+    ``CACHE_KEY_HASH`` and the key carries the version of its fragment family.
+
+    Digests of recently used values are memoized, as long as all values are of
+    immutable types whose text can't change.
+    """
+
+    def __init__(self, hash_name=CACHE_KEY_HASH, compat=CACHE_KEY_COMPAT, memo_size=CACHE_KEY_MEMO_SIZE,
+                 namespaces=None):
+        self.hash = hasher(hash_name)
+        self.compat = compat
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+        self.lock = threading.Lock()
+        if memo_size and lru_cache is not None:
+            # typed, as 1 == 1.0 == True but their text differs
+            self.cached_digest = lru_cache(memo_size, typed=True)(lambda *vary_on: self.digest(vary_on))
+        else:
+            self.cached_digest = None
+        self.namespaces = namespaces if namespaces is not None else Namespaces()
+
+    def digest(self, vary_on):
+        if self.compat:
+            return hashlib.md5(':'.join([urlquote(var) for var in vary_on]).encode('utf-8')).hexdigest()
+        parts = []
+        for var in vary_on:
+            var = force_bytes(var)
+            parts.append(('%d:' % len(var)).encode('ascii'))
+            parts.append(var)
+        return self.hash(b''.join(parts))
+
+    def memoized_digest(self, vary_on):
+        if not self.memo_size or not all(type(var) in MEMO_TYPES for var in vary_on):
+            return self.digest(vary_on)
+        if self.cached_digest is not None:
+            return self.cached_digest(*vary_on)
+        memo_key = (vary_on, tuple(type(var) for var in vary_on))
+        with self.lock:
+            digest = self.memo.pop(memo_key, None)
+            if digest is not None:
+                self.memo[memo_key] = digest
+                return digest
+        digest = self.digest(vary_on)
+        with self.lock:
+            self.memo[memo_key] = digest
+            while len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+        return digest
+
+    def fragment_key(self, fragment_name, *vary_on):
+        digest = self.memoized_digest(vary_on)
+        if self.compat:
+            return '%s.%s.%s' % (FRAGMENT_KEY_PREFIX, fragment_name, digest)
+        return '%s.%s.%s.%s' % (FRAGMENT_KEY_PREFIX, fragment_name, self.namespaces.version(fragment_name), digest)
+
+
+key_builder = KeyBuilder()
+
+
+def fragment_key(fragment_name, *vary_on):
+    return key_builder.fragment_key(fragment_name, *vary_on)
+
+
+def bump_namespace(fragment_name):
+    """
+    Invalidates every cached fragment called ``fragment_name``.
+
+    Compat keys carry no version, so with ``CACHE_KEY_COMPAT`` this only moves the counter,
+    which takes effect once compat mode is off, and warns.
+    """
+    if key_builder.compat:
+        warnings.warn("bump_namespace(%r) doesn't invalidate anything while CACHE_KEY_COMPAT is on" % fragment_name,
+                      RuntimeWarning, stacklevel=2)
+    return key_builder.namespaces.bump(fragment_name)
@@ -1,10 +1,153 @@
+"""
+JSON encoding for templates and API output.
+
+``dumps`` encodes with the fastest backend installed, orjson, then ujson, then
+the C encoder of the standard library, or the one named by ``JSON_BACKEND``.
+Types JSON doesn't know (Decimal, UUID, datetimes, querysets, lazy strings...)
+are converted the way DRF's ``JSONEncoder`` does, so every backend gives the
+same values, or by Django's ``DjangoJSONEncoder`` where DRF isn't installed.
+With ``html=True`` the output is escaped to be embedded in a page.
+"""
 from __future__ import unicode_literals
 
 import json
+import uuid
+import decimal
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    from rest_framework.utils.encoders import JSONEncoder
+except ImportError:
+    JSONEncoder = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+    ujson.dumps(0, default=None)
+except ImportError:
+    ujson = None
+except TypeError:  # releases before 5.x can't take a default function
+    ujson = None
+
+JSON_BACKEND = getattr(settings, 'JSON_BACKEND', None)
+
+# in strings only, as JSON has none of these outside them. The line separators end a line in old JS parsers.
+HTML_ESCAPES = (('&', '\\u0026'), ('<', '\\u003c'), ('>', '\\u003e'), ('\u2028', '\\u2028'), ('\u2029', '\\u2029'))
+
+HTML_ESCAPES_BYTES = tuple((char.encode('utf-8'), escape.encode('ascii')) for char, escape in HTML_ESCAPES)
+
+rest_default = (JSONEncoder or DjangoJSONEncoder)().default
+
+# DRF before 3.5 and DjangoJSONEncoder cut microseconds to milliseconds, later DRF keeps them
+MILLISECONDS = len(rest_default(datetime.datetime(2000, 1, 1, microsecond=1))) == 23
+
+
+def datetime_text(value):
+    text = value.isoformat()
+    if value.microsecond and MILLISECONDS:
+        text = text[:23] + text[26:]
+    return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+
+# the common types by exact type, ahead of the isinstance chain of rest_default
+TYPE_DEFAULTS = {
+    decimal.Decimal: float,
+    uuid.UUID: str,
+    datetime.datetime: datetime_text,
+    datetime.date: datetime.date.isoformat,
+}
+
+
+def default(obj):
+    """Converts what JSON doesn't know like DRF's JSONEncoder."""
+    convert = TYPE_DEFAULTS.get(type(obj))
+    if convert is not None:
+        return convert(obj)
+    return rest_default(obj)
+
+
+# compact like orjson. ensure_ascii, as the C encoder is slower without it
+json_encoder = json.JSONEncoder(default=default, separators=(',', ':'))
+
+if orjson is not None:
+    # UUIDs natively. Datetimes through default, as orjson can't cut microseconds to DRF's milliseconds
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def escape_html(data):
+    """Escapes JSON text or UTF-8 so no string in it can close a <script> or be read as markup."""
+    for char, escape in HTML_ESCAPES_BYTES if isinstance(data, bytes) else HTML_ESCAPES:
+        if char in data:
+            data = data.replace(char, escape)
+    return data
+
+
+def orjson_dumps(obj, html=False):
+    data = orjson.dumps(obj, default=default, option=ORJSON_OPTIONS)
+    # escaped before decoding, bytes.replace being the faster
+    return (escape_html(data) if html else data).decode('utf-8')
+
+
+def ujson_dumps(obj, html=False):
+    data = ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, default=default)
+    return escape_html(data) if html else data
+
+
+def json_dumps(obj, html=False):
+    data = json_encoder.encode(obj)
+    return escape_html(data) if html else data
+
+
+def backend(name=JSON_BACKEND):
+    """The dumps function of the ``name`` backend, or of the fastest one installed."""
+    if name is None:
+        name = 'orjson' if orjson is not None else 'ujson' if ujson is not None else 'json'
+    if name == 'orjson':
+        if orjson is None:
+            raise ImproperlyConfigured("JSON_BACKEND = 'orjson' needs the orjson package")
+        return orjson_dumps
+    if name == 'ujson':
+        if ujson is None:
+            raise ImproperlyConfigured("JSON_BACKEND = 'ujson' needs the ujson package, 5.x or later")
+        return ujson_dumps
+    if name == 'json':
+        return json_dumps
+    raise ImproperlyConfigured("Unknown JSON_BACKEND %r, use 'orjson', 'ujson' or 'json'" % name)
+
+
+backend_dumps = backend()
+
+
+def dumps(obj, html=False):
+    """Compact JSON text of ``obj``, escaped for HTML if ``html``."""
+    try:
+        return backend_dumps(obj, html)
+    except (TypeError, ValueError, OverflowError):
+        # what the backend can't do, e.g. integers past 64 bits for orjson, NaN for ujson
+        return json_dumps(obj, html)
+
 
-from simplejson.encoder import JSONEncoderForHTML
+if JSONEncoder is not None:
+    class JSONRestEncoderForHTML(JSONEncoder):
+        """
+        DRF's JSONEncoder, with its output escaped by ``escape_html``.
 
-from rest_framework.utils.encoders import JSONEncoder
+        It encodes with the standard library like its base class, not with the ``dumps``
+        backend, as it has to honour the indent, separators and strict NaN handling of
+        the renderer, which orjson and ujson can't all reproduce.
+        """
 
+        def encode(self, o):
+            return escape_html(''.join(super(JSONRestEncoderForHTML, self).iterencode(o, True)))
 
-JSONRestEncoderForHTML = type(b'JSONRestEncoderForHTML', (JSONEncoderForHTML,), dict(JSONEncoder.__dict__))
\ No newline at end of file
+        def iterencode(self, o, _one_shot=False):
+            for chunk in super(JSONRestEncoderForHTML, self).iterencode(o, _one_shot):
+                yield escape_html(chunk)
@@ -1,4 +1,7 @@
+import time
 import uuid
+import random
+import datetime
 import six
 
 import psycopg2.extras, psycopg2.extensions
@@ -18,6 +21,22 @@ from .widgets import DateTimeRangeWidget
 
 psycopg2.extras.register_uuid()
 
+UUID_VERSIONS = (4, 7)
+
+system_random = random.SystemRandom()
+
+
+def uuid7():
+    """
+    Time-ordered UUID, version 7 of RFC 9562: milliseconds since the epoch, a fraction
+    of the millisecond, then 62 random bits, so new keys land next to each other in indexes
+    """
+    timestamp = time.time() * 1000
+    milliseconds = int(timestamp)
+    fraction = int((timestamp - milliseconds) * 4096)
+    return uuid.UUID(int=(milliseconds << 80) | (0x7 << 76) | (fraction << 64) | (0x2 << 62) |
+                     system_random.getrandbits(62))
+
 
 class UUIDField(six.with_metaclass(models.SubfieldBase, models.Field)):
     """Deprecated in Django 1.8 - use built in type"""
@@ -63,16 +82,35 @@ class UUIDField(six.with_metaclass(models.SubfieldBase, models.Field)):
 
 
 class AutoUUIDField(UUIDField, AutoField):
-    """Make sure to execute db.execute("ALTER TABLE appname_modelname ALTER COLUMN id SET DEFAULT uuid_generate_v4();")"""
+    """
+    UUID primary key generated by the database, ``uuid_generate_v4()`` or with ``version=7``
+    the time-ordered ``uuid_generate_v7()`` of utils.operations.UUIDGenerateV7Function.
+
+    The default is part of the column type, so migrations emit it with the table or column.
+    Changing the version of an existing column needs ``ALTER COLUMN ... SET DEFAULT`` in
+    RunSQL, the schema editor of Django 1.8 can't alter a column type carrying a default.
+    Saves and ``utils.models.ReturningQuerySet.bulk_create`` get the keys back by RETURNING.
+    """
     def __init__(self, *args, **kwargs):
+        self.version = kwargs.pop('version', 4)
+        if self.version not in UUID_VERSIONS:
+            raise ValueError('Unknown UUID version %r, use 4 or 7' % self.version)
         kwargs['primary_key'] = True
         kwargs['default'] = None
         kwargs['editable'] = False
         kwargs['blank'] = True
         super(AutoUUIDField, self).__init__(*args, **kwargs)
 
+    def db_type(self, connection=None):
+        return 'uuid DEFAULT uuid_generate_v%d()' % self.version
+
+    def rel_db_type(self, connection=None):
+        return 'uuid'
+
     def deconstruct(self):
         name, path, args, kwargs = super(AutoUUIDField, self).deconstruct()
+        if self.version != 4:
+            kwargs['version'] = self.version
         if 'primary_key' in kwargs:
             del kwargs['primary_key']
         if 'default' in kwargs:
@@ -96,7 +134,9 @@ class ForeignKey(models.ForeignKey):
         # If the database needs similar types for key fields however, the only
         # thing we can do is making AutoField an IntegerField.
         rel_field = self.related_field
-        if ((isinstance(rel_field, AutoField) and not isinstance(rel_field, AutoUUIDField)) or
+        if isinstance(rel_field, AutoUUIDField):
+            return rel_field.rel_db_type(connection)
+        if (isinstance(rel_field, AutoField) or
                 (not connection.features.related_fields_match_type and
                 isinstance(rel_field, (models.PositiveIntegerField,
                                        models.PositiveSmallIntegerField)))):
@@ -105,7 +145,8 @@ class ForeignKey(models.ForeignKey):
 
 
 try:
-    from rest_framework import serializers
+    from rest_framework import ISO_8601, serializers
+    from rest_framework.settings import api_settings
     class DateTimeRangeSerializerField(serializers.DateTimeField):
         def __init__(self, *args, **kwargs):
             self.require_lower = kwargs.pop('require_lower', False)
@@ -114,6 +155,29 @@ try:
         def to_representation(self, value):
             return [v and super(DateTimeRangeSerializerField, self).to_representation(v) for v in [value.lower, value.upper]]
 
+        def to_representation_many(self, values):
+            """
+            to_representation of a column of ranges, None included, for BulkListSerializer.
+            The output format is resolved once and aware bounds, all of those read from
+            the database, are formatted in one pass; naive ones go through DateTimeField.
+            """
+            output_format = getattr(self, 'format', api_settings.DATETIME_FORMAT)
+            if output_format is None:
+                return [None if value is None else [value.lower, value.upper] for value in values]
+            single = super(DateTimeRangeSerializerField, self).to_representation
+            iso = output_format.lower() == ISO_8601
+
+            def convert(bound):
+                if bound is None or bound.tzinfo is None:
+                    return bound and single(bound)
+                if not iso:
+                    return bound.strftime(output_format)
+                text = bound.isoformat()
+                return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+            texts = iter([convert(bound) for value in values if value is not None for bound in (value.lower, value.upper)])
+            return [None if value is None else [next(texts), next(texts)] for value in values]
+
         def to_internal_value(self, data):
             data = [super(DateTimeRangeSerializerField, self).to_internal_value(value) if value else None for value in data]
             if self.require_lower and data[0] is None:
@@ -182,6 +246,7 @@ class DateTimeRange(six.with_metaclass(models.SubfieldBase, models.Field)):
 
 
 class LowercaseTransform(Transform):
+    """Text array lowercased by ``array_lowercase``, installed by utils.operations.ArrayLowercaseFunction"""
     lookup_name = 'array_lowercase'
     def as_sql(self, qn, connection):
         lhs, params = qn.compile(self.lhs)
@@ -189,16 +254,122 @@ class LowercaseTransform(Transform):
 
 
 class SingleContainedByLookup(ContainedByLookup):
+    """``= ANY`` of an array, which a btree index serves unlike ``ARRAY[col] <@``"""
     def as_sql(self, qn, connection):
         lhs, lhs_params = self.process_lhs(qn, connection)
         rhs, rhs_params = self.process_rhs(qn, connection)
         params = lhs_params + rhs_params
-        return "ARRAY[%s] <@ %s::%s[]" % (lhs, rhs, self.lhs.output_field.db_type(connection)), params
+        return "%s = ANY(%s::%s[])" % (lhs, rhs, self.lhs.output_field.db_type(connection)), params
+
+
+class ArrayOperatorLookup(Lookup):
+    """
+    Array operators with the right side cast to the array type of the column, as GIN
+    indexes only serve them between equal types, and lowercased after ``array_lowercase``
+    """
+    operator = None
+
+    def process_rhs(self, qn, connection):
+        rhs, params = super(ArrayOperatorLookup, self).process_rhs(qn, connection)
+        rhs = '%s::%s' % (rhs, self.lhs.output_field.db_type(connection))
+        if isinstance(self.lhs, LowercaseTransform):
+            rhs = 'array_lowercase(%s)' % rhs
+        return rhs, params
+
+    def as_sql(self, qn, connection):
+        lhs, lhs_params = self.process_lhs(qn, connection)
+        rhs, rhs_params = self.process_rhs(qn, connection)
+        return "%s %s %s" % (lhs, self.operator, rhs), lhs_params + rhs_params
+
+
+class ArrayContainsLookup(ArrayOperatorLookup):
+    lookup_name = 'contains'
+    operator = '@>'
+
+
+class ArrayContainedByLookup(ArrayOperatorLookup):
+    lookup_name = 'contained_by'
+    operator = '<@'
+
+
+class ArrayOverlapLookup(ArrayOperatorLookup):
+    lookup_name = 'overlap'
+    operator = '&&'
+
+
+class ArrayElementsLookup(ArrayOperatorLookup):
+    """Takes a single element as well as a list of them"""
+    def get_prep_lookup(self):
+        if not isinstance(self.rhs, (list, tuple, set, frozenset)) and not hasattr(self.rhs, 'as_sql'):
+            self.rhs = [self.rhs]
+        elif isinstance(self.rhs, (set, frozenset)):
+            self.rhs = list(self.rhs)
+        return super(ArrayElementsLookup, self).get_prep_lookup()
+
+
+class AnyElementLookup(ArrayElementsLookup):
+    """Arrays with any of the elements"""
+    lookup_name = 'any'
+    operator = '&&'
+
+
+class AllElementsLookup(ArrayElementsLookup):
+    """Arrays with all of the elements"""
+    lookup_name = 'all'
+    operator = '@>'
+
+
+class RangeContainsLookup(ContainsLookup):
+    """``@>`` of a range, or of a single datetime, cast to match ``tstzrange @> timestamptz`` and its indexes"""
+    def as_sql(self, qn, connection):
+        lhs, lhs_params = self.process_lhs(qn, connection)
+        rhs, rhs_params = self.process_rhs(qn, connection)
+        if isinstance(self.rhs, datetime.datetime):
+            rhs = '%s::timestamptz' % rhs
+        return "%s @> %s" % (lhs, rhs), lhs_params + rhs_params
+
+
+class RangeOperatorLookup(Lookup):
+    """Range operators, named like the lookups of django.contrib.postgres range fields"""
+    operator = None
+
+    def as_sql(self, qn, connection):
+        lhs, lhs_params = self.process_lhs(qn, connection)
+        rhs, rhs_params = self.process_rhs(qn, connection)
+        return "%s %s %s" % (lhs, self.operator, rhs), lhs_params + rhs_params
+
+
+class AdjacentToLookup(RangeOperatorLookup):
+    lookup_name = 'adjacent_to'
+    operator = '-|-'
+
+
+class FullyLessThanLookup(RangeOperatorLookup):
+    lookup_name = 'fully_lt'
+    operator = '<<'
+
+
+class FullyGreaterThanLookup(RangeOperatorLookup):
+    lookup_name = 'fully_gt'
+    operator = '>>'
 
 
 UUIDField.register_lookup(SingleContainedByLookup)
 DateTimeRange.register_lookup(ContainedByLookup)
-DateTimeRange.register_lookup(ContainsLookup)
+DateTimeRange.register_lookup(RangeContainsLookup)
 DateTimeRange.register_lookup(OverlapLookup)
+DateTimeRange.register_lookup(AdjacentToLookup)
+DateTimeRange.register_lookup(FullyLessThanLookup)
+DateTimeRange.register_lookup(FullyGreaterThanLookup)
 ArrayField.register_lookup(LowercaseTransform)
+ArrayField.register_lookup(ArrayContainsLookup)
+ArrayField.register_lookup(ArrayContainedByLookup)
+ArrayField.register_lookup(ArrayOverlapLookup)
+ArrayField.register_lookup(AnyElementLookup)
+ArrayField.register_lookup(AllElementsLookup)
 NativeArrayField.register_lookup(LowercaseTransform)
+NativeArrayField.register_lookup(ArrayContainsLookup)
+NativeArrayField.register_lookup(ArrayContainedByLookup)
+NativeArrayField.register_lookup(ArrayOverlapLookup)
+NativeArrayField.register_lookup(AnyElementLookup)
+NativeArrayField.register_lookup(AllElementsLookup)
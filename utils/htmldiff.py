@@ -1,66 +1,472 @@
-#!/usr/bin/python2.2
+#!/usr/bin/env python
 """HTML Diff: http://www.aaronsw.com/2002/diff
 Rough code, badly documented. Send me comments and patches."""
+from __future__ import print_function
 
 __author__ = 'Aaron Swartz <me@aaronsw.com>'
 __copyright__ = '(C) 2003 Aaron Swartz. GNU GPL 2 or 3.'
 __version__ = '0.22'
 
-import difflib, string
+import re
+import time
+import difflib
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+# string.whitespace, spelled out because \s also matches unicode spaces
+WHITESPACE = ' \\t\\n\\r\\x0b\\x0c'
+TOKEN_RE = re.compile(r'<[^>]*>?|[^<%s]*[%s]|[^<%s]+' % (WHITESPACE, WHITESPACE, WHITESPACE))
+BLOCK_TAG_RE = re.compile(r'</?(?:p|div|li|ul|ol|dl|dt|dd|table|thead|tbody|tr|td|th|h[1-6]|blockquote|pre|'
+                          r'section|article|header|footer|aside|nav|figure|br|hr)\b', re.I)
+
+MAX_CHAIN = 64  # tokens more frequent than this in a region are never used as anchors
+SMALL_REGION = 10000  # regions without anchors up to this many token pairs go to difflib
+BLOCKWISE_TOKENS = 5000  # CachedDiffer compares blocks before tokens beyond this many changed tokens
+CHUNK_SIZE = 16384  # characters per chunk of iterTextDiff
+CHUNK_TOKENS = 512  # tokens joined at a time in iterTextDiff
+TOKENIZE_CHUNK = 65536  # characters tokenized at a time by sharedTokens
 
 def isTag(x): return x[0] == "<" and x[-1] == ">"
 
-def textDiff(a, b):
-    """Takes in strings a and b and returns a human-readable HTML diff."""
+def textDiff(a, b, max_time=None, max_cost=None):
+    """Takes in strings a and b and returns a human-readable HTML diff.
+
+    `max_time` (seconds) and `max_cost` (tokens examined) bound the token level diff;
+    past either, the remaining changes are diffed block by block instead."""
+
+    a, b = sharedTokens(a, b)
+    return renderDiff(a, b, diffOpcodes(a, b, max_time, max_cost))
+
+def iterTextDiff(a, b, max_time=None, max_cost=None, chunk_size=CHUNK_SIZE):
+    """textDiff as a generator of chunks of about `chunk_size` characters, produced as
+    the diff goes, for a StreamingHttpResponse:
 
-    out = []
-    a, b = html2list(a), html2list(b)
-    s = difflib.SequenceMatcher(None, a, b)
-    for e in s.get_opcodes():
+        return StreamingHttpResponse(iterTextDiff(old.body, new.body))
+    """
+    a, b = sharedTokens(a, b)
+    return iterRenderDiff(a, b, diffOpcodes(a, b, max_time, max_cost), chunk_size)
+
+def structuredDiff(a, b, max_time=None, max_cost=None):
+    """The diff of strings a and b as data for clients that render it themselves: both
+    token lists and the opcodes [tag, i1, i2, j1, j2] over them, ready for json.dumps.
+    a[i1:i2] is replaced by, deleted, inserted as or equal to b[j1:j2]."""
+    a, b = sharedTokens(a, b)
+    return {'a': a, 'b': b, 'opcodes': [list(e) for e in diffOpcodes(a, b, max_time, max_cost)]}
+
+def renderDiff(a, b, opcodes):
+    """The diff markup for token lists a and b."""
+    return ''.join(iterRenderDiff(a, b, opcodes, None))
+
+def iterRenderDiff(a, b, opcodes, chunk_size=CHUNK_SIZE):
+    """Yields the diff markup for token lists a and b in chunks of about `chunk_size`
+    characters, long runs joined a few tokens at a time; all at once without one."""
+    out, size = [], 0
+    for e in opcodes:
         if e[0] == "replace":
             # @@ need to do something more complicated here
             # call textDiff but not for html, but for some html... ugh
             # gonna cop-out for now
-            out.append('<del class="diff modified">'+''.join(a[e[1]:e[2]]) + '</del><ins class="diff modified">'+''.join(b[e[3]:e[4]])+"</ins>")
+            parts = ('<del class="diff modified">', a, e[1], e[2], '</del><ins class="diff modified">', b, e[3], e[4], "</ins>")
         elif e[0] == "delete":
-            out.append('<del class="diff">'+ ''.join(a[e[1]:e[2]]) + "</del>")
+            parts = ('<del class="diff">', a, e[1], e[2], "</del>")
         elif e[0] == "insert":
-            out.append('<ins class="diff">'+''.join(b[e[3]:e[4]]) + "</ins>")
+            parts = ('<ins class="diff">', b, e[3], e[4], "</ins>")
         elif e[0] == "equal":
-            out.append(''.join(b[e[3]:e[4]]))
-        else: 
-            raise "Um, something's broken. I didn't expect a '" + `e[0]` + "'."
-    return ''.join(out)
+            parts = (b, e[3], e[4])
+        else:
+            raise ValueError("Um, something's broken. I didn't expect a %r." % e[0])
+
+        parts = iter(parts)
+        for part in parts:
+            if isinstance(part, list):
+                lo, hi = next(parts), next(parts)
+                step = max(hi - lo, 1) if chunk_size is None else CHUNK_TOKENS
+                for start in range(lo, hi, step):
+                    text = ''.join(part[start:min(start + step, hi)])
+                    out.append(text)
+                    size += len(text)
+                    if chunk_size is not None and size >= chunk_size:
+                        yield ''.join(out)
+                        out, size = [], 0
+            else:
+                out.append(part)
+                size += len(part)
+    if out:
+        yield ''.join(out)
 
 def html2list(x, b=0):
-    mode = 'char'
-    cur = ''
-    out = []
-    for c in x:
-        if mode == 'tag':
-            if c == '>': 
-                if b: cur += ']'
-                else: cur += c
-                out.append(cur); cur = ''; mode = 'char'
-            else: cur += c
-        elif mode == 'char':
-            if c == '<': 
-                out.append(cur)
-                if b: cur = '['
-                else: cur = c
-                mode = 'tag'
-            elif c in string.whitespace: out.append(cur+c); cur = ''
-            else: cur += c
-    out.append(cur)
-    return filter(lambda x: x is not '', out)
+    """Splits x into tags and words, each word keeping the whitespace character after it.
+    With b, tags are bracketed with [] instead of <>."""
+    out = TOKEN_RE.findall(x)
+    if b:
+        out = [bracketTag(t) if t[0] == '<' else t for t in out]
+    return out
+
+def bracketTag(x):
+    return '[' + x[1:-1] + ']' if x[-1] == '>' else '[' + x[1:]
+
+def sharedTokens(*texts):
+    """html2list of each text, with each distinct token stored once for all of them.
+
+    Most tokens of a document are repeats, so this takes a fraction of the memory.
+    Texts are tokenized a chunk at a time to keep the copies from piling up."""
+    seen = {}
+    result = []
+    for text in texts:
+        tokens, position, size = [], 0, TOKENIZE_CHUNK
+        while position < len(text):
+            end = position + size
+            chunk = TOKEN_RE.findall(text, position, end)
+            if end < len(text):
+                # the last token may have been cut short, the ones before it are complete
+                chunk.pop()
+                if not chunk:
+                    size *= 2
+                    continue
+            tokens.extend(map(seen.setdefault, chunk, chunk))
+            position += sum(map(len, chunk))
+            size = TOKENIZE_CHUNK
+        result.append(tokens)
+    return result
+
+
+class DiffBudget(object):
+    """Tracks the time and tokens spent on a diff against its limits."""
+
+    def __init__(self, max_time=None, max_cost=None):
+        self.deadline = time.time() + max_time if max_time is not None else None
+        self.max_cost = max_cost
+        self.cost = 0
+
+    def spend(self, cost):
+        """Adds cost, returns False once a limit is exceeded."""
+        self.cost += cost
+        if self.max_cost is not None and self.cost > self.max_cost:
+            return False
+        return self.deadline is None or time.time() < self.deadline
+
+
+def diffOpcodes(a, b, max_time=None, max_cost=None, blockwise=False, equal_prefix=0, equal_suffix=0):
+    """Yields difflib style (tag, i1, i2, j1, j2) opcodes turning token list a into b.
+
+    `equal_prefix` and `equal_suffix` tokens, known to be the same at either end, are
+    not compared again. With `blockwise`, blocks are matched first and tokens are only
+    compared inside changed blocks."""
+    return coalesce(middleOpcodes(a, b, max_time, max_cost, blockwise, equal_prefix, equal_suffix))
+
+
+def middleOpcodes(a, b, max_time, max_cost, blockwise, equal_prefix, equal_suffix):
+    a_end, b_end = len(a) - equal_suffix, len(b) - equal_suffix
+    yield ('equal', 0, equal_prefix, 0, equal_prefix)
+    a, b = a[equal_prefix:a_end], b[equal_prefix:b_end]
+    a_ids, b_ids = intern(a, b)
+    if max_time is None and max_cost is None:
+        budget = fallback = None
+    else:
+        budget = DiffBudget(max_time, max_cost)
+
+        def fallback(alo, ahi, blo, bhi):
+            return blockOpcodes(a, b, a_ids, b_ids, alo, ahi, blo, bhi)
+
+    if blockwise and a and b:
+        opcodes = blockwiseOpcodes(a, b, a_ids, b_ids, budget, fallback)
+    else:
+        opcodes = histogramOpcodes(a_ids, b_ids, budget, fallback)
+    for tag, i1, i2, j1, j2 in opcodes:
+        yield (tag, i1 + equal_prefix, i2 + equal_prefix, j1 + equal_prefix, j2 + equal_prefix)
+    yield ('equal', a_end, a_end + equal_suffix, b_end, b_end + equal_suffix)
+
+
+def intern(a, b):
+    """Replaces the items of sequences a and b by small integers, equal items by the same one."""
+    ids = dict((item, i) for i, item in enumerate(dict.fromkeys(a + b)))
+    return list(map(ids.__getitem__, a)), list(map(ids.__getitem__, b))
+
+
+def findAnchor(a, b, alo, ahi, blo, bhi):
+    """Histogram diff step: the longest common run around the rarest token that is
+    in both regions, as (i, j, length), or None."""
+    # only tokens rare enough to be an anchor need their positions
+    counts = Counter(a[alo:ahi])
+    positions = {}
+    for i in range(alo, ahi):
+        if counts[a[i]] <= MAX_CHAIN:
+            positions.setdefault(a[i], []).append(i)
+
+    best, best_count, best_length = None, MAX_CHAIN + 1, 0
+    j = blo
+    while j < bhi:
+        occurrences = positions.get(b[j])
+        if occurrences is None or len(occurrences) > best_count:
+            j += 1
+            continue
+        count = len(occurrences)
+        next_j = j + 1
+        for i in occurrences:
+            start_a, start_b = i, j
+            while start_a > alo and start_b > blo and a[start_a - 1] == b[start_b - 1]:
+                start_a -= 1
+                start_b -= 1
+            end_a, end_b = i + 1, j + 1
+            while end_a < ahi and end_b < bhi and a[end_a] == b[end_b]:
+                end_a += 1
+                end_b += 1
+            length = end_a - start_a
+            if count < best_count or length > best_length:
+                best, best_count, best_length = (start_a, start_b, length), count, length
+            next_j = max(next_j, end_b)
+        j = next_j
+    return best
+
+
+def histogramOpcodes(a, b, budget=None, fallback=None, region=None):
+    """Yields opcodes for sequences a and b in order, without recursion.
+
+    Each region is trimmed of its common prefix and suffix, then split around the
+    anchor from findAnchor. Regions without one are left to difflib when small and
+    replaced whole otherwise. When the budget runs out the remaining regions go to
+    fallback, or are replaced whole. `region` limits the diff to (alo, ahi, blo, bhi)."""
+    stack = [region or (0, len(a), 0, len(b))]
+    while stack:
+        task = stack.pop()
+        if len(task) == 5:
+            yield task
+            continue
+        alo, ahi, blo, bhi = task
+
+        start_a, start_b = alo, blo
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            alo += 1
+            blo += 1
+        if alo > start_a:
+            yield ('equal', start_a, alo, start_b, blo)
+        end_a, end_b = ahi, bhi
+        while ahi > alo and bhi > blo and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        if ahi < end_a:
+            stack.append(('equal', ahi, end_a, bhi, end_b))
+
+        if alo == ahi or blo == bhi:
+            if alo < ahi:
+                yield ('delete', alo, ahi, blo, bhi)
+            elif blo < bhi:
+                yield ('insert', alo, ahi, blo, bhi)
+            continue
+        if budget is not None and not budget.spend(ahi - alo + bhi - blo):
+            if fallback is not None:
+                for opcode in fallback(alo, ahi, blo, bhi):
+                    yield opcode
+            else:
+                yield ('replace', alo, ahi, blo, bhi)
+            continue
+
+        anchor = findAnchor(a, b, alo, ahi, blo, bhi)
+        if anchor is None:
+            if (ahi - alo) * (bhi - blo) <= SMALL_REGION:
+                matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+                for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                    yield (tag, alo + i1, alo + i2, blo + j1, blo + j2)
+            else:
+                yield ('replace', alo, ahi, blo, bhi)
+            continue
+        i, j, length = anchor
+        stack.append((i + length, ahi, j + length, bhi))
+        stack.append(('equal', i, i + length, j, j + length))
+        stack.append((alo, i, blo, j))
+
+
+def blockStarts(tokens, lo, hi):
+    """Token positions in [lo, hi) where a block starts: lo and every block level tag."""
+    match = BLOCK_TAG_RE.match
+    return [lo] + [i for i, token in enumerate(tokens[lo + 1:hi], lo + 1) if token[0] == '<' and match(token)]
+
+
+def blockOpcodes(a, b, a_ids, b_ids, alo, ahi, blo, bhi):
+    """Opcodes for a region diffed block by block: unchanged blocks are equal,
+    everything else is replaced, inserted or deleted whole."""
+    a_starts, b_starts = blockStarts(a, alo, ahi), blockStarts(b, blo, bhi)
+    a_starts.append(ahi)
+    b_starts.append(bhi)
+    a_blocks, b_blocks = intern([tuple(a_ids[s:e]) for s, e in zip(a_starts, a_starts[1:])],
+                                [tuple(b_ids[s:e]) for s, e in zip(b_starts, b_starts[1:])])
+    for tag, i1, i2, j1, j2 in histogramOpcodes(a_blocks, b_blocks):
+        yield (tag, a_starts[i1], a_starts[i2], b_starts[j1], b_starts[j2])
+
+
+def blockwiseOpcodes(a, b, a_ids, b_ids, budget=None, fallback=None):
+    """Matches whole blocks first, then diffs tokens only inside replaced blocks."""
+    for tag, i1, i2, j1, j2 in blockOpcodes(a, b, a_ids, b_ids, 0, len(a), 0, len(b)):
+        if tag == 'replace':
+            for opcode in histogramOpcodes(a_ids, b_ids, budget, fallback, (i1, i2, j1, j2)):
+                yield opcode
+        else:
+            yield (tag, i1, i2, j1, j2)
+
+
+def commonLength(equal, hi):
+    """Largest m <= hi with equal(m), for a predicate that holds up to some m."""
+    lo = 0
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if equal(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def retokenize(text, previous, tokens):
+    """html2list(text), reusing `tokens` of the `previous` revision where the two agree.
+
+    Only the text from the first changed character on is tokenized again. Returns the
+    tokens and the numbers of tokens at the start and the end that are the same as in
+    `tokens`, which are `tokens`' own strings."""
+    limit = min(len(text), len(previous))
+    prefix_chars = commonLength(lambda m: text[:m] == previous[:m], limit)
+    suffix_chars = commonLength(lambda m: text[len(text) - m:] == previous[len(previous) - m:], limit - prefix_chars)
+
+    # a token is only certain to be the same if the character after it is, too
+    prefix, position = 0, 0
+    for token in tokens:
+        if position + len(token) >= prefix_chars:
+            break
+        position += len(token)
+        prefix += 1
+    tail = TOKEN_RE.findall(text, position)
+
+    # equal tokens at the end can't cover more than the equal characters
+    rest = min(len(tail), len(tokens) - prefix)
+    suffix, length = 0, 0
+    while suffix < rest and length + len(tail[-1 - suffix]) <= suffix_chars:
+        length += len(tail[-1 - suffix])
+        suffix += 1
+    if tail[len(tail) - suffix:] != tokens[len(tokens) - suffix:]:
+        suffix = commonLength(lambda m: tail[len(tail) - m:] == tokens[len(tokens) - m:], suffix)
+    return tokens[:prefix] + tail[:len(tail) - suffix] + tokens[len(tokens) - suffix:], prefix, suffix
+
+
+def contentHash(text):
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return hashlib.sha1(text).hexdigest()
+
+
+class LRUCache(object):
+    """In-process cache with the get/set interface of a Django cache, holding `maxsize` entries."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.entries.pop(key)
+            except KeyError:
+                return default
+            self.entries[key] = value
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+class CachedDiffer(object):
+    """textDiff for revision histories, caching by content hash.
+
+    Token lists are cached per revision and diff markup per pair of revisions, in
+    `cache` (anything with get(key) and set(key, value), such as a Django cache) or
+    else a local LRUCache. Diffing b against a tokenizes b by reusing the tokens of a
+    where they agree, and only compares the tokens in between. When that middle is
+    long, unchanged blocks are skipped before any token is compared.
+
+        differ = CachedDiffer(caches['default'])
+        html = differ.diff(previous.body, revision.body)
+    """
+
+    def __init__(self, cache=None, prefix='htmldiff', max_time=None, max_cost=None,
+                 blockwise_tokens=BLOCKWISE_TOKENS):
+        # token lists of large documents take megabytes, keep few of them locally
+        self.cache = cache if cache is not None else LRUCache(32)
+        self.prefix = prefix
+        self.max_time = max_time
+        self.max_cost = max_cost
+        self.blockwise_tokens = blockwise_tokens
+
+    def key(self, *parts):
+        return ':'.join((self.prefix,) + parts)
+
+    def tokens(self, text, previous=None):
+        """html2list(text), cached; with the text of a `previous` revision whose tokens can be reused."""
+        return self.tokenize(text, contentHash(text), previous)[0]
+
+    def tokenize(self, text, digest, previous=None):
+        """(tokens, equal_prefix, equal_suffix) of text, counting tokens shared with previous."""
+        key = self.key('tokens', digest)
+        tokens = self.cache.get(key)
+        if tokens is not None:
+            return tokens, 0, 0
+        if previous is not None:
+            tokens, prefix, suffix = retokenize(text, previous, self.tokens(previous))
+        else:
+            tokens, prefix, suffix = html2list(text), 0, 0
+        self.cache.set(key, tokens)
+        return tokens, prefix, suffix
+
+    def opcodes(self, a, b):
+        """Token lists of a and b and the diffOpcodes between them."""
+        a_tokens = self.tokens(a)
+        b_tokens, prefix, suffix = self.tokenize(b, contentHash(b), previous=a)
+        blockwise = max(len(a_tokens), len(b_tokens)) - prefix - suffix > self.blockwise_tokens
+        return a_tokens, b_tokens, diffOpcodes(a_tokens, b_tokens, self.max_time, self.max_cost, blockwise,
+                                               prefix, suffix)
+
+    def diff(self, a, b):
+        """textDiff(a, b), cached per pair of revisions."""
+        key = self.key('diff', contentHash(a), contentHash(b))
+        html = self.cache.get(key)
+        if html is None:
+            html = renderDiff(*self.opcodes(a, b))
+            self.cache.set(key, html)
+        return html
+
+
+def coalesce(opcodes):
+    """Merges adjacent opcodes the way difflib reports them: runs of equal, and runs
+    of changes as one replace, delete or insert."""
+    pending = None
+    for opcode in opcodes:
+        if opcode[1] == opcode[2] and opcode[3] == opcode[4]:
+            continue
+        if pending is None:
+            pending = opcode
+        elif (opcode[0] == 'equal') == (pending[0] == 'equal'):
+            i1, j1, i2, j2 = pending[1], pending[3], opcode[2], opcode[4]
+            if opcode[0] == 'equal':
+                tag = 'equal'
+            else:
+                tag = 'replace' if i1 < i2 and j1 < j2 else 'delete' if i1 < i2 else 'insert'
+            pending = (tag, i1, i2, j1, j2)
+        else:
+            yield pending
+            pending = opcode
+    if pending is not None:
+        yield pending
+
 
 if __name__ == '__main__':
     import sys
     try:
         a, b = sys.argv[1:3]
     except ValueError:
-        print "htmldiff: highlight the differences between two html files"
-        print "usage: " + sys.argv[0] + " a b"
+        print("htmldiff: highlight the differences between two html files")
+        print("usage: " + sys.argv[0] + " a b")
         sys.exit(1)
-    print textDiff(open(a).read(), open(b).read())
-    
+    print(textDiff(open(a).read(), open(b).read()))
@@ -0,0 +1,149 @@
+from __future__ import unicode_literals, division
+
+import io
+import csv
+import sys
+import json
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.redirects.models import Redirect
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import six
+
+from utils.middleware import (bump_redirect_generation, redirect_cache_key, redirect_filter, suppress_redirect_signals,
+                              warm_redirect_cache)
+
+FORMATS = ('csv', 'jsonl')
+CSV_HEADER = ['old_path', 'new_path']
+
+
+def read_csv(stream):
+    for row in csv.reader(stream):
+        if six.PY2:
+            row = [cell.decode('utf-8') for cell in row]
+        if not row or row == CSV_HEADER:
+            continue
+        yield row[0], row[1] if len(row) > 1 else ''
+
+
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            row = json.loads(line)
+            yield row['old_path'], row.get('new_path', '')
+
+
+def write_csv(stream, rows):
+    writer = csv.writer(stream)
+    if six.PY2:
+        writer.writerow([cell.encode('utf-8') for cell in CSV_HEADER])
+        writer.writerows([cell.encode('utf-8') for cell in row] for row in rows)
+    else:
+        writer.writerow(CSV_HEADER)
+        writer.writerows(rows)
+
+
+def write_jsonl(stream, rows):
+    for old_path, new_path in rows:
+        stream.write(json.dumps({'old_path': old_path, 'new_path': new_path}) + '\n')
+
+
+class Command(BaseCommand):
+    help = ("Imports redirects from, or exports them to, a CSV or JSON lines file. "
+            "Imports are upserted in batches and warm the redirect cache as they go.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=('import', 'export'))
+        parser.add_argument('path', help="File to read or write, '-' for stdin/stdout")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="Defaults to the file extension")
+        parser.add_argument('--site', type=int, default=None,
+                            help="Site id, defaults to SITE_ID")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--no-warm', action='store_false', dest='warm', default=True,
+                            help="Drop imported redirects from the cache instead of writing them")
+
+    def handle(self, action, path, **options):
+        fmt = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if fmt not in FORMATS:
+            raise CommandError("Unknown format %r, use --format" % fmt)
+        site_id = options['site'] or settings.SITE_ID
+        self.verbosity = options['verbosity']
+        if action == 'import':
+            self.import_redirects(path, fmt, site_id, options['batch_size'], options['warm'])
+        else:
+            self.export_redirects(path, fmt, site_id)
+
+    def open(self, path, mode, fmt):
+        if path == '-':
+            return sys.stdin if mode == 'r' else sys.stdout
+        if fmt == 'csv' and six.PY2:
+            # Python 2's csv module only handles byte strings, rows are decoded by read_csv
+            return io.open(path, mode + 'b')
+        return io.open(path, mode, encoding='utf-8', newline='' if fmt == 'csv' else None)
+
+    def import_redirects(self, path, fmt, site_id, batch_size, warm):
+        started = time.time()
+        total = created = updated = 0
+        stream = self.open(path, 'r', fmt)
+        rows = read_csv(stream) if fmt == 'csv' else read_jsonl(stream)
+        # bulk_create and update() don't send model signals anyway, this keeps any
+        # row-by-row fallback from doing a cache round trip per redirect as well
+        with suppress_redirect_signals():
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                batch_created, batch_updated = self.load_batch(site_id, batch, warm)
+                total += len(batch)
+                created += batch_created
+                updated += batch_updated
+                if self.verbosity > 1:
+                    self.stdout.write("%d rows, %d rows/s" % (total, total / (time.time() - started)))
+        if stream is not sys.stdin:
+            stream.close()
+
+        bump_redirect_generation()
+        redirect_filter.rebuild()
+        elapsed = time.time() - started
+        self.stdout.write("Imported %d rows (%d created, %d updated) in %.1fs, %d rows/s" % (
+            total, created, updated, elapsed, total / elapsed if elapsed else total))
+
+    def load_batch(self, site_id, batch, warm):
+        redirects = dict(batch)  # the last row wins for repeated paths
+        existing = dict(Redirect.objects.filter(site__id__exact=site_id, old_path__in=list(redirects))
+                        .values_list('old_path', 'new_path'))
+        changed = defaultdict(list)
+        for old_path, new_path in redirects.items():
+            if old_path in existing and existing[old_path] != new_path:
+                changed[new_path].append(old_path)
+        new = [Redirect(site_id=site_id, old_path=old_path, new_path=new_path)
+               for old_path, new_path in redirects.items() if old_path not in existing]
+
+        with transaction.atomic():
+            Redirect.objects.bulk_create(new)
+            for new_path, old_paths in changed.items():
+                Redirect.objects.filter(site__id__exact=site_id, old_path__in=old_paths).update(new_path=new_path)
+        if warm:
+            warm_redirect_cache(redirects.items(), len(redirects))
+        else:
+            # a cached DNE for an imported path would otherwise keep answering 404
+            cache.delete_many([redirect_cache_key(old_path) for old_path in redirects])
+        return len(new), sum(len(old_paths) for old_paths in changed.values())
+
+    def export_redirects(self, path, fmt, site_id):
+        rows = (Redirect.objects.filter(site__id__exact=site_id).order_by('old_path')
+                .values_list('old_path', 'new_path').iterator())
+        stream = self.open(path, 'w', fmt)
+        if fmt == 'csv':
+            write_csv(stream, rows)
+        else:
+            write_jsonl(stream, rows)
+        if stream is not sys.stdout:
+            stream.close()
@@ -0,0 +1,37 @@
+from __future__ import unicode_literals, division
+
+from django.core.management.base import BaseCommand
+
+from utils.profiling import FingerprintStats, histogram_percentile, load_worker_snapshots
+
+ORDERINGS = {
+    'total': lambda entry: entry['total'],
+    'count': lambda entry: entry['count'],
+    'mean': lambda entry: entry['total'] / entry['count'],
+    'p95': lambda entry: histogram_percentile(entry['histogram'], 95),
+}
+
+
+class Command(BaseCommand):
+    help = ("Shows the hottest query fingerprints across all workers, "
+            "as published by SQLProfilerMiddleware with SQL_STATS_ENABLED.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--order', choices=sorted(ORDERINGS), default='total')
+
+    def handle(self, **options):
+        snapshots = load_worker_snapshots()
+        merged = FingerprintStats.merge(snapshots)
+        self.stdout.write("%d fingerprints from %d workers, calls and total time are estimated from sampled requests" % (
+            len(merged), len(snapshots)))
+        hottest = sorted(merged.items(), key=lambda item: ORDERINGS[options['order']](item[1]), reverse=True)
+        for sql, entry in hottest[:options['limit']]:
+            histogram = entry['histogram']
+            views = sorted(entry['views'].items(), key=lambda item: item[1], reverse=True)
+            self.stdout.write("\n~%d calls (%d sampled), ~%.1fms total, %.2fms mean, p50 %.2fms, p95 %.2fms, p99 %.2fms" % (
+                entry['count'], entry['sampled'], entry['total'] * 1000, entry['total'] * 1000 / entry['count'],
+                histogram_percentile(histogram, 50), histogram_percentile(histogram, 95),
+                histogram_percentile(histogram, 99)))
+            self.stdout.write("  %s" % sql)
+            self.stdout.write("  views (sampled): %s" % ', '.join('%s (%d)' % view for view in views[:5]))
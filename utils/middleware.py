@@ -1,24 +1,56 @@
 from __future__ import unicode_literals, print_function
 
 import re
+import time
+import hashlib
+import datetime
+import random
 import logging
+import threading
+import itertools
+from collections import OrderedDict
+from contextlib import contextmanager
 from pprint import pprint
 
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.http import HttpResponseRedirect
-from django.utils import timezone
+from django.utils import six, timezone
 from django.contrib.redirects.models import Redirect
 from django import http
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.utils.cache import cc_delim_re, patch_vary_headers
 from django.db import connection
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:  # Django < 1.10 only knows MIDDLEWARE_CLASSES
+    class MiddlewareMixin(object):
+        def __init__(self, get_response=None):
+            self.get_response = get_response
+
+        def __call__(self, request):
+            response = None
+            if hasattr(self, 'process_request'):
+                response = self.process_request(request)
+            if not response:
+                response = self.get_response(request)
+            if hasattr(self, 'process_response'):
+                response = self.process_response(request, response)
+            return response
+
+
+from .bloom import BloomFilter
+from .profiling import (QueryProfile, QueryProfiler, SerializerProfile, SerializerProfiler, query_stats,
+                        SQL_PROFILER_SAMPLE_RATE)
+from .tracking import queryset_updated, objects_bulk_created, track_fields, get_loaded_value
 
 logger = logging.getLogger(__name__)
 
 
-class QueryDebuggerMiddleware(object):
+class QueryDebuggerMiddleware(MiddlewareMixin):
+    """Prints ``connection.queries`` for every request. Needs ``DEBUG``, see ``SQLProfilerMiddleware``."""
     def process_response(self, request, response):
         print("[")
         for query in connection.queries:
@@ -28,6 +60,145 @@ class QueryDebuggerMiddleware(object):
         return response
 
 
+SQL_PROFILER_SLOW_MS = getattr(settings, 'SQL_PROFILER_SLOW_MS', 500)
+SQL_PROFILER_SLOWEST = getattr(settings, 'SQL_PROFILER_SLOWEST', 5)
+SQL_PROFILER_SERVER_TIMING = getattr(settings, 'SQL_PROFILER_SERVER_TIMING', True)
+SQL_STATS_ENABLED = getattr(settings, 'SQL_STATS_ENABLED', False)
+SQL_PROFILER_SERIALIZERS = getattr(settings, 'SQL_PROFILER_SERIALIZERS', True)
+
+
+class SQLProfilerMiddleware(MiddlewareMixin):
+    """
+    Profiles the queries of a sample of requests, on all database aliases and without ``DEBUG``.
+
+    ``SQL_PROFILER_SAMPLE_RATE`` of requests (0.1 by default) are profiled. Their summary is
+    logged at INFO level, with the profile as ``extra={'sql_profile': ...}``, and added as a
+    ``db`` entry to the ``Server-Timing`` header unless ``SQL_PROFILER_SERVER_TIMING`` is off.
+    Requests that spend more than ``SQL_PROFILER_SLOW_MS`` in the database are logged at
+    WARNING level instead, with their ``SQL_PROFILER_SLOWEST`` slowest statements.
+
+    With ``SQL_STATS_ENABLED`` the sampled queries also feed the process-wide
+    ``utils.profiling.query_stats``, which is published every ``SQL_STATS_FLUSH_SECONDS``
+    for the ``sqlstats`` management command.
+
+    With ``SQL_PROFILER_SERIALIZERS`` the sampled requests also time the serializers of
+    ``utils.serializers``: building their fields against serializing, as ``fields`` and
+    ``serialize`` entries of ``Server-Timing`` and as ``serializer_profile`` in the logged profile.
+    """
+    def process_request(self, request):
+        if random.random() < SQL_PROFILER_SAMPLE_RATE:
+            profile = QueryProfile(SQL_PROFILER_SLOWEST, query_stats if SQL_STATS_ENABLED else None)
+            profiler = request._sql_profiler = QueryProfiler(profile)
+            profiler.__enter__()
+            if SQL_PROFILER_SERIALIZERS:
+                request._serializer_profiler = SerializerProfiler(SerializerProfile())
+                request._serializer_profiler.__enter__()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profiler = getattr(request, '_sql_profiler', None)
+        if profiler is not None:
+            try:
+                profiler.profile.view = '.'.join((view_func.__module__, view_func.__name__))
+            except AttributeError:
+                pass  # if view_func doesn't have __module__ or __name__ attrs
+
+    def process_response(self, request, response):
+        profiler = getattr(request, '_sql_profiler', None)
+        if profiler is None:
+            return response
+        del request._sql_profiler
+        profiler.__exit__(None, None, None)
+        profile = profiler.profile
+        if SQL_STATS_ENABLED:
+            query_stats.maybe_flush()
+        serializer_profiler = getattr(request, '_serializer_profiler', None)
+        if serializer_profiler is not None:
+            del request._serializer_profiler
+            serializer_profiler.__exit__(None, None, None)
+
+        if SQL_PROFILER_SERVER_TIMING:
+            timing = 'db;dur=%.1f;desc="%d queries"' % (profile.duration * 1000, profile.count)
+            if serializer_profiler is not None and serializer_profiler.profile.classes:
+                timing += ', fields;dur=%.1f, serialize;dur=%.1f' % (serializer_profiler.profile.build * 1000,
+                                                                      serializer_profiler.profile.serialize * 1000)
+            if response.has_header('Server-Timing'):
+                timing = ', '.join((response['Server-Timing'], timing))
+            response['Server-Timing'] = timing
+
+        summary = profile.as_dict()
+        summary['path'] = request.path
+        summary['method'] = request.method
+        summary['status'] = response.status_code
+        if serializer_profiler is not None:
+            summary['serializer_profile'] = serializer_profiler.profile.as_dict()
+        if profile.duration * 1000 >= SQL_PROFILER_SLOW_MS:
+            logger.warning("Slow request %s %s: %d queries in %.1fms, %d duplicates\n%s",
+                           request.method, request.path, profile.count, profile.duration * 1000, profile.duplicates,
+                           '\n'.join('  %(duration_ms).1fms %(sql)s' % query for query in summary['slowest']),
+                           extra={'sql_profile': summary})
+        else:
+            logger.info("%s %s: %d queries in %.1fms, %d duplicates",
+                        request.method, request.path, profile.count, profile.duration * 1000, profile.duplicates,
+                        extra={'sql_profile': summary})
+        return response
+
+
+class ParsedHeader(object):
+    """
+    Ordered, case-insensitive set of the comma separated entries of a ``Vary`` or
+    ``Cache-Control`` header. Entries may have a value, as in ``max-age=60``.
+    """
+    def __init__(self, value=None):
+        self.entries = OrderedDict()
+        if value:
+            for entry in cc_delim_re.split(value):
+                name, sep, entry_value = entry.partition('=')
+                name = name.strip()
+                if name:
+                    self.entries[name.lower()] = (name, entry_value.strip() if sep else None)
+
+    def __contains__(self, name):
+        return name.lower() in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, name, value=None):
+        key = name.lower()
+        if key not in self.entries or value is not None:
+            self.entries[key] = (name, value)
+
+    def discard(self, name):
+        self.entries.pop(name.lower(), None)
+
+    def serialize(self):
+        return ', '.join(name if value is None else '%s=%s' % (name, value) for name, value in self.entries.values())
+
+
+def parsed_header(response, header):
+    """
+    Returns the ``ParsedHeader`` for ``header``, parsing it only once per response as long
+    as it is changed through ``store_header``.
+    """
+    raw = response[header] if response.has_header(header) else None
+    parsed_headers = response.__dict__.setdefault('_parsed_headers', {})
+    cached = parsed_headers.get(header)
+    if cached is not None and cached[0] == raw:
+        return cached[1]
+    parsed = ParsedHeader(raw)
+    parsed_headers[header] = (raw, parsed)
+    return parsed
+
+
+def store_header(response, header, parsed):
+    raw = parsed.serialize() or None
+    if raw is not None:
+        response[header] = raw
+    elif response.has_header(header):
+        del response[header]
+    response.__dict__.setdefault('_parsed_headers', {})[header] = (raw, parsed)
+
+
 def remove_vary_headers(response, deleteheaders):
     """
     Removes the "Vary" header in the given HttpResponse object.
@@ -37,48 +208,165 @@ def remove_vary_headers(response, deleteheaders):
     # implementations may rely on the order of the Vary contents in, say,
     # computing an MD5 hash.
     if response.has_header('Vary'):
-        vary_headers = cc_delim_re.split(response['Vary'])
-        # Use .lower() here so we treat headers as case-insensitive.
-        deleteheaders = set(deleteheaders)
-        headers = [header for header in vary_headers if header.lower() not in deleteheaders]
-        if headers:
-            response['Vary'] = ', '.join(headers)
-        else:
-            del response['Vary']
+        vary = parsed_header(response, 'Vary')
+        for header in deleteheaders:
+            vary.discard(header)
+        store_header(response, 'Vary', vary)
+
+
+def is_bot(request, response):
+    return hasattr(request, 'user_agent') and request.user_agent.is_bot
+
+
+def is_authenticated(request, response):
+    return hasattr(request, 'user') and request.user.is_authenticated()
+
+
+HEADER_RULE_CONDITIONS = {
+    'always': lambda request, response: True,
+    'bot': is_bot,
+    'ajax': lambda request, response: request.is_ajax(),
+    'authenticated': is_authenticated,
+    'anonymous': lambda request, response: not is_authenticated(request, response),
+}
+
+HEADER_RULE_ACTIONS = {
+    'add_vary': ('Vary', 'add'),
+    'remove_vary': ('Vary', 'discard'),
+    'add_cache_control': ('Cache-Control', 'add'),
+    'remove_cache_control': ('Cache-Control', 'discard'),
+}
+
+# what VaryOnBots, VaryOnAjax and RemoveCookieVaryHeader do
+DEFAULT_HEADER_RULES = (
+    ('bot', 'add_vary', 'User-Agent'),
+    ('ajax', 'add_vary', 'X-Requested-With'),
+    ('always', 'add_vary', 'Set-Cookie'),
+)
+
+
+class HeaderRulesMiddleware(MiddlewareMixin):
+    """
+    Applies the ``HEADER_RULES`` setting to the ``Vary`` and ``Cache-Control`` headers of
+    every response, with one parse and one serialization per header, replacing a stack
+    of ``VaryOnBots``, ``VaryOnAjax``, ``RemoveCookieVaryHeader`` and similar middleware.
+
+    Rules are ``(condition, action, value)`` tuples, applied in order:
+
+    * ``condition`` is one of ``always``, ``bot``, ``ajax``, ``authenticated``,
+      ``anonymous``, or a callable taking the request and the response
+    * ``action`` is one of ``add_vary``, ``remove_vary``, ``add_cache_control``,
+      ``remove_cache_control``
+    * ``value`` is a header name for the vary actions, and a directive such as
+      ``private`` or ``max-age=60`` for the cache control actions
+    """
+    def __init__(self, get_response=None):
+        super(HeaderRulesMiddleware, self).__init__(get_response)
+        self.rules = []
+        for condition, action, value in getattr(settings, 'HEADER_RULES', DEFAULT_HEADER_RULES):
+            if not callable(condition):
+                condition = HEADER_RULE_CONDITIONS[condition]
+            header, operation = HEADER_RULE_ACTIONS[action]
+            name, sep, directive_value = value.partition('=')
+            self.rules.append((condition, header, operation, name, directive_value if sep else None))
+
+    def process_response(self, request, response):
+        changed = {}
+        for condition, header, operation, name, value in self.rules:
+            if not condition(request, response):
+                continue
+            parsed = changed.get(header)
+            if parsed is None:
+                parsed = changed[header] = parsed_header(response, header)
+            if operation == 'add':
+                parsed.add(name, value)
+            else:
+                parsed.discard(name)
+        for header, parsed in changed.items():
+            store_header(response, header, parsed)
+        return response
 
 
-class VaryOnBots(object):
+class VaryOnBots(MiddlewareMixin):
     def process_response(self, request, response):
         if hasattr(request, 'user_agent') and request.user_agent.is_bot:
             patch_vary_headers(response, ("User-Agent",))
         return response
 
-class VaryOnAjax(object):
+class VaryOnAjax(MiddlewareMixin):
     def process_response(self, request, response):
         if request.is_ajax():
             patch_vary_headers(response, ("X-Requested-With",))
         return response
 
 
-class RemoveCookieVaryHeader(object):
+class RemoveCookieVaryHeader(MiddlewareMixin):
     def process_response(self, request, response):
         # remove_vary_headers(response, ("cookie",))
         patch_vary_headers(response, ("Set-Cookie",))
         return response
 
 
-class StripCookieMiddleware(object):
+class StripCookieMiddleware(MiddlewareMixin):
+    """Strips ``__utm*`` style tracking cookies. See ``CookieAllowlistMiddleware`` for a stricter version."""
     strip_re = re.compile(r'\b(__[^=]+=.+?(?:; |$))')
 
     def process_request(self, request):
-        try:
-            cookie = self.strip_re.sub('', request.META['HTTP_COOKIE'])
-            request.META['HTTP_COOKIE'] = cookie
-        except:
-            pass
+        cookie = request.META.get('HTTP_COOKIE')
+        if cookie:
+            request.META['HTTP_COOKIE'] = self.strip_re.sub('', cookie)
+
+
+class CookieAllowlistMiddleware(MiddlewareMixin):
+    """
+    Drops every cookie except those named in ``COOKIE_ALLOWLIST``, which defaults to the
+    session and CSRF cookies, before anything reads ``request.COOKIES``.
+
+    Put it first, and have the upstream cache (e.g. Varnish) apply the same allowlist, so
+    anonymous requests carrying only analytics cookies end up with an empty ``Cookie``
+    header and become cacheable. ``CookieAllowlistMiddleware.stats()`` counts how often
+    that happened.
+    """
+    counters = {'requests': 0, 'with_cookies': 0, 'became_cacheable': 0, 'cookies_dropped': 0}
+
+    def __init__(self, get_response=None):
+        super(CookieAllowlistMiddleware, self).__init__(get_response)
+        allowlist = getattr(settings, 'COOKIE_ALLOWLIST', (settings.SESSION_COOKIE_NAME, settings.CSRF_COOKIE_NAME))
+        self.needles = tuple('%s=' % name for name in allowlist)
+
+    def allowed_cookies(self, cookie):
+        # a few str.find calls instead of parsing or regex-scanning a header full of analytics cookies
+        kept = []
+        for needle in self.needles:
+            start = cookie.find(needle)
+            while start != -1:
+                if start == 0 or cookie[start - 1] in '; ':
+                    end = cookie.find(';', start)
+                    kept.append(cookie[start:end] if end != -1 else cookie[start:])
+                start = cookie.find(needle, start + 1)
+        return kept
+
+    def process_request(self, request):
+        counters = self.counters
+        counters['requests'] += 1
+        cookie = request.META.get('HTTP_COOKIE')
+        if not cookie:
+            return
+        counters['with_cookies'] += 1
+        kept = self.allowed_cookies(cookie)
+        counters['cookies_dropped'] += cookie.count(';') + 1 - len(kept)
+        if kept:
+            request.META['HTTP_COOKIE'] = '; '.join(kept)
+        else:
+            request.META['HTTP_COOKIE'] = ''
+            counters['became_cacheable'] += 1
+
+    @classmethod
+    def stats(cls):
+        return dict(cls.counters)
 
 
-class DeleteSessionOnLogoutMiddleware(object):
+class DeleteSessionOnLogoutMiddleware(MiddlewareMixin):
     """Delete sessionid and csrftoken cookies on logout, for better compatibility with upstream caches."""
     def process_response(self, request, response):
         if getattr(request, '_delete_session', False):
@@ -95,7 +383,7 @@ class DeleteSessionOnLogoutMiddleware(object):
             pass  # if view_func doesn't have __module__ or __name__ attrs
 
 
-class PrivateBetaMiddleware(object):
+class PrivateBetaMiddleware(MiddlewareMixin):
     """
     Stolen from https://github.com/pragmaticbadger/django-privatebeta
 
@@ -117,47 +405,604 @@ class PrivateBetaMiddleware(object):
     A list of full view names that should always pass through.
 
     ``PRIVATEBETA_ALWAYS_ALLOW_MODULES``
-    A list of modules that should always pass through. All
-    views in ``django.contrib.auth.views``, ``django.views.static``
-    and ``privatebeta.views`` will pass through unless they are
+    A list of modules that should always pass through, including their
+    submodules. All views in ``django.contrib.auth.views`` and
+    ``django.views.static`` will pass through unless they are
     explicitly prohibited in ``PRIVATEBETA_NEVER_ALLOW_VIEWS``
+    ``PRIVATEBETA_NEVER_ALLOW_URLS`` and ``PRIVATEBETA_ALWAYS_ALLOW_URLS``
+    Lists of regular expressions matched against the request path,
+    checked before the view rules in the same deny then allow order.
+    ``PRIVATEBETA_END_TIME``
+    A datetime after which the beta is over and every request passes.
     ``PRIVATEBETA_REDIRECT_URL``
     The URL to redirect to. Can be relative or absolute.
+
+    All rules are compiled once, and the decision for each view is
+    memoized, so a request costs a few dict and attribute lookups.
     """
+    default_allow_modules = ('django.contrib.auth.views', 'django.views.static')
 
-    def __init__(self):
+    def __init__(self, get_response=None):
+        super(PrivateBetaMiddleware, self).__init__(get_response)
         self.enable_beta = getattr(settings, 'PRIVATEBETA_ENABLE_BETA', True)
         self.beta_end_time = getattr(settings, 'PRIVATEBETA_END_TIME', None)
-        self.always_allow_modules = getattr(settings, 'PRIVATEBETA_ALWAYS_ALLOW_MODULES', [])
         self.redirect_url = getattr(settings, 'PRIVATEBETA_REDIRECT_URL', '/')
+        self.never_allow_views = frozenset(getattr(settings, 'PRIVATEBETA_NEVER_ALLOW_VIEWS', ()))
+        self.always_allow_views = frozenset(getattr(settings, 'PRIVATEBETA_ALWAYS_ALLOW_VIEWS', ()))
+        modules = self.default_allow_modules + tuple(getattr(settings, 'PRIVATEBETA_ALWAYS_ALLOW_MODULES', ()))
+        self.always_allow_modules = re.compile(r'(?:%s)(?:\.|$)' % '|'.join(re.escape(module) for module in modules))
+        self.never_allow_urls = self.compile_urls(getattr(settings, 'PRIVATEBETA_NEVER_ALLOW_URLS', ()))
+        self.always_allow_urls = self.compile_urls(getattr(settings, 'PRIVATEBETA_ALWAYS_ALLOW_URLS', ()))
+        self.decisions = {}
+
+        self.end_timestamp = None
+        if self.beta_end_time is not None:
+            if timezone.is_aware(self.beta_end_time):
+                epoch = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+                self.end_timestamp = (self.beta_end_time - epoch).total_seconds()
+            else:
+                self.end_timestamp = time.mktime(self.beta_end_time.timetuple())
+        self.active = self.enable_beta and not self.ended()
+        if not self.active:
+            raise MiddlewareNotUsed
+
+    @staticmethod
+    def compile_urls(patterns):
+        if not patterns:
+            return None
+        return re.compile('|'.join('(?:%s)' % pattern for pattern in patterns))
+
+    def ended(self):
+        return self.end_timestamp is not None and time.time() >= self.end_timestamp
+
+    def allows_view(self, view_func):
+        module = getattr(view_func, '__module__', None) or ''
+        view_name = '.'.join((module, getattr(view_func, '__name__', type(view_func).__name__)))
+        if view_name in self.never_allow_views:
+            return False
+        return view_name in self.always_allow_views or self.always_allow_modules.match(module) is not None
 
     def process_view(self, request, view_func, view_args, view_kwargs):
-        if request.path == self.redirect_url or request.user.is_authenticated() or not self.enable_beta or (self.beta_end_time and timezone.now() >= self.beta_end_time):
+        if not self.active:
+            return
+        if request.path == self.redirect_url or request.user.is_authenticated():
             # User is logged in, no need to check anything else.
             return
-        whitelisted_modules = ['django.contrib.auth.views', 'django.views.static', ]
-        if self.always_allow_modules:
-            whitelisted_modules += self.always_allow_modules
+        if self.never_allow_urls is not None and self.never_allow_urls.match(request.path):
+            return self.deny()
+        if self.always_allow_urls is not None and self.always_allow_urls.match(request.path):
+            return
+
+        try:
+            allowed = self.decisions[view_func]
+        except KeyError:
+            allowed = self.decisions[view_func] = self.allows_view(view_func)
+        except TypeError:
+            allowed = self.allows_view(view_func)  # unhashable callable
+        if not allowed:
+            return self.deny()
 
-        if '%s' % view_func.__module__ in whitelisted_modules:
+    def deny(self):
+        # the end time only matters for requests that would be redirected
+        if self.ended():
+            self.active = False  # for good, nothing is checked from now on
             return
-        else:
-            return HttpResponseRedirect(self.redirect_url)
+        return HttpResponseRedirect(self.redirect_url)
+
+
+PAGE_CACHE_ALIAS = getattr(settings, 'PAGE_CACHE_ALIAS', 'default')
+PAGE_CACHE_KEY_PREFIX = getattr(settings, 'PAGE_CACHE_KEY_PREFIX', 'page')
+PAGE_CACHE_SECONDS = getattr(settings, 'PAGE_CACHE_SECONDS', 60)
+PAGE_CACHE_STALE_SECONDS = getattr(settings, 'PAGE_CACHE_STALE_SECONDS', 300)
+PAGE_CACHE_LOCK_SECONDS = getattr(settings, 'PAGE_CACHE_LOCK_SECONDS', 30)
+PAGE_CACHE_WAIT_SECONDS = getattr(settings, 'PAGE_CACHE_WAIT_SECONDS', 2)
+PAGE_CACHE_POLL_SECONDS = 0.05
+# Vary entries that don't split the cache, as bots and ajax are part of the key.
+# Cookie is only covered for requests without any cookies, see PageCacheMiddleware.is_storable
+PAGE_CACHE_KEYED_VARY = frozenset(('user-agent', 'x-requested-with', 'set-cookie'))
+
+
+def page_cache_tag(obj):
+    """Tag for a model class, or for a single instance of it."""
+    if isinstance(obj, type):
+        return obj._meta.label_lower if hasattr(obj._meta, 'label_lower') else '%s.%s' % (obj._meta.app_label, obj._meta.model_name)
+    return '%s:%s' % (page_cache_tag(type(obj)), obj.pk)
+
+
+def page_cache_tag_key(tag):
+    return u":".join((PAGE_CACHE_KEY_PREFIX, 'tag', tag))
+
+
+def page_cache_tag_versions(page_cache, tags):
+    """Current versions of ``tags``, starting the missing ones."""
+    tag_keys = dict((page_cache_tag_key(tag), tag) for tag in tags)
+    versions = page_cache.get_many(list(tag_keys))
+    for tag_key in tag_keys:
+        if tag_key not in versions:
+            # start from a random version, so a lost version never revalidates old pages
+            page_cache.add(tag_key, random.randint(1, 2 ** 30), None)
+            versions[tag_key] = page_cache.get(tag_key)
+    return dict((tag, versions[tag_key]) for tag_key, tag in tag_keys.items())
+
+
+def add_page_cache_tags(request, *tags):
+    """
+    Marks the page being rendered as depending on ``tags``, strings or model classes and instances.
+
+    Their versions are taken now, so tag before reading the data: a page whose tags are
+    invalidated while it renders is stored as already expired.
+    """
+    versions = request.__dict__.setdefault('_page_cache_tags', {})
+    tags = set(tag if isinstance(tag, six.string_types) else page_cache_tag(tag) for tag in tags)
+    new_tags = [tag for tag in tags if tag not in versions]
+    if new_tags and getattr(request, '_page_cache_key', None) is not None:
+        versions.update(page_cache_tag_versions(caches[PAGE_CACHE_ALIAS], new_tags))
+
+
+def invalidate_page_cache_tags(*tags):
+    """Expires every cached page tagged with any of ``tags``."""
+    page_cache = caches[PAGE_CACHE_ALIAS]
+    for tag in tags:
+        try:
+            page_cache.incr(page_cache_tag_key(tag))
+        except ValueError:
+            pass  # no page with this tag was cached since the version was lost
+
+
+def register_page_cache_model(model):
+    """Invalidates the tags of ``model`` and of the saved or deleted instance on every change."""
+    def invalidate(instance, **kwargs):
+        invalidate_page_cache_tags(page_cache_tag(model), page_cache_tag(instance))
+
+    dispatch_uid = 'page_cache_%s' % page_cache_tag(model)
+    post_save.connect(invalidate, sender=model, weak=False, dispatch_uid=dispatch_uid)
+    post_delete.connect(invalidate, sender=model, weak=False, dispatch_uid=dispatch_uid)
+
+
+class PageCacheMiddleware(MiddlewareMixin):
+    """
+    Full page cache for anonymous GET and HEAD requests.
+
+    Unlike Django's ``UpdateCacheMiddleware`` it understands the variants this package
+    produces: bots and ajax requests are cached separately, and any request with a session
+    cookie or an ``Authorization`` header bypasses the cache. Use it with
+    ``CookieAllowlistMiddleware`` and ``DeleteSessionOnLogoutMiddleware`` so that anonymous
+    and logged out visitors really do arrive without cookies.
+
+    Pages are fresh for ``PAGE_CACHE_SECONDS`` and then served stale for up to
+    ``PAGE_CACHE_STALE_SECONDS`` while a single request re-renders them. On a miss only one
+    request renders the page; the others wait up to ``PAGE_CACHE_WAIT_SECONDS`` for it, or
+    until it turns out not to be storable.
+
+    Views tag pages with ``add_page_cache_tags``; ``invalidate_page_cache_tags`` and
+    ``register_page_cache_model`` expire every page carrying a tag at once.
+
+    Cookies other than the session cookie, e.g. those kept by ``COOKIE_ALLOWLIST``, are not
+    part of the key, so a response that varies on ``Cookie`` is only stored for, and served
+    to, requests without any cookies.
+    """
+    sleep = staticmethod(time.sleep)
+
+    def __init__(self, get_response=None):
+        super(PageCacheMiddleware, self).__init__(get_response)
+        self.cache = caches[PAGE_CACHE_ALIAS]
+
+    def cache_key(self, request):
+        variant = ''
+        if is_bot(request, None):
+            variant += 'b'
+        if request.is_ajax():
+            variant += 'x'
+        url = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+        return u":".join((PAGE_CACHE_KEY_PREFIX, variant or '-', url))
+
+    def is_cacheable(self, request):
+        return (request.method in ('GET', 'HEAD') and
+                settings.SESSION_COOKIE_NAME not in request.COOKIES and
+                'HTTP_AUTHORIZATION' not in request.META)
+
+    def lookup(self, request, key):
+        """Returns the cached entry for ``key`` if it fits ``request`` and none of its tags were invalidated."""
+        entry = self.cache.get(key)
+        if entry is not None and entry.get('vary_cookie') and request.COOKIES:
+            return None  # rendered for a request without cookies
+        if entry is not None and entry['tags']:
+            versions = self.cache.get_many([page_cache_tag_key(tag) for tag in entry['tags']])
+            for tag, version in entry['tags'].items():
+                if versions.get(page_cache_tag_key(tag)) != version:
+                    return None
+        return entry
+
+    def respond(self, entry, status):
+        response = http.HttpResponse(entry['content'], status=entry['status'])
+        for header, value in entry['headers']:
+            response[header] = value
+        response['X-Page-Cache'] = status
+        return response
+
+    def process_request(self, request):
+        if not self.is_cacheable(request):
+            return
+        key = self.cache_key(request)
+        entry = self.lookup(request, key)
+        if entry is not None:
+            if time.time() < entry['fresh_until']:
+                return self.respond(entry, 'HIT')
+            if not self.lock(key):
+                return self.respond(entry, 'STALE')  # somebody else is already re-rendering it
+            request._page_cache_key, request._page_cache_locked = key, True
+            return
+
+        if self.lock(key):
+            request._page_cache_key, request._page_cache_locked = key, True
+            return
+        # coalesce with the request holding the lock instead of rendering the page again
+        deadline = time.time() + PAGE_CACHE_WAIT_SECONDS
+        while time.time() < deadline:
+            self.sleep(PAGE_CACHE_POLL_SECONDS)
+            entry = self.lookup(request, key)
+            if entry is not None:
+                return self.respond(entry, 'HIT')
+            if self.cache.get(key + ':lock') is None:
+                break  # rendered but not stored, e.g. it set a cookie: no use waiting any longer
+        request._page_cache_key = key  # render and store it ourselves
+
+    def lock(self, key):
+        return self.cache.add(key + ':lock', 1, PAGE_CACHE_LOCK_SECONDS)
+
+    def is_storable(self, request, response):
+        if response.status_code != 200 or response.streaming or response.cookies:
+            return False
+        cache_control = parsed_header(response, 'Cache-Control')
+        if 'private' in cache_control or 'no-store' in cache_control or 'no-cache' in cache_control:
+            return False
+        vary = parsed_header(response, 'Vary')
+        return all(header in PAGE_CACHE_KEYED_VARY or (header == 'cookie' and not request.COOKIES)
+                   for header in vary.entries)
+
+    def process_response(self, request, response):
+        key = getattr(request, '_page_cache_key', None)
+        if key is None:
+            return response
+        try:
+            if self.is_storable(request, response):
+                self.store(request, key, response)
+        finally:
+            if getattr(request, '_page_cache_locked', False):
+                self.cache.delete(key + ':lock')
+        return response
+
+    def store(self, request, key, response):
+        # the versions from when the view added the tags, not the current ones
+        tags = getattr(request, '_page_cache_tags', {})
+        entry = {
+            'content': response.content,
+            'status': response.status_code,
+            'headers': [(header, value) for header, value in response.items() if header != 'X-Page-Cache'],
+            'fresh_until': time.time() + PAGE_CACHE_SECONDS,
+            'tags': tags,
+            'vary_cookie': 'cookie' in parsed_header(response, 'Vary'),
+        }
+        self.cache.set(key, entry, PAGE_CACHE_SECONDS + PAGE_CACHE_STALE_SECONDS)
+        response['X-Page-Cache'] = 'MISS'
 
 
 DNE = "!!!404!!!"
 REDIRECT_KEY_PREFIX = getattr(settings, 'CACHE_REDIRECT_KEY_PREFIX', 'redirect')
 CACHE_REDIRECT_TIMEOUT = getattr(settings, 'CACHE_REDIRECT_SECONDS', 1000000000)
+CACHE_REDIRECT_IN_PROCESS = getattr(settings, 'CACHE_REDIRECT_IN_PROCESS', False)
+CACHE_REDIRECT_CHECK_SECONDS = getattr(settings, 'CACHE_REDIRECT_CHECK_SECONDS', 5)
+CACHE_REDIRECT_FILTER = getattr(settings, 'CACHE_REDIRECT_FILTER', False)
+CACHE_REDIRECT_FILTER_ERROR_RATE = getattr(settings, 'CACHE_REDIRECT_FILTER_ERROR_RATE', 0.01)
+CACHE_REDIRECT_DELTA_SECONDS = getattr(settings, 'CACHE_REDIRECT_DELTA_SECONDS', 3600)
+# a process further behind than this reloads everything instead of applying the changes one by one
+CACHE_REDIRECT_MAX_DELTAS = getattr(settings, 'CACHE_REDIRECT_MAX_DELTAS', 100)
 
 def redirect_cache_key(path):
     return u":".join((REDIRECT_KEY_PREFIX, path))
 
+# paths always start with a slash, so this can never collide with a redirect_cache_key
+REDIRECT_GENERATION_KEY = u":".join((REDIRECT_KEY_PREFIX, 'generation'))
+
+
+def redirect_delta_key(generation):
+    return u":".join((REDIRECT_KEY_PREFIX, 'delta', six.text_type(generation)))
+
+
+def strip_trailing_slash(path):
+    return path[:path.rfind('/')] + path[path.rfind('/') + 1:]
+
+
+def bump_redirect_generation(added=None, removed=None):
+    """
+    Tells every process that its copy of the redirects is out of date.
+
+    ``added`` are the ``(old_path, new_path)`` pairs that were created or changed, and
+    ``removed`` the ``old_path`` values that are gone. They are published with the new
+    generation, so the other processes apply them instead of reloading every redirect.
+    Without them, e.g. after a bulk import, every process reloads.
+
+    Returns the new generation, or ``None`` if it is unknown.
+    """
+    # start from a random generation, so a lost counter never picks up the deltas of the old one
+    generation = random.randint(1, 2 ** 30)
+    if not cache.add(REDIRECT_GENERATION_KEY, generation, CACHE_REDIRECT_TIMEOUT):
+        try:
+            generation = cache.incr(REDIRECT_GENERATION_KEY)
+        except ValueError:
+            generation = None  # expired in between, the next add starts a new generation
+    if generation is not None and (added is not None or removed is not None):
+        cache.set(redirect_delta_key(generation), (list(added or ()), list(removed or ())),
+                  CACHE_REDIRECT_DELTA_SECONDS)
+    redirect_table.expire()
+    redirect_filter.expire()
+    return generation
+
+
+class RedirectIndex(object):
+    """
+    Per-process data built from the ``Redirect`` rows for ``SITE_ID``.
+
+    Subclasses implement ``load``, and ``apply_delta`` for the changes published by
+    ``bump_redirect_generation``. The generation counter in the cache is checked at most
+    every ``CACHE_REDIRECT_CHECK_SECONDS``, so most lookups need no network round trip.
+    When it moved, the deltas of the missed generations are applied; if any of them is
+    gone, or more than ``CACHE_REDIRECT_MAX_DELTAS`` were missed, everything is reloaded.
+    """
+
+    def __init__(self, check_interval=CACHE_REDIRECT_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self.generation = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    def load(self):
+        raise NotImplementedError
+
+    def apply_delta(self, added, removed):
+        """Applies one published change, returns ``False`` if a full reload is needed instead."""
+        return False
+
+    def apply_deltas(self, generation):
+        if self.generation is None or not 0 < generation - self.generation <= CACHE_REDIRECT_MAX_DELTAS:
+            return False
+        keys = [redirect_delta_key(missed) for missed in range(self.generation + 1, generation + 1)]
+        deltas = cache.get_many(keys)
+        if len(deltas) < len(keys):
+            return False  # expired, or not published yet
+        for key in keys:
+            added, removed = deltas[key]
+            if not self.apply_delta(added, removed):
+                return False
+        return True
+
+    def expire(self):
+        self.checked_at = 0
+
+    def refresh(self):
+        now = time.time()
+        if now - self.checked_at < self.check_interval:
+            return
+        with self.lock:
+            if now - self.checked_at < self.check_interval:
+                return
+            generation = cache.get(REDIRECT_GENERATION_KEY, 0)
+            if generation != self.generation:
+                if not self.apply_deltas(generation):
+                    self.load()
+                self.generation = generation
+            self.checked_at = now
+
+    def advance(self, generation):
+        """Accepts ``generation`` without reloading, after applying its change locally."""
+        if generation is not None and self.generation is not None and self.generation == generation - 1:
+            self.generation = generation
+
+
+class RedirectTable(RedirectIndex):
+    """
+    Compiled copy of all redirects, used with ``CACHE_REDIRECT_IN_PROCESS``.
+
+    ``old_path`` values are compiled by their shape:
+
+    * ``^...`` is a regular expression, ``new_path`` may use ``\\1`` style group references
+    * ``/prefix/*`` matches everything below ``/prefix/``, a trailing ``*`` in ``new_path``
+      is replaced with the rest of the matched path
+    * anything else is an exact match
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(RedirectTable, self).__init__(*args, **kwargs)
+        self.exact = {}
+        self.prefixes = []
+        self.patterns = []
+
+    def load(self):
+        exact, prefixes, patterns = {}, [], []
+        rows = Redirect.objects.filter(site__id__exact=settings.SITE_ID).values_list('old_path', 'new_path')
+        for old_path, new_path in rows.iterator():
+            if old_path.startswith('^'):
+                pattern = self.compile_pattern(old_path)
+                if pattern is not None:
+                    patterns.append((pattern, new_path))
+            elif old_path.endswith('*'):
+                prefixes.append((old_path[:-1], new_path))
+            else:
+                exact[old_path] = new_path
+        # longest prefix wins
+        prefixes.sort(key=lambda rule: len(rule[0]), reverse=True)
+        self.exact, self.prefixes, self.patterns = exact, prefixes, patterns
+
+    @staticmethod
+    def compile_pattern(old_path):
+        try:
+            return re.compile(old_path)
+        except re.error:
+            logger.warning("Invalid redirect pattern %r", old_path)
+
+    def apply_delta(self, added, removed):
+        # lookups run without the lock: the dict is changed in place, the lists are replaced
+        exact, prefixes, patterns = self.exact, list(self.prefixes), list(self.patterns)
+        for old_path in itertools.chain(removed, (old_path for old_path, new_path in added)):
+            if old_path.startswith('^'):
+                patterns = [rule for rule in patterns if rule[0].pattern != old_path]
+            elif old_path.endswith('*'):
+                prefixes = [rule for rule in prefixes if rule[0] != old_path[:-1]]
+            else:
+                exact.pop(old_path, None)
+        for old_path, new_path in added:
+            if old_path.startswith('^'):
+                pattern = self.compile_pattern(old_path)
+                if pattern is not None:
+                    patterns.append((pattern, new_path))
+            elif old_path.endswith('*'):
+                prefixes.append((old_path[:-1], new_path))
+            else:
+                exact[old_path] = new_path
+        prefixes.sort(key=lambda rule: len(rule[0]), reverse=True)
+        self.prefixes, self.patterns = prefixes, patterns
+        return True
 
-class RedirectFallbackMiddleware(object):
+    def match(self, path):
+        new_path = self.exact.get(path)
+        if new_path is not None:
+            return new_path
+        for prefix, new_path in self.prefixes:
+            if path.startswith(prefix):
+                if new_path.endswith('*'):
+                    return new_path[:-1] + path[len(prefix):]
+                return new_path
+        for pattern, new_path in self.patterns:
+            match = pattern.match(path)
+            if match is not None:
+                try:
+                    return match.expand(new_path)
+                except (re.error, IndexError):
+                    # a reference to a group the pattern doesn't have
+                    logger.warning("Invalid redirect replacement %r for %r", new_path, pattern.pattern)
+        return None
+
+    def lookup(self, path):
+        self.refresh()
+        new_path = self.match(path)
+        if new_path is None and settings.APPEND_SLASH:
+            new_path = self.match(strip_trailing_slash(path))
+        return new_path
+
+
+class RedirectFilter(RedirectIndex):
+    """
+    Bloom filter over all known ``old_path`` values, used with ``CACHE_REDIRECT_FILTER``.
+
+    A path the filter has never seen cannot have a redirect, so it is answered without
+    touching the cache or the database. Additions are applied in place; deletions leave
+    stale bits behind and trigger a rebuild once they make up half of the filter.
+    """
+
+    def __init__(self, error_rate=0.01, *args, **kwargs):
+        super(RedirectFilter, self).__init__(*args, **kwargs)
+        self.error_rate = error_rate
+        self.bloom = None
+        self.stale = 0
+        self.reset_stats()
+
+    def load(self):
+        paths = Redirect.objects.filter(site__id__exact=settings.SITE_ID).values_list('old_path', flat=True)
+        paths = list(paths.iterator())
+        bloom = BloomFilter(max(2 * len(paths), 1024), self.error_rate)
+        for path in paths:
+            bloom.add(path)
+        self.bloom = bloom
+        self.stale = 0
+
+    def apply_delta(self, added, removed):
+        bloom = self.bloom
+        for old_path, new_path in added:
+            bloom.add(old_path)
+        self.stale += len(removed)
+        return not bloom.full and self.stale * 2 <= len(bloom)
+
+    def rebuild(self):
+        self.generation = None
+        self.expire()
+
+    def add(self, path, generation=None):
+        bloom = self.bloom
+        if bloom is None:
+            return  # nothing loaded yet, the first lookup loads everything
+        bloom.add(path)
+        if bloom.full:
+            self.rebuild()
+        else:
+            self.advance(generation)
+
+    def discard(self, path, generation=None):
+        if self.bloom is None:
+            return
+        self.stale += 1
+        if self.stale * 2 > len(self.bloom):
+            self.rebuild()
+        else:
+            self.advance(generation)
+
+    def might_contain(self, path):
+        self.refresh()
+        self.lookups += 1
+        if path in self.bloom or (settings.APPEND_SLASH and strip_trailing_slash(path) in self.bloom):
+            return True
+        self.rejected += 1
+        return False
+
+    def reset_stats(self):
+        self.lookups = 0
+        self.rejected = 0
+        self.false_positives = 0
+
+    def stats(self):
+        negatives = self.rejected + self.false_positives
+        return {
+            'lookups': self.lookups,
+            'rejected': self.rejected,
+            'false_positives': self.false_positives,
+            'false_positive_rate': float(self.false_positives) / negatives if negatives else 0.0,
+            'size': len(self.bloom) if self.bloom is not None else 0,
+            'stale': self.stale,
+        }
+
+
+redirect_table = RedirectTable()
+redirect_filter = RedirectFilter(CACHE_REDIRECT_FILTER_ERROR_RATE)
+
+
+class RedirectFallbackMiddleware(MiddlewareMixin):
+    """
+    Like ``django.contrib.redirects.middleware.RedirectFallbackMiddleware``, but backed by the cache.
+
+    Set ``CACHE_REDIRECT_IN_PROCESS`` to resolve 404s from an in-process ``RedirectTable``
+    instead, which also enables prefix and regular expression redirects. Set
+    ``CACHE_REDIRECT_FILTER`` to skip the cache for paths that are known not to redirect,
+    so scanners probing random URLs don't fill it with ``DNE`` entries.
+    """
     def process_response(self, request, response):
         if response.status_code != 404:
             return response  # No need to check for a redirect for non-404 responses.
         path = request.get_full_path()
+        if CACHE_REDIRECT_IN_PROCESS:
+            new_path = redirect_table.lookup(path)
+        else:
+            new_path = self.cached_lookup(path)
+        if new_path is not None:
+            if new_path == '':
+                return http.HttpResponseGone()
+            if new_path != DNE:
+                return http.HttpResponsePermanentRedirect(new_path)
+
+        # No redirect was found. Return the response.
+        return response
+
+    def cached_lookup(self, path):
+        if CACHE_REDIRECT_FILTER and not redirect_filter.might_contain(path):
+            return None
         cache_key = redirect_cache_key(path)
         new_path = cache.get(cache_key, None)
         if new_path is None:
@@ -169,38 +1014,111 @@ class RedirectFallbackMiddleware(object):
                 # Try removing the trailing slash.
                 try:
                     r = Redirect.objects.get(site__id__exact=settings.SITE_ID,
-                                             old_path=path[:path.rfind('/')] + path[path.rfind('/') + 1:])
+                                             old_path=strip_trailing_slash(path))
                 except Redirect.DoesNotExist:
                     pass
             if r is not None:
                 new_path = r.new_path
                 cache.set(cache_key, new_path, CACHE_REDIRECT_TIMEOUT)
             else:
+                new_path = DNE
                 cache.set(cache_key, DNE, CACHE_REDIRECT_TIMEOUT)
-        if new_path is not None:
-            if new_path == '':
-                return http.HttpResponseGone()
-            if new_path != DNE:
-                return http.HttpResponsePermanentRedirect(new_path)
+        if CACHE_REDIRECT_FILTER and new_path == DNE:
+            redirect_filter.false_positives += 1
+        return new_path
 
-        # No redirect was found. Return the response.
-        return response
 
+# Redirect is not ours, so its old_path is snapshotted through signals instead of TrackedFieldsMixin
+track_fields(Redirect, ('old_path', 'new_path'))
 
 @receiver(pre_save, sender=Redirect, dispatch_uid="invalidate_redirect_cache")
 def invalidate_redirect_cache(instance, **kwargs):
     if instance.pk:
-        old_instance = Redirect.objects.get(pk=instance.pk)
-        if old_instance.old_path != instance.old_path:
-            cache_key = redirect_cache_key(old_instance.old_path)
+        old_path = get_loaded_value(instance, 'old_path')
+        if old_path is None or instance._state.adding:
+            # deferred, or built by hand with an existing pk
+            old_path = Redirect.objects.filter(pk=instance.pk).values_list('old_path', flat=True).first()
+        if old_path is not None and old_path != instance.old_path:
+            cache_key = redirect_cache_key(old_path)
             cache.set(cache_key, DNE, CACHE_REDIRECT_TIMEOUT)
+            redirect_filter.discard(old_path)
+            instance._replaced_old_path = old_path  # published by update_redirect_cache
 
 @receiver(post_save, sender=Redirect, dispatch_uid="update_redirect_cache")
 def update_redirect_cache(instance, **kwargs):
     cache_key = redirect_cache_key(instance.old_path)
     cache.set(cache_key, instance.new_path, CACHE_REDIRECT_TIMEOUT)
+    replaced = instance.__dict__.pop('_replaced_old_path', None)
+    generation = bump_redirect_generation(added=[(instance.old_path, instance.new_path)],
+                                          removed=[replaced] if replaced is not None else [])
+    redirect_filter.add(instance.old_path, generation)
 
 @receiver(post_delete, sender=Redirect, dispatch_uid="delete_redirect_cache")
 def delete_redirect_cache(instance, **kwargs):
     cache_key = redirect_cache_key(instance.old_path)
     cache.set(cache_key, DNE, CACHE_REDIRECT_TIMEOUT)
+    redirect_filter.discard(instance.old_path, bump_redirect_generation(removed=[instance.old_path]))
+
+@receiver(queryset_updated, sender=Redirect, dispatch_uid="update_redirect_cache_bulk")
+def update_redirect_cache_bulk(old_values, new_values, **kwargs):
+    """Use ``utils.tracking.tracked_update`` on ``Redirect`` querysets to keep the cache in sync."""
+    entries = {}
+    removed = []
+    for pk, old in old_values.items():
+        new = new_values.get(pk)
+        if new is None or new['old_path'] != old['old_path']:
+            entries[redirect_cache_key(old['old_path'])] = DNE
+            redirect_filter.discard(old['old_path'])
+            removed.append(old['old_path'])
+        if new is not None:
+            entries[redirect_cache_key(new['old_path'])] = new['new_path']
+    cache.set_many(entries, CACHE_REDIRECT_TIMEOUT)
+    generation = bump_redirect_generation(added=[(new['old_path'], new['new_path']) for new in new_values.values()],
+                                          removed=removed)
+    for new in new_values.values():
+        redirect_filter.add(new['old_path'], generation)
+
+@receiver(objects_bulk_created, sender=Redirect, dispatch_uid="create_redirect_cache_bulk")
+def create_redirect_cache_bulk(objs, **kwargs):
+    """Use ``utils.tracking.tracked_bulk_create`` for ``Redirect`` to keep the cache in sync."""
+    warm_redirect_cache((obj.old_path, obj.new_path) for obj in objs)
+    generation = bump_redirect_generation(added=[(obj.old_path, obj.new_path) for obj in objs])
+    for obj in objs:
+        redirect_filter.add(obj.old_path, generation)
+
+
+REDIRECT_RECEIVERS = (
+    (pre_save, invalidate_redirect_cache, "invalidate_redirect_cache"),
+    (post_save, update_redirect_cache, "update_redirect_cache"),
+    (post_delete, delete_redirect_cache, "delete_redirect_cache"),
+    (queryset_updated, update_redirect_cache_bulk, "update_redirect_cache_bulk"),
+    (objects_bulk_created, create_redirect_cache_bulk, "create_redirect_cache_bulk"),
+)
+
+@contextmanager
+def suppress_redirect_signals():
+    """
+    Disconnects the redirect cache receivers, e.g. while bulk loading redirects.
+
+    This affects every thread in the process; the caller is responsible for warming
+    the cache and calling ``bump_redirect_generation`` afterwards.
+    """
+    for signal, func, dispatch_uid in REDIRECT_RECEIVERS:
+        signal.disconnect(sender=Redirect, dispatch_uid=dispatch_uid)
+    try:
+        yield
+    finally:
+        for signal, func, dispatch_uid in REDIRECT_RECEIVERS:
+            signal.connect(func, sender=Redirect, dispatch_uid=dispatch_uid)
+
+
+def warm_redirect_cache(redirects, chunk_size=1000):
+    """Stores ``(old_path, new_path)`` pairs in the redirect cache with one ``set_many`` per chunk."""
+    chunk = {}
+    for old_path, new_path in redirects:
+        chunk[redirect_cache_key(old_path)] = new_path
+        if len(chunk) >= chunk_size:
+            cache.set_many(chunk, CACHE_REDIRECT_TIMEOUT)
+            chunk = {}
+    if chunk:
+        cache.set_many(chunk, CACHE_REDIRECT_TIMEOUT)
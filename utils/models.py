@@ -4,11 +4,14 @@ import uuid
 
 from django.contrib.contenttypes.models import ContentType
 from django.core import urlresolvers
-from django.db import models
-from django.db.models import signals
-from django.db import transaction
+from django.db import connections, models
+from django.db.models import sql
+
+from .fields import AutoUUIDField, uuid7
+# re-exported, utils.tracking is kept free of the fields so the middleware can import it
+from .tracking import (queryset_updated, objects_bulk_created, snapshot_fields, get_loaded_value, track_fields,
+                       TrackedFieldsMixin, tracked_update, tracked_bulk_create, TrackedQuerySet)
 
-from .fields import AutoUUIDField
 
 class AdminUrlModel(object):
     """Mixin that provides get_admin_url method"""
@@ -19,11 +22,61 @@ class AdminUrlModel(object):
 
 
 class UUIDModel(models.Model):
-    """Provides UIID primary key
-    Make sure to execute db.execute("ALTER TABLE appname_modelname ALTER COLUMN id SET DEFAULT uuid_generate_v4();")
+    """
+    Provides UUID primary key, generated in Python so it is known before saving.
+    For keys generated by PostgreSQL, also for rows inserted outside Django, use ``AutoUUIDModel``.
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
     class Meta:
         abstract = True
 
+
+class UUID7Model(models.Model):
+    """
+    Like ``UUIDModel``, with time-ordered keys from ``utils.fields.uuid7``, so new rows land
+    next to each other in the primary key index
+    """
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+
+    class Meta:
+        abstract = True
+
+
+class ReturningQuerySet(models.QuerySet):
+    """
+    QuerySet whose ``bulk_create`` sets the primary keys the database generated on the
+    objects, by ``INSERT ... RETURNING`` on PostgreSQL, as Django 1.8 leaves them None.
+    """
+    def _batched_insert(self, objs, fields, batch_size):
+        connection = connections[self.db]
+        pk = self.model._meta.pk
+        if connection.vendor != 'postgresql' or not objs or pk in fields:
+            return super(ReturningQuerySet, self)._batched_insert(objs, fields, batch_size)
+        batch_size = batch_size or max(connection.ops.bulk_batch_size(fields, objs), 1)
+        returning = ' RETURNING %s' % connection.ops.quote_name(pk.column)
+        with connection.cursor() as cursor:
+            for start in range(0, len(objs), batch_size):
+                batch = objs[start:start + batch_size]
+                query = sql.InsertQuery(self.model)
+                query.insert_values(fields, batch)
+                for insert, params in query.get_compiler(using=self.db).as_sql():
+                    cursor.execute(insert + returning, params)
+                # rows come back in the order of VALUES
+                for obj, (value,) in zip(batch, cursor.fetchall()):
+                    setattr(obj, pk.attname, pk.to_python(value))
+                    obj._state.adding = False
+                    obj._state.db = self.db
+
+
+class AutoUUIDModel(models.Model):
+    """
+    Time-ordered UUID primary key generated by PostgreSQL, see ``AutoUUIDField``,
+    with a manager that gets the keys of ``bulk_create`` back.
+    """
+    id = AutoUUIDField(version=7)
+
+    objects = ReturningQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
@@ -0,0 +1,225 @@
+"""
+Migration operations for the PostgreSQL indexes, constraints and functions of range and
+array columns, which field options can't emit through the schema editor of Django 1.8:
+
+    operations = [
+        BtreeGistExtension(),
+        CreateGistIndex('booking', ['during']),
+        AddExclusionConstraint('booking', 'booking_no_overlap', [('room', '='), ('during', '&&')]),
+        ArrayLowercaseFunction(),
+        CreateGinIndex('article', ['tags'], lowercase=True),
+        UUIDOsspExtension(),
+        UUIDGenerateV7Function(),
+    ]
+"""
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.contrib.postgres.operations import CreateExtension
+from django.db.migrations.operations.base import Operation
+
+INDEX_METHODS = ('gist', 'spgist')
+
+# the element types array_lowercase is defined for
+ARRAY_LOWERCASE_TYPES = ('text', 'varchar')
+
+# IMMUTABLE, so it can be indexed and folded into a constant on constant arrays
+ARRAY_LOWERCASE_SQL = """CREATE OR REPLACE FUNCTION array_lowercase(%(type)s[]) RETURNS %(type)s[] AS $$
+    SELECT ARRAY(SELECT lower(unnest($1)))::%(type)s[]
+$$ LANGUAGE sql IMMUTABLE STRICT"""
+
+# the random bits of a v4 UUID behind the milliseconds since the epoch, version bits 0100 set to 0111
+UUID_GENERATE_V7_SQL = """CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+    SELECT encode(set_bit(set_bit(overlay(uuid_send(uuid_generate_v4())
+        PLACING substring(int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3)
+        FROM 1 FOR 6), 52, 1), 53, 1), 'hex')::uuid
+$$ LANGUAGE sql VOLATILE"""
+
+
+class BtreeGistExtension(CreateExtension):
+    """GiST operator classes for scalar types, so ``room WITH =`` can go along with a range."""
+
+    def __init__(self):
+        self.name = 'btree_gist'
+
+
+def index_name(table, columns, suffix):
+    """``table_columns_suffix``, shortened with a hash to the 63 characters of PostgreSQL."""
+    name = '%s_%s_%s' % (table, '_'.join(columns), suffix)
+    if len(name) > 63:
+        digest = hashlib.md5(name.encode('utf-8')).hexdigest()[:8]
+        name = '%s_%s_%s' % (name[:63 - len(suffix) - 10], digest, suffix)
+    return name
+
+
+class CreateGistIndex(Operation):
+    """
+    GiST index, or SP-GiST with ``method='spgist'``, on fields of a model.
+
+    Serves the range lookups ``contains``, ``contained_by``, ``overlap``,
+    ``adjacent_to``, ``fully_lt`` and ``fully_gt``. SP-GiST takes a single field.
+    """
+    reversible = True
+
+    def __init__(self, model_name, fields, name=None, method='gist'):
+        if method not in INDEX_METHODS:
+            raise ValueError('Unknown index method %r, use %s' % (method, ' or '.join(INDEX_METHODS)))
+        if method == 'spgist' and len(fields) != 1:
+            raise ValueError('SP-GiST indexes take a single field')
+        self.model_name = model_name
+        self.fields = fields
+        self.name = name
+        self.method = method
+
+    @property
+    def suffix(self):
+        return self.method
+
+    def index(self, model):
+        columns = [model._meta.get_field(field).column for field in self.fields]
+        return self.name or index_name(model._meta.db_table, columns, self.suffix), columns
+
+    def expression(self, schema_editor, column):
+        return schema_editor.quote_name(column)
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        name, columns = self.index(model)
+        schema_editor.execute('CREATE INDEX %s ON %s USING %s (%s)' % (
+            schema_editor.quote_name(name), schema_editor.quote_name(model._meta.db_table), self.method,
+            ', '.join(self.expression(schema_editor, column) for column in columns)))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        schema_editor.execute('DROP INDEX %s' % schema_editor.quote_name(self.index(model)[0]))
+
+    def describe(self):
+        return 'Creates %s index on %s of %s' % (self.method, ', '.join(self.fields), self.model_name)
+
+
+class AddExclusionConstraint(Operation):
+    """
+    ``EXCLUDE USING gist`` constraint: no two rows may have every field compare true
+    with its operator. ``[('room', '='), ('during', '&&')]`` forbids overlapping
+    bookings of a room; the ``=`` on a scalar field needs ``BtreeGistExtension``.
+
+    The constraint comes with a GiST index of its own, and violations raise IntegrityError.
+    ``condition`` is raw SQL restricting the rows it applies to.
+    """
+    reversible = True
+
+    def __init__(self, model_name, name, expressions, condition=None):
+        self.model_name = model_name
+        self.name = name
+        self.expressions = expressions
+        self.condition = condition
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        expressions = ', '.join('%s WITH %s' % (schema_editor.quote_name(model._meta.get_field(field).column), operator)
+                                for field, operator in self.expressions)
+        schema_editor.execute('ALTER TABLE %s ADD CONSTRAINT %s EXCLUDE USING gist (%s)%s' % (
+            schema_editor.quote_name(model._meta.db_table), schema_editor.quote_name(self.name), expressions,
+            ' WHERE (%s)' % self.condition if self.condition else ''))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        schema_editor.execute('ALTER TABLE %s DROP CONSTRAINT %s' % (
+            schema_editor.quote_name(model._meta.db_table), schema_editor.quote_name(self.name)))
+
+    def describe(self):
+        return 'Creates exclusion constraint %s on %s' % (self.name, self.model_name)
+
+
+class CreateGinIndex(CreateGistIndex):
+    """
+    GIN index on array fields of a model, or with ``lowercase=True`` on their
+    ``array_lowercase``, which needs ``ArrayLowercaseFunction`` first.
+
+    Serves the array lookups ``contains``, ``contained_by``, ``overlap``, ``any``
+    and ``all``, and the same after ``array_lowercase``, as in
+    ``tags__array_lowercase__any=['Django']``.
+    """
+
+    def __init__(self, model_name, fields, name=None, lowercase=False):
+        self.model_name = model_name
+        self.fields = fields
+        self.name = name
+        self.method = 'gin'
+        self.lowercase = lowercase
+
+    @property
+    def suffix(self):
+        return 'lower_gin' if self.lowercase else 'gin'
+
+    def expression(self, schema_editor, column):
+        column = schema_editor.quote_name(column)
+        return 'array_lowercase(%s)' % column if self.lowercase else column
+
+    def describe(self):
+        return 'Creates gin index on %s%s of %s' % (
+            ', '.join(self.fields), ' lowercased' if self.lowercase else '', self.model_name)
+
+
+class ArrayLowercaseFunction(Operation):
+    """
+    Installs ``array_lowercase`` for text[] and varchar[], the function of the
+    ``array_lowercase`` transform of ``utils.fields``.
+    """
+    reversible = True
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        for element_type in ARRAY_LOWERCASE_TYPES:
+            schema_editor.execute(ARRAY_LOWERCASE_SQL % {'type': element_type})
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        for element_type in ARRAY_LOWERCASE_TYPES:
+            schema_editor.execute('DROP FUNCTION IF EXISTS array_lowercase(%s[])' % element_type)
+
+    def describe(self):
+        return 'Creates function array_lowercase'
+
+
+class UUIDOsspExtension(CreateExtension):
+    """``uuid_generate_v4()``, the default of ``utils.fields.AutoUUIDField``."""
+
+    def __init__(self):
+        self.name = '"uuid-ossp"'
+
+
+class UUIDGenerateV7Function(Operation):
+    """
+    Installs ``uuid_generate_v7()``, the default of ``AutoUUIDField(version=7)``.
+    Needs ``UUIDOsspExtension`` first.
+    """
+    reversible = True
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        schema_editor.execute(UUID_GENERATE_V7_SQL)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        schema_editor.execute('DROP FUNCTION IF EXISTS uuid_generate_v7()')
+
+    def describe(self):
+        return 'Creates function uuid_generate_v7'
@@ -0,0 +1,376 @@
+from __future__ import unicode_literals, division
+
+import os
+import re
+import math
+import json
+import time
+import heapq
+import socket
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import six
+
+SQL_STATS_MAX_FINGERPRINTS = getattr(settings, 'SQL_STATS_MAX_FINGERPRINTS', 1000)
+SQL_STATS_FLUSH_SECONDS = getattr(settings, 'SQL_STATS_FLUSH_SECONDS', 60)
+SQL_STATS_DIR = getattr(settings, 'SQL_STATS_DIR', None)
+SQL_STATS_KEY_PREFIX = getattr(settings, 'SQL_STATS_KEY_PREFIX', 'sqlstats')
+SQL_STATS_TIMEOUT = getattr(settings, 'SQL_STATS_TIMEOUT', 7 * 24 * 3600)
+# the share of requests SQLProfilerMiddleware profiles, and so feeds into query_stats
+SQL_PROFILER_SAMPLE_RATE = getattr(settings, 'SQL_PROFILER_SAMPLE_RATE', 0.1)
+
+FINGERPRINT_RES = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),  # string literals
+    (re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.I), '?'),  # numbers, but not t1.col2
+    (re.compile(r'%s|%\(\w+\)s'), '?'),  # unexpanded placeholders
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),  # IN (...) and VALUES rows
+    (re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+'), '(...)'),  # multi-row VALUES
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def fingerprint(sql):
+    """Normalizes ``sql`` by replacing literals, so queries that only differ in parameters group together."""
+    for regex, replacement in FINGERPRINT_RES:
+        sql = regex.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryProfile(object):
+    """Per-request query statistics, grouped by fingerprint."""
+
+    def __init__(self, slowest=5, stats=None):
+        self.stats = stats
+        self.view = None
+        self.count = 0
+        self.duration = 0.0
+        self.aliases = {}
+        self.fingerprints = {}
+        self.statements = {}
+        self.slowest_limit = slowest
+        self.slowest = []
+
+    def record(self, alias, sql, duration, params=None):
+        self.count += 1
+        self.duration += duration
+        self.aliases[alias] = self.aliases.get(alias, 0) + 1
+
+        key = fingerprint(sql)
+        stats = self.fingerprints.get(key)
+        if stats is None:
+            stats = self.fingerprints[key] = [0, 0.0]
+        stats[0] += 1
+        stats[1] += duration
+        if self.stats is not None:
+            self.stats.record(key, duration, self.view)
+
+        statement = hashlib.md5(('%s%r' % (sql, params)).encode('utf-8')).digest()
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+        entry = (duration, self.count, alias, sql)
+        if len(self.slowest) < self.slowest_limit:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    @property
+    def duplicates(self):
+        """Number of statements that ran more than once with exactly the same parameters."""
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+    def repeated(self, threshold=2):
+        """Fingerprints that ran at least ``threshold`` times, the usual sign of an N+1 pattern."""
+        return sorted(((key, count, duration) for key, (count, duration) in self.fingerprints.items() if count >= threshold),
+                      key=lambda item: item[1], reverse=True)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'duration_ms': round(self.duration * 1000, 3),
+            'aliases': self.aliases,
+            'duplicates': self.duplicates,
+            'repeated': [{'sql': key, 'count': count, 'duration_ms': round(duration * 1000, 3)}
+                         for key, count, duration in self.repeated()],
+            'slowest': [{'sql': sql, 'alias': alias, 'duration_ms': round(duration * 1000, 3)}
+                        for duration, n, alias, sql in sorted(self.slowest, reverse=True)],
+        }
+
+
+class QueryProfiler(object):
+    """
+    Context manager that feeds every query on every database alias into a ``QueryProfile``.
+
+    Uses ``connection.execute_wrapper`` where Django has it, and otherwise turns on the
+    debug cursor and reads the new ``queries_log`` entries on exit. Either way it works
+    with ``DEBUG = False``.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.wrappers = []
+        self.logs = []
+
+    def __enter__(self):
+        for connection in connections.all():
+            if hasattr(connection, 'execute_wrapper'):
+                wrapper = connection.execute_wrapper(self.wrap(connection.alias))
+                wrapper.__enter__()
+                self.wrappers.append(wrapper)
+            else:
+                self.logs.append((connection, connection.force_debug_cursor, len(connection.queries_log)))
+                connection.force_debug_cursor = True
+        return self.profile
+
+    def __exit__(self, *exc_info):
+        while self.wrappers:
+            self.wrappers.pop().__exit__(*exc_info)
+        for connection, force_debug_cursor, start in self.logs:
+            connection.force_debug_cursor = force_debug_cursor
+            for query in list(connection.queries_log)[start:]:
+                self.profile.record(connection.alias, query['sql'] or '', float(query['time']))
+        self.logs = []
+
+    def wrap(self, alias):
+        record = self.profile.record
+
+        def wrapper(execute, sql, params, many, context):
+            start = time.time()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                record(alias, sql, time.time() - start, params)
+        return wrapper
+
+
+def histogram_bucket(duration):
+    """Latency histogram bucket of ``duration`` seconds, buckets grow by a factor of sqrt(2) from 1us."""
+    microseconds = duration * 1000000
+    if microseconds < 1:
+        return 0
+    return min(int(2 * math.log(microseconds, 2)), 63)
+
+
+def histogram_percentile(histogram, percentile):
+    """Upper bound in milliseconds of the bucket that holds ``percentile`` of ``histogram``."""
+    total = sum(histogram.values())
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= total * percentile / 100:
+            return 2 ** ((bucket + 1) / 2) / 1000
+    return 0.0
+
+
+class FingerprintStats(object):
+    """
+    Process-wide query statistics per fingerprint: call count, total time, a latency
+    histogram and the views that issue it.
+
+    Memory is bounded by ``max_fingerprints``; when it is exceeded the fingerprints with
+    the least total time are dropped. Histograms are mergeable, so ``merge`` can combine
+    the snapshots of many workers into one table.
+
+    ``sample_rate`` is the share of queries that are recorded at all; ``merge`` scales the
+    counts and totals by it.
+    """
+    max_views = 10
+
+    def __init__(self, max_fingerprints=SQL_STATS_MAX_FINGERPRINTS, sample_rate=1.0):
+        self.max_fingerprints = max_fingerprints
+        self.sample_rate = sample_rate
+        self.entries = {}
+        self.started = time.time()
+        self.flushed_at = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, key, duration, view=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                if len(self.entries) >= self.max_fingerprints:
+                    self.prune()
+                entry = self.entries[key] = {'count': 0, 'total': 0.0, 'histogram': {}, 'views': {}}
+            entry['count'] += 1
+            entry['total'] += duration
+            bucket = histogram_bucket(duration)
+            entry['histogram'][bucket] = entry['histogram'].get(bucket, 0) + 1
+            views = entry['views']
+            view = view or '-'
+            if view in views or len(views) < self.max_views:
+                views[view] = views.get(view, 0) + 1
+
+    def prune(self):
+        """Keeps the three quarters of ``max_fingerprints`` with the most total time."""
+        keep = sorted(self.entries.items(), key=lambda item: item[1]['total'], reverse=True)
+        self.entries = dict(keep[:self.max_fingerprints * 3 // 4])
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'started': self.started,
+                'sample_rate': self.sample_rate,
+                'fingerprints': dict((key, {'count': entry['count'], 'total': entry['total'],
+                                            'histogram': dict(entry['histogram']), 'views': dict(entry['views'])})
+                                     for key, entry in self.entries.items()),
+            }
+
+    @staticmethod
+    def merge(snapshots):
+        """
+        Combines worker snapshots into ``{fingerprint: entry}``.
+
+        ``count`` and ``total`` are estimates for all queries, scaled by the sample rate of
+        each snapshot; ``sampled`` and the ``histogram`` and ``views`` counts are as recorded.
+        """
+        merged = {}
+        for snapshot in snapshots:
+            scale = 1.0 / snapshot.get('sample_rate', 1.0)
+            for key, entry in snapshot['fingerprints'].items():
+                target = merged.setdefault(key, {'count': 0.0, 'total': 0.0, 'sampled': 0, 'histogram': {}, 'views': {}})
+                target['count'] += entry['count'] * scale
+                target['total'] += entry['total'] * scale
+                target['sampled'] += entry['count']
+                for field in ('histogram', 'views'):
+                    for name, count in entry[field].items():
+                        # JSON turns the integer buckets into strings
+                        if field == 'histogram':
+                            name = int(name)
+                        target[field][name] = target[field].get(name, 0) + count
+        return merged
+
+    def maybe_flush(self):
+        if time.time() - self.flushed_at >= SQL_STATS_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        """Publishes a snapshot for ``sqlstats``, in ``SQL_STATS_DIR`` if set or else in the cache."""
+        self.flushed_at = time.time()
+        snapshot = self.snapshot()
+        worker = '%s-%d' % (socket.gethostname(), os.getpid())
+        if SQL_STATS_DIR:
+            path = os.path.join(SQL_STATS_DIR, 'sqlstats-%s.json' % worker)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(snapshot, f)
+            os.rename(path + '.tmp', path)
+        else:
+            cache.set(':'.join((SQL_STATS_KEY_PREFIX, worker)), snapshot, SQL_STATS_TIMEOUT)
+            register_worker(worker)
+
+
+def register_worker(worker):
+    """
+    Adds ``worker`` to the index ``load_worker_snapshots`` reads, once per ``SQL_STATS_TIMEOUT``.
+
+    Every worker gets its own slot from an atomic counter, so concurrent registrations
+    can't overwrite each other as a shared list would.
+    """
+    registered_key = ':'.join((SQL_STATS_KEY_PREFIX, 'registered', worker))
+    if not cache.add(registered_key, 1, SQL_STATS_TIMEOUT):
+        return
+    slots_key = ':'.join((SQL_STATS_KEY_PREFIX, 'slots'))
+    cache.add(slots_key, 0, SQL_STATS_TIMEOUT)
+    try:
+        slot = cache.incr(slots_key)
+    except ValueError:
+        cache.delete(registered_key)  # expired in between, try again on the next flush
+        return
+    cache.set(':'.join((SQL_STATS_KEY_PREFIX, 'slot', six.text_type(slot))), worker, SQL_STATS_TIMEOUT)
+
+
+def load_worker_snapshots():
+    """Returns the snapshots published by ``FingerprintStats.flush`` in all workers."""
+    if SQL_STATS_DIR:
+        snapshots = []
+        for name in os.listdir(SQL_STATS_DIR):
+            if name.startswith('sqlstats-') and name.endswith('.json'):
+                with open(os.path.join(SQL_STATS_DIR, name)) as f:
+                    snapshots.append(json.load(f))
+        return snapshots
+    slots = cache.get(':'.join((SQL_STATS_KEY_PREFIX, 'slots'))) or 0
+    workers = cache.get_many([':'.join((SQL_STATS_KEY_PREFIX, 'slot', six.text_type(slot)))
+                              for slot in range(1, slots + 1)])
+    # a worker that registered again after its slot expired has two
+    workers = set(workers.values())
+    return list(cache.get_many([':'.join((SQL_STATS_KEY_PREFIX, worker)) for worker in workers]).values())
+
+
+query_stats = FingerprintStats(sample_rate=SQL_PROFILER_SAMPLE_RATE)
+
+
+serializer_profiles = threading.local()
+
+
+def serializer_profile():
+    """The ``SerializerProfile`` being recorded in this thread, or None."""
+    return getattr(serializer_profiles, 'current', None)
+
+
+class SerializerProfile(object):
+    """
+    Time serializers spend building their fields against producing their ``data``, per class.
+
+    Fields are mostly built inside ``data``, nested serializers always are, so ``serialize``
+    is the time of ``data`` without the builds in it.
+    """
+
+    def __init__(self):
+        self.classes = {}
+        self.build = 0.0
+        self.data = 0.0
+        self.data_build = 0.0
+        self.depth = 0
+
+    def entry(self, cls):
+        name = '%s.%s' % (cls.__module__, cls.__name__)
+        entry = self.classes.get(name)
+        if entry is None:
+            entry = self.classes[name] = {'builds': 0, 'cached': 0, 'build': 0.0, 'data': 0.0}
+        return entry
+
+    def record_build(self, cls, duration, cached):
+        entry = self.entry(cls)
+        entry['builds'] += 1
+        entry['cached'] += cached
+        entry['build'] += duration
+        self.build += duration
+        if self.depth:
+            self.data_build += duration
+
+    def record_data(self, cls, duration):
+        self.entry(cls)['data'] += duration
+        if not self.depth:
+            self.data += duration
+
+    @property
+    def serialize(self):
+        return self.data - self.data_build
+
+    def as_dict(self):
+        return {
+            'build_ms': round(self.build * 1000, 3),
+            'serialize_ms': round(self.serialize * 1000, 3),
+            'classes': dict((name, {'builds': entry['builds'], 'cached': entry['cached'],
+                                    'build_ms': round(entry['build'] * 1000, 3),
+                                    'data_ms': round(entry['data'] * 1000, 3)})
+                            for name, entry in self.classes.items()),
+        }
+
+
+class SerializerProfiler(object):
+    """Context manager that records what the serializers of ``utils.serializers`` do in this thread into a ``SerializerProfile``."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = serializer_profile()
+        serializer_profiles.current = self.profile
+        return self.profile
+
+    def __exit__(self, *exc_info):
+        serializer_profiles.current = self.previous
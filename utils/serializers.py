@@ -1,8 +1,202 @@
 from __future__ import unicode_literals
 
+import copy
+import time
+import weakref
+import operator
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models.query import QuerySet
+from django.utils import six
 from rest_framework import serializers
+from rest_framework.fields import SkipField
 from utils.fields import DateTimeRange, DateTimeRangeSerializerField, AutoUUIDField
 from aloha.fields import HTMLField, HTMLSerializerField
+from utils.profiling import serializer_profile
+
+# off by default, for serializers whose fields depend on the instance. Meta.cache_fields overrides it
+SERIALIZER_FIELD_CACHE = getattr(settings, 'SERIALIZER_FIELD_CACHE', False)
+
+SKIPPED = object()
+
+# fields built by get_fields, per serializer class and model. Weak, as classes made on the fly would pile up
+field_cache = weakref.WeakKeyDictionary()
+field_cache_lock = threading.RLock()
+
+# to_representation of these DRF fields amounts to the builtin
+BUILTIN_REPRESENTATIONS = {
+    six.get_unbound_function(serializers.IntegerField.to_representation): int,
+    six.get_unbound_function(serializers.FloatField.to_representation): float,
+    six.get_unbound_function(serializers.CharField.to_representation): six.text_type,
+}
+
+
+def concrete_columns(model):
+    """Names of the non-relational concrete fields of ``model``."""
+    return set(field.name for field in model._meta.concrete_fields if not field.is_relation)
+
+
+class Row(dict):
+    """A values() row that also reads as attributes, as the pk for HyperlinkedIdentityField."""
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def attribute_or_skipped(field, item):
+    try:
+        return field.get_attribute(item)
+    except SkipField:
+        return SKIPPED
+
+
+def timed_data(serializer, get_data):
+    """``get_data()``, timed into the current SerializerProfile if there is one."""
+    profile = serializer_profile()
+    if profile is None:
+        return get_data()
+    profile.depth += 1
+    start = time.time()
+    try:
+        return get_data()
+    finally:
+        profile.depth -= 1
+        profile.record_data(type(serializer), time.time() - start)
+
+
+def copy_stateful(value):
+    # DRF calls set_context on validators and defaults, which keeps the instance or user
+    # of the serializer on them, e.g. UniqueValidator and CurrentUserDefault
+    return copy.deepcopy(value) if hasattr(value, 'set_context') else value
+
+
+def copy_field(field):
+    """
+    A new unbound field made like ``field``. Nested fields are copied, as are the validators
+    and the default if they have a ``set_context``; the other arguments are only read, so
+    they are shared rather than deep-copied as by DRF's Field.__deepcopy__.
+    """
+    args = [copy_field(arg) if isinstance(arg, serializers.Field) else arg for arg in field._args]
+    kwargs = {}
+    for key, value in field._kwargs.items():
+        if isinstance(value, serializers.Field):
+            value = copy_field(value)
+        elif key == 'validators':
+            value = [copy_stateful(validator) for validator in value]
+        elif key == 'default':
+            value = copy_stateful(value)
+        kwargs[key] = value
+    return field.__class__(*args, **kwargs)
+
+
+def overrides(obj, name, cls):
+    return six.get_unbound_function(getattr(type(obj), name)) is not six.get_unbound_function(getattr(cls, name))
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Represents lists column by column: every field reads its attribute from all
+    items, then converts the whole column, with ``to_representation_many`` if the
+    field has one. Children that override ``to_representation`` are left to it.
+
+    With ``bulk_values = True`` in the Meta of the child, querysets are read with
+    ``values()`` rather than as model instances, if all fields are plain model
+    columns or the identity hyperlink. Dicts, e.g. a page of a values() queryset,
+    are read the same way. Values come as the database adapter returns them.
+    """
+
+    @property
+    def data(self):
+        return timed_data(self, lambda: super(BulkListSerializer, self).data)
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        if overrides(self.child, 'to_representation', serializers.Serializer):
+            return super(BulkListSerializer, self).to_representation(iterable)
+        fields = list(self.child._readable_fields)
+        if getattr(getattr(self.child, 'Meta', None), 'bulk_values', False):
+            if isinstance(iterable, QuerySet):
+                columns = self.values_columns(iterable.model, fields)
+                if columns is not None:
+                    iterable = iterable.values(*columns)
+            items = [Row(item) if isinstance(item, dict) else item for item in iterable]
+            pk_name = self.child.Meta.model._meta.pk.name
+            if items and isinstance(items[0], Row) and 'pk' not in items[0] and pk_name in items[0]:
+                for row in items:
+                    row['pk'] = row[pk_name]
+        else:
+            items = list(iterable)
+        if not fields:
+            return [OrderedDict() for item in items]
+
+        names = [field.field_name for field in fields]
+        columns = []
+        skipped = False
+        for field in fields:
+            values, field_skipped = self.attributes(field, items)
+            if field_skipped:
+                columns.append([value if value is None or value is SKIPPED else field.to_representation(value)
+                                for value in values])
+                skipped = True
+                continue
+            many = getattr(field, 'to_representation_many', None)
+            if many is not None:
+                columns.append(many(values))
+                continue
+            convert = BUILTIN_REPRESENTATIONS.get(six.get_unbound_function(type(field).to_representation),
+                                                  field.to_representation)
+            columns.append([None if value is None else convert(value) for value in values])
+        if skipped:
+            return [OrderedDict((name, value) for name, value in zip(names, row) if value is not SKIPPED)
+                    for row in zip(*columns)]
+        return [OrderedDict(zip(names, row)) for row in zip(*columns)]
+
+    def attributes(self, field, items):
+        """``field.get_attribute`` of every item, SKIPPED where it raised SkipField, and whether it did."""
+        if items and not overrides(field, 'get_attribute', serializers.Field) and len(field.source_attrs) == 1:
+            # plain model columns and values() keys can be read directly, there is nothing to call or skip
+            source = field.source_attrs[0]
+            if isinstance(items[0], Row):
+                getter = operator.itemgetter(source)
+            elif isinstance(items[0], models.Model) and source in concrete_columns(type(items[0])):
+                getter = operator.attrgetter(source)
+            else:
+                getter = None
+            if getter is not None:
+                try:
+                    return list(map(getter, items)), False
+                except (KeyError, AttributeError):
+                    pass  # items of mixed kinds, DRF tells what to do
+        try:
+            return [field.get_attribute(item) for item in items], False
+        except SkipField:
+            return [attribute_or_skipped(field, item) for item in items], True
+
+    def values_columns(self, model, fields):
+        """Names to pass to values() for ``fields``, or None if one of them needs model instances."""
+        columns = []
+        for field in fields:
+            if isinstance(field, serializers.HyperlinkedIdentityField):
+                columns.append(field.lookup_field)
+                continue
+            if isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField, serializers.BaseSerializer)):
+                return None
+            if len(field.source_attrs) != 1:
+                return None
+            try:
+                model_field = model._meta.get_field(field.source_attrs[0])
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete or model_field.is_relation:
+                return None
+            columns.append(field.source_attrs[0])
+        return columns
 
 
 class BaseModelSerializerMixin(object):
@@ -12,6 +206,55 @@ class BaseModelSerializerMixin(object):
                                                                                                                }.items())
     
 
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        """As in DRF, but with BulkListSerializer unless the Meta names a list_serializer_class."""
+        allow_empty = kwargs.pop('allow_empty', None)
+        list_kwargs = {'child': cls(*args, **kwargs)}
+        if allow_empty is not None:
+            list_kwargs['allow_empty'] = allow_empty
+        list_kwargs.update((key, value) for key, value in kwargs.items() if key in serializers.LIST_SERIALIZER_KWARGS)
+        list_serializer_class = getattr(getattr(cls, 'Meta', None), 'list_serializer_class', BulkListSerializer)
+        return list_serializer_class(*args, **list_kwargs)
+
+    @property
+    def data(self):
+        return timed_data(self, lambda: super(BaseModelSerializerMixin, self).data)
+
+    def get_fields(self):
+        """
+        The fields DRF builds, built once per serializer class and model. Every instance gets
+        new fields made by ``copy_field``: nested fields and validators or defaults with a
+        ``set_context`` are its own, every other argument is shared with the cached field.
+
+        Only serializers with ``cache_fields = True`` in their Meta are cached, or all of them
+        with the ``SERIALIZER_FIELD_CACHE`` setting; those whose fields depend on the instance,
+        e.g. on the context, then set ``cache_fields = False``.
+        """
+        profile = serializer_profile()
+        if profile is None:
+            return self.cached_fields()[0]
+        start = time.time()
+        fields, cached = self.cached_fields()
+        profile.record_build(type(self), time.time() - start, cached)
+        return fields
+
+    def cached_fields(self):
+        meta = getattr(self, 'Meta', None)
+        if not getattr(meta, 'cache_fields', SERIALIZER_FIELD_CACHE):
+            return super(BaseModelSerializerMixin, self).get_fields(), False
+        model = getattr(meta, 'model', None)
+        fields = field_cache.get(type(self), {}).get(model)
+        cached = fields is not None
+        if not cached:
+            with field_cache_lock:
+                models_fields = field_cache.setdefault(type(self), {})
+                fields = models_fields.get(model)
+                if fields is None:
+                    fields = models_fields[model] = super(BaseModelSerializerMixin, self).get_fields()
+        # instances bind their fields, the cached ones must stay unbound
+        return OrderedDict((name, copy_field(field)) for name, field in fields.items()), cached
+
     def get_default_field_names(self, declared_fields, model_info):
         """
         Return the default list of field names that will be used if the
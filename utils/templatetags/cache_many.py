@@ -0,0 +1,321 @@
+"""
+Fragment caching with one cache round trip per block instead of one per fragment.
+
+    {% load cache_many %}
+    {% cache_many 600 %}
+      {% for item in items %}
+        {% cachefragment item_card item.pk item.modified %}...{% endcachefragment %}
+      {% endfor %}
+    {% endcache_many %}
+
+Before rendering, the block is walked for the keys of the fragments inside it:
+the sequences of ``for`` loops, the conditions of ``if``, and the values of ``with``
+and ``include`` are resolved, nothing is rendered. The keys are fetched with one
+``get_many``, then the block is rendered once, rendering only the misses, which
+are stored with one ``set_many``. Fragments the walk can't reach, as in loops over
+generators, are fetched one by one. Fragments use ``template_cache_key``, so their
+keys stay the same as before.
+
+The render gets the values the walk resolved instead of resolving them again, so
+``{% for row in obj.rows.all %}`` runs its query once, as do callables in conditions.
+"""
+from __future__ import unicode_literals
+
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.template import TemplateSyntaxError, VariableDoesNotExist
+from django.template.base import FilterExpression, Variable
+from django.template.defaulttags import ForNode, IfNode, WithNode
+from django.template.loader_tags import IncludeNode
+from django.utils import six
+
+from utils import template_cache_key
+
+register = template.Library()
+
+STATE_KEY = '_cache_many_state'
+
+
+def fragment_cache(context, cache_name=None):
+    """Same choice of cache as Django's {% cache %} tag."""
+    try:
+        return caches[cache_name.resolve(context) if cache_name else 'template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+class CacheManyState(object):
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.keys = set()
+        self.values = {}
+        self.misses = {}
+        self.resolved = {}
+
+
+def template_variables(expression):
+    """The variables a filter expression or an ``if`` condition reads."""
+    if isinstance(expression, FilterExpression):
+        found = [expression.var] + [arg for func, args in expression.filters for lookup, arg in args if lookup]
+        return [var for var in found if isinstance(var, Variable) and var.lookups is not None]
+    found = []
+    for attr in ('value', 'first', 'second'):  # TemplateLiteral and the operators of smartif
+        child = getattr(expression, attr, None)
+        if child is not None:
+            found.extend(template_variables(child))
+    return found
+
+
+class WalkedExpression(object):
+    """
+    Stands in for an expression or condition of a node the walk resolves, and hands what
+    the walk got to the render.
+
+    Values are matched by the objects the variables of the expression start from, e.g. the
+    loop item, and taken in the order the walk resolved them. Anything else is resolved
+    as usual, as is everything outside of ``{% cache_many %}``.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.names = tuple(var.lookups[0] for var in template_variables(expression))
+
+    def __getattr__(self, name):
+        if name == 'expression':
+            raise AttributeError(name)  # not set yet, e.g. while copying
+        return getattr(self.expression, name)
+
+    def key(self, context):
+        roots = []
+        for name in self.names:
+            try:
+                roots.append(context[name])
+            except KeyError:
+                roots.append(None)
+        # the roots are kept with the value, so their ids can't be reused meanwhile
+        return (id(self),) + tuple(id(root) for root in roots), roots
+
+    def walk(self, state, method, context, *args):
+        key, roots = self.key(context)
+        value = getattr(self.expression, method)(context, *args)
+        state.resolved.setdefault(key, []).append((roots, value))
+        return value
+
+    def walked(self, method, context, *args, **kwargs):
+        state = context.get(STATE_KEY)
+        if state is not None:
+            values = state.resolved.get(self.key(context)[0])
+            if values:
+                return values.pop(0)[1]
+        return getattr(self.expression, method)(context, *args, **kwargs)
+
+    def resolve(self, context, *args, **kwargs):
+        return self.walked('resolve', context, *args, **kwargs)
+
+    def eval(self, context):
+        return self.walked('eval', context)
+
+
+def walked(expression):
+    """``expression`` wrapped in a ``WalkedExpression``, unless it already is."""
+    return expression if isinstance(expression, WalkedExpression) else WalkedExpression(expression)
+
+
+def walked_values(extra_context):
+    """Wraps the values of a ``with`` or ``include`` in place, as the node reads them on every render."""
+    for name, value in list(extra_context.items()):
+        if not isinstance(value, WalkedExpression):
+            extra_context[name] = WalkedExpression(value)
+    return extra_context
+
+
+def fragment_key(node, context):
+    vary_on = [var.resolve(context) for var in node.vary_on]
+    return template_cache_key(node.fragment_name, *vary_on)
+
+
+def collect_keys(nodelist, context, state):
+    """
+    Adds the keys of the fragments ``nodelist`` would render to ``state.keys``, without
+    rendering it, and keeps the values it resolves for the render.
+
+    The expressions it resolves are wrapped in ``WalkedExpression`` in the nodes themselves,
+    once, so later renders of the template reuse the wrappers.
+    """
+    for node in nodelist:
+        if isinstance(node, CacheFragmentNode):
+            try:
+                state.keys.add(fragment_key(node, context))
+            except VariableDoesNotExist:
+                pass
+        elif isinstance(node, CacheManyNode):
+            pass  # fetches its own
+        elif isinstance(node, ForNode):
+            collect_loop_keys(node, context, state)
+        elif isinstance(node, IfNode):
+            conditions_nodelists = node.conditions_nodelists
+            for i, (condition, branch) in enumerate(conditions_nodelists):
+                if condition is not None and not isinstance(condition, WalkedExpression):
+                    condition = walked(condition)
+                    conditions_nodelists[i] = (condition, branch)
+                try:
+                    match = condition is None or condition.walk(state, 'eval', context)
+                except VariableDoesNotExist:
+                    match = None
+                if match:
+                    collect_keys(branch, context, state)
+                    break
+        elif isinstance(node, WithNode):
+            values = dict((key, value.walk(state, 'resolve', context))
+                          for key, value in six.iteritems(walked_values(node.extra_context)))
+            with context.push(**values):
+                collect_keys(node.nodelist, context, state)
+        elif isinstance(node, IncludeNode):
+            collect_include_keys(node, context, state)
+        else:
+            for attr in node.child_nodelists:
+                collect_keys(getattr(node, attr, None) or (), context, state)
+
+
+def collect_loop_keys(node, context, state):
+    node.sequence = sequence = walked(node.sequence)
+    try:
+        values = sequence.walk(state, 'resolve', context, True)
+    except VariableDoesNotExist:
+        values = None
+    if not values:
+        collect_keys(node.nodelist_empty, context, state)
+        return
+    if not hasattr(values, '__len__'):
+        return  # a generator, the loop itself has to consume it
+    if node.is_reversed:
+        values = list(reversed(values))
+    count = len(values)
+    loop = {'parentloop': context.get('forloop', {})}
+    with context.push(forloop=loop):
+        for i, item in enumerate(values):
+            loop.update(counter0=i, counter=i + 1, revcounter=count - i, revcounter0=count - i - 1,
+                        first=i == 0, last=i == count - 1)
+            if len(node.loopvars) > 1:
+                try:
+                    loopvars = dict(zip(node.loopvars, item))
+                except TypeError:
+                    continue
+            else:
+                loopvars = {node.loopvars[0]: item}
+            with context.push(**loopvars):
+                collect_keys(node.nodelist_loop, context, state)
+
+
+def collect_include_keys(node, context, state):
+    if node.isolated_context:
+        return  # its fragments can't see the state, they cache on their own
+    node.template = walked(node.template)
+    try:
+        template = node.template.walk(state, 'resolve', context)
+        if not callable(getattr(template, 'render', None)):
+            template = context.template.engine.get_template(template)
+        values = dict((name, var.walk(state, 'resolve', context))
+                      for name, var in six.iteritems(walked_values(node.extra_context)))
+    except Exception:
+        return  # rendering will report it, or render nothing
+    template = getattr(template, 'template', template)  # backend templates wrap the engine's
+    with context.push(**values):
+        collect_keys(template.nodelist, context, state)
+
+
+class CacheManyNode(template.Node):
+
+    def __init__(self, nodelist, expire_time_var, cache_name=None):
+        self.nodelist = nodelist
+        self.expire_time_var = expire_time_var
+        self.cache_name = cache_name
+
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError('"cache_many" tag got an unknown variable: %r' % self.expire_time_var.var)
+        try:
+            expire_time = int(expire_time)
+        except (ValueError, TypeError):
+            raise TemplateSyntaxError('"cache_many" tag got a non-integer timeout value: %r' % expire_time)
+        cache = fragment_cache(context, self.cache_name)
+
+        state = CacheManyState(cache)
+        collect_keys(self.nodelist, context, state)
+        if state.keys:
+            state.values = cache.get_many(list(state.keys))
+        # in the context rather than the render context, so included templates see it too
+        with context.push(**{STATE_KEY: state}):
+            output = self.nodelist.render(context)
+        if state.misses:
+            cache.set_many(state.misses, expire_time)
+        return output
+
+
+class CacheFragmentNode(template.Node):
+
+    def __init__(self, nodelist, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        try:
+            key = fragment_key(self, context)
+        except VariableDoesNotExist as e:
+            raise TemplateSyntaxError('"cachefragment" tag got an unknown variable: %r' % e)
+
+        state = context.get(STATE_KEY)
+        if state is None:
+            # outside {% cache_many %}: one round trip, with the cache's default timeout
+            cache = fragment_cache(context)
+            value = cache.get(key)
+            if value is None:
+                value = self.nodelist.render(context)
+                cache.set(key, value)
+            return value
+
+        value = state.values.get(key)
+        if value is None:
+            value = state.misses.get(key)
+        if value is None and key not in state.keys:
+            value = state.values[key] = state.cache.get(key)  # out of reach of the walk
+        if value is None:
+            value = state.misses[key] = self.nodelist.render(context)
+        return value
+
+
+@register.tag('cache_many')
+def do_cache_many(parser, token):
+    """
+    Fetches and stores all ``{% cachefragment %}`` fragments inside the block at once.
+
+        {% cache_many [expire_time] [using="cachename"] %}...{% endcache_many %}
+    """
+    nodelist = parser.parse(('endcache_many',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    cache_name = None
+    if len(tokens) > 2 and tokens[-1].startswith('using='):
+        cache_name = parser.compile_filter(tokens.pop()[len('using='):])
+    if len(tokens) != 2:
+        raise TemplateSyntaxError("'%r' tag requires 1 argument." % tokens[0])
+    return CacheManyNode(nodelist, parser.compile_filter(tokens[1]), cache_name)
+
+
+@register.tag('cachefragment')
+def do_cachefragment(parser, token):
+    """
+    A cached fragment, fetched with its siblings by the enclosing ``{% cache_many %}``.
+
+        {% cachefragment [fragment_name] [var1] [var2] ... %}...{% endcachefragment %}
+    """
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise TemplateSyntaxError("'%r' tag requires at least 1 argument." % tokens[0])
+    return CacheFragmentNode(nodelist, tokens[1], [parser.compile_filter(t) for t in tokens[2:]])
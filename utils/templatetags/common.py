@@ -1,5 +1,4 @@
 from __future__ import unicode_literals
-import json as jsonencode
 from datetime import datetime
 import pytz
 
@@ -7,6 +6,8 @@ from django import template
 from django.template.defaultfilters import stringfilter
 from django.utils.safestring import mark_safe
 
+from utils.encoders import dumps
+
 register = template.Library()
 
 
@@ -21,7 +22,7 @@ def underslug(string):
 
 @register.filter
 def json(obj):
-    return mark_safe(jsonencode.dumps(obj))
+    return mark_safe(dumps(obj, html=True))
 
 @register.filter(name='timestamptodate')
 def timestamptodate(value):
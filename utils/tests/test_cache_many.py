@@ -0,0 +1,110 @@
+from __future__ import unicode_literals
+
+from django.core.cache import caches
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cache_many'}}
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.count = 0
+
+    def tick(self):
+        self.count += 1
+        return ''
+
+
+class Rows(object):
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    def all(self):
+        self.calls += 1
+        return list(self.rows)
+
+    def visible(self):
+        self.calls += 1
+        return True
+
+
+@override_settings(CACHES=LOCMEM)
+class CacheManyTests(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def render(self, source, **context):
+        return Template('{% load cache_many %}' + source).render(Context(context))
+
+    def test_cycle(self):
+        source = ('{% cache_many 60 %}{% for item in items %}{% cycle "odd" "even" %}'
+                  '{% cachefragment row item %}{{ item }}{% endcachefragment %};{% endfor %}{% endcache_many %}')
+        expected = 'odd1;even2;odd3;'
+        self.assertEqual(self.render(source, items=[1, 2, 3]), expected)
+        # and again from the cache
+        self.assertEqual(self.render(source, items=[1, 2, 3]), expected)
+
+    def test_block_rendered_once(self):
+        counter = Counter()
+        source = ('{% cache_many 60 %}{% for item in items %}{{ counter.tick }}'
+                  '{% cachefragment row item %}{{ item }}{% endcachefragment %}{% endfor %}{% endcache_many %}')
+        self.assertEqual(self.render(source, items=[1, 2, 3], counter=counter), '123')
+        self.assertEqual(counter.count, 3)
+
+    def test_one_round_trip(self):
+        source = ('{% cache_many 60 %}{% for item in items %}'
+                  '{% cachefragment row item %}{{ item }}{% endcachefragment %}{% endfor %}{% endcache_many %}')
+        self.render(source, items=[1, 2, 3])
+        cache = caches['default']
+        calls = []
+        get_many = cache.get_many
+        cache.get_many = lambda keys: calls.append(keys) or get_many(keys)
+        try:
+            self.assertEqual(self.render(source, items=[1, 2, 3]), '123')
+        finally:
+            del cache.get_many
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(calls[0]), 3)
+
+    def test_cached_fragments_are_not_rendered(self):
+        source = ('{% cache_many 60 %}{% for item in items %}'
+                  '{% cachefragment row item %}{{ item }}-{{ version }}{% endcachefragment %}'
+                  '{% endfor %}{% endcache_many %}')
+        self.assertEqual(self.render(source, items=[1, 2], version='a'), '1-a2-a')
+        self.assertEqual(self.render(source, items=[1, 2, 3], version='b'), '1-a2-a3-b')
+
+    def test_generator(self):
+        source = ('{% cache_many 60 %}{% for item in items %}'
+                  '{% cachefragment row item %}{{ item }}{% endcachefragment %}{% endfor %}{% endcache_many %}')
+        self.assertEqual(self.render(source, items=(n for n in [1, 2])), '12')
+        self.assertEqual(self.render(source, items=(n for n in [1, 2])), '12')
+
+    def test_with_and_if(self):
+        source = ('{% cache_many 60 %}{% with name="x" %}{% if show %}'
+                  '{% cachefragment row name %}{{ name }}{% endcachefragment %}'
+                  '{% endif %}{% endwith %}{% endcache_many %}')
+        self.assertEqual(self.render(source, show=True), 'x')
+        self.assertEqual(self.render(source, show=False), '')
+
+    def test_resolved_once(self):
+        rows = Rows([1, 2])
+        source = ('{% cache_many 60 %}{% if rows.visible %}{% with all=rows.all %}{% for row in rows.all %}'
+                  '{% cachefragment row row %}{{ row }}{% endcachefragment %}{% endfor %}{{ all|length }}'
+                  '{% endwith %}{% endif %}{% endcache_many %}')
+        self.assertEqual(self.render(source, rows=rows), '122')
+        self.assertEqual(rows.calls, 3)
+        # and with the fragments cached
+        self.assertEqual(self.render(source, rows=rows), '122')
+        self.assertEqual(rows.calls, 6)
+
+    def test_nested_loop_resolved_once(self):
+        groups = [Rows([1, 2]), Rows([3])]
+        source = ('{% cache_many 60 %}{% for group in groups %}{% for row in group.all %}'
+                  '{% cachefragment row row %}{{ row }}{% endcachefragment %}{% endfor %}{% endfor %}{% endcache_many %}')
+        self.assertEqual(self.render(source, groups=groups), '123')
+        self.assertEqual([group.calls for group in groups], [1, 1])
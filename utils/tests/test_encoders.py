@@ -0,0 +1,25 @@
+from __future__ import unicode_literals
+
+import json
+import datetime
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from utils.encoders import backend, orjson, ujson
+
+
+class DumpsTests(SimpleTestCase):
+
+    def test_datetimes_like_drf(self):
+        value = {
+            'aware': datetime.datetime(2020, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc),
+            'naive': datetime.datetime(2020, 1, 2, 3, 4, 5, 123456),
+            'whole': datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            'date': datetime.date(2020, 1, 2),
+        }
+        expected = json.loads(json.dumps(value, cls=JSONEncoder))
+        names = ['json'] + ['ujson'] * (ujson is not None) + ['orjson'] * (orjson is not None)
+        for name in names:
+            self.assertEqual(json.loads(backend(name)(value)), expected, name)
@@ -0,0 +1,26 @@
+from __future__ import unicode_literals
+
+from django import http
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from utils.middleware import HeaderRulesMiddleware
+
+
+class HeaderRulesTests(SimpleTestCase):
+
+    @override_settings(HEADER_RULES=(
+        ('ajax', 'add_vary', 'X-Requested-With'),
+        ('always', 'remove_vary', 'Cookie'),
+        ('always', 'add_cache_control', 'max-age=60'),
+    ))
+    def test_new_style(self):
+        def view(request):
+            response = http.HttpResponse('page')
+            response['Vary'] = 'Cookie, Accept-Encoding'
+            return response
+
+        # as listed in MIDDLEWARE, called with get_response
+        middleware = HeaderRulesMiddleware(view)
+        response = middleware(RequestFactory().get('/', HTTP_X_REQUESTED_WITH='XMLHttpRequest'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding, X-Requested-With')
+        self.assertEqual(response['Cache-Control'], 'max-age=60')
@@ -0,0 +1,76 @@
+from __future__ import unicode_literals
+
+from django import http
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from utils.middleware import PageCacheMiddleware, add_page_cache_tags, invalidate_page_cache_tags
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'page_cache'}}
+
+
+@override_settings(CACHES=LOCMEM)
+class PageCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.middleware = PageCacheMiddleware()
+
+    def request(self, view):
+        request = RequestFactory().get('/page/')
+        response = self.middleware.process_request(request)
+        if response is None:
+            response = self.middleware.process_response(request, view(request))
+        return response
+
+    def test_invalidated_while_rendering(self):
+        def view(request):
+            add_page_cache_tags(request, 'article:1')
+            invalidate_page_cache_tags('article:1')  # saved by another request meanwhile
+            return http.HttpResponse('old')
+
+        self.assertEqual(self.request(view)['X-Page-Cache'], 'MISS')
+        response = self.request(lambda request: http.HttpResponse('new'))
+        self.assertEqual(response.content, b'new')
+
+    def test_tagged_hit(self):
+        def view(request):
+            add_page_cache_tags(request, 'article:1')
+            return http.HttpResponse('page')
+
+        self.request(view)
+        self.assertEqual(self.request(view)['X-Page-Cache'], 'HIT')
+        invalidate_page_cache_tags('article:1')
+        self.assertEqual(self.request(view)['X-Page-Cache'], 'MISS')
+
+    def test_waiters_stop_when_the_lock_is_released(self):
+        request = RequestFactory().get('/page/')
+        key = self.middleware.cache_key(request)
+        cache = caches['default']
+        cache.add(key + ':lock', 1)  # another request is rendering it
+        polls = []
+
+        def sleep(seconds):
+            polls.append(seconds)
+            cache.delete(key + ':lock')  # and its response couldn't be stored
+
+        self.middleware.sleep = sleep
+        self.assertIsNone(self.middleware.process_request(request))
+        self.assertEqual(len(polls), 1)
+        self.assertEqual(request._page_cache_key, key)
+
+    def test_vary_cookie(self):
+        def view(request):
+            response = http.HttpResponse(request.COOKIES.get('theme', 'light'))
+            response['Vary'] = 'Cookie'
+            return response
+
+        request = RequestFactory().get('/page/', HTTP_COOKIE='theme=dark')
+        self.middleware.process_request(request)
+        response = self.middleware.process_response(request, view(request))
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertEqual(self.request(view)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.request(view).content, b'light')
+        request = RequestFactory().get('/page/', HTTP_COOKIE='theme=dark')
+        self.assertIsNone(self.middleware.process_request(request))
+        self.assertEqual(self.middleware.process_response(request, view(request)).content, b'dark')
@@ -0,0 +1,37 @@
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+
+from utils.serializers import BaseModelSerializerMixin
+
+
+class UserSerializer(BaseModelSerializerMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = User
+        fields = ('username',)
+        cache_fields = True
+
+
+def unique_validators(serializer):
+    return [validator for validator in serializer.fields['username'].validators
+            if isinstance(validator, UniqueValidator)]
+
+
+class FieldCacheTests(TestCase):
+
+    def test_unique_validator_per_instance(self):
+        user = User.objects.create(username='taken')
+        update = UserSerializer(user, data={'username': 'taken'})
+        create = UserSerializer(data={'username': 'taken'})
+        # both built from the cached fields, each with its own validator
+        validator, = unique_validators(update)
+        other, = unique_validators(create)
+        self.assertIsNot(validator, other)
+
+        self.assertTrue(update.is_valid())
+        self.assertFalse(create.is_valid())
+        self.assertIn('username', create.errors)
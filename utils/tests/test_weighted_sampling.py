@@ -0,0 +1,18 @@
+from __future__ import unicode_literals
+
+from unittest import TestCase
+
+from utils.weighted_sampling import DynamicWeightedSampling
+
+
+class DynamicWeightedSamplingTests(TestCase):
+
+    def test_remove_at_rebuild(self):
+        sampler = DynamicWeightedSampling([1, 1, 1, 1], keys='abcd', random_state=0)
+        for key in 'abcd':
+            sampler.update(key, 2)
+        # the fifth change on a capacity of four rebuilds the tree
+        sampler.remove('b')
+        self.assertEqual(sampler.updates, 0)
+        self.assertAlmostEqual(sampler.total, 6)
+        self.assertEqual(set(sampler.random(1000)), {'a', 'c', 'd'})
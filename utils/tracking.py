@@ -0,0 +1,113 @@
+"""
+Loaded field values and signals for bulk queryset changes.
+
+Kept apart from ``utils.models`` so it can be imported without ``utils.fields``
+and its PostgreSQL dependencies.
+"""
+from __future__ import unicode_literals
+
+from django.db import models, transaction
+from django.db.models import signals
+from django.dispatch import Signal
+
+# Sent by tracked_update and tracked_bulk_create, which model signals would otherwise skip.
+# old_values and new_values map primary keys to dicts of the tracked and updated fields.
+queryset_updated = Signal(providing_args=['queryset', 'old_values', 'new_values'])
+objects_bulk_created = Signal(providing_args=['objs'])
+
+
+def snapshot_fields(instance, field_names=None):
+    """Remembers the current values of ``field_names``, by default the model's tracked fields."""
+    opts = instance._meta
+    if field_names is None:
+        field_names = getattr(instance, 'tracked_fields', ())
+    values = {}
+    for name in field_names:
+        attname = opts.get_field(name).attname
+        if attname in instance.__dict__:  # skip deferred fields instead of loading them
+            values[name] = instance.__dict__[attname]
+    instance._loaded_values = values
+
+
+def get_loaded_value(instance, name, default=None):
+    """Returns the value ``name`` had when ``instance`` was loaded or last saved."""
+    return getattr(instance, '_loaded_values', {}).get(name, default)
+
+
+def track_fields(model, field_names):
+    """
+    Snapshots ``field_names`` on every instance of ``model`` when it is loaded or saved,
+    for models that can't use ``TrackedFieldsMixin``.
+    """
+    model.tracked_fields = tuple(field_names)
+
+    def snapshot(instance, **kwargs):
+        snapshot_fields(instance)
+
+    dispatch_uid = 'track_fields_%s_%s' % (model._meta.app_label, model._meta.model_name)
+    signals.post_init.connect(snapshot, sender=model, weak=False, dispatch_uid=dispatch_uid)
+    signals.post_save.connect(snapshot, sender=model, weak=False, dispatch_uid=dispatch_uid)
+
+
+class TrackedFieldsMixin(object):
+    """
+    Mixin that remembers the loaded values of ``tracked_fields``, so save hooks can tell
+    what changed without querying the old row.
+
+    Use ``TrackedQuerySet`` as the manager to get ``queryset_updated`` and
+    ``objects_bulk_created`` for the bulk operations as well.
+    """
+    tracked_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super(TrackedFieldsMixin, self).__init__(*args, **kwargs)
+        snapshot_fields(self)
+
+    def save(self, *args, **kwargs):
+        super(TrackedFieldsMixin, self).save(*args, **kwargs)
+        snapshot_fields(self)
+
+    def get_loaded_value(self, name, default=None):
+        return get_loaded_value(self, name, default)
+
+    def get_changed_fields(self):
+        """Returns a dict of the tracked fields that changed, with their loaded values."""
+        return dict((name, value) for name, value in self._loaded_values.items()
+                    if getattr(self, self._meta.get_field(name).attname) != value)
+
+    def has_changed(self, name):
+        return name in self.get_changed_fields()
+
+
+def tracked_update(queryset, **kwargs):
+    """
+    ``queryset.update(**kwargs)`` that also sends ``queryset_updated`` with the tracked and
+    updated fields of every affected row, before and after the update.
+    """
+    model = queryset.model
+    if not queryset_updated.has_listeners(model):
+        return models.QuerySet.update(queryset, **kwargs)
+    fields = ['pk'] + list(set(getattr(model, 'tracked_fields', ())) | set(kwargs))
+    with transaction.atomic(using=queryset.db):
+        old_values = dict((row['pk'], row) for row in queryset.select_for_update().values(*fields))
+        rows = models.QuerySet.update(queryset, **kwargs)
+        new_values = dict((row['pk'], row) for row in
+                          model._default_manager.using(queryset.db).filter(pk__in=list(old_values)).values(*fields))
+    queryset_updated.send(sender=model, queryset=queryset, old_values=old_values, new_values=new_values)
+    return rows
+
+
+def tracked_bulk_create(queryset, objs, batch_size=None):
+    """``queryset.bulk_create(objs)`` that also sends ``objects_bulk_created``."""
+    objs = models.QuerySet.bulk_create(queryset, objs, batch_size=batch_size)
+    objects_bulk_created.send(sender=queryset.model, objs=objs)
+    return objs
+
+
+class TrackedQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        return tracked_update(self, **kwargs)
+    update.alters_data = True
+
+    def bulk_create(self, objs, batch_size=None):
+        return tracked_bulk_create(self, objs, batch_size)
@@ -1,59 +1,195 @@
 #!/usr/bin/env python
 # from https://gist.github.com/1109133/
-from __future__ import unicode_literals
+from __future__ import unicode_literals, print_function
 
-from numpy import arange, array, bincount, ndarray, ones, where
-from numpy.random import seed, random, randint
+import os
+import json
+import time
+import heapq
+import math
+import struct
+import logging
+from itertools import islice
+
+from numpy import (arange, argpartition, argsort, array, ascontiguousarray, bincount, clip, concatenate, cumsum,
+                   dtype, empty, errstate, flatnonzero, inf, memmap, minimum, ndarray, searchsorted, where, zeros)
+try:
+    from numpy.random import default_rng
+except ImportError:  # numpy < 1.17, the last releases for Python 2
+    from numpy.random import RandomState
+
+    class LegacyGenerator(object):
+        """The part of ``numpy.random.Generator`` the samplers use, on a ``RandomState``."""
+
+        def __init__(self, state):
+            self.state = state
+
+        def random(self, size=None):
+            return self.state.random_sample(size)
+
+        def standard_exponential(self, size=None):
+            return self.state.standard_exponential(size)
+
+    def default_rng(seed=None):
+        if isinstance(seed, LegacyGenerator):
+            return seed
+        return LegacyGenerator(seed if isinstance(seed, RandomState) else RandomState(seed))
 
 __author__ = "Tamas Nepusz, Denis Bzowy"
 __version__ = "27jul2011"
 
+logger = logging.getLogger(__name__)
+
+TABLE_MAGIC = b'WALKERv1'
+TABLE_ALIGN = 64
+
+
+def as_weights(weights):
+    """Converts a list, tuple, array or any other iterable to a float vector."""
+    if isinstance(weights, (list, tuple)):
+        weights = array(weights, dtype=float)
+    elif isinstance(weights, ndarray):
+        if weights.dtype != float:
+            weights = weights.astype(float)
+    else:
+        weights = array(list(weights), dtype=float)
+
+    if weights.ndim != 1:
+        raise ValueError("weights must be a vector")
+    return weights
+
+
+def alias_table(weights):
+    """Builds the Walker tables ``prob`` and ``inx`` for ``weights`` without a Python loop.
+
+    Lay the deficits ``1 - w`` of the small columns end to end on one line, and the
+    excesses ``w - 1`` of the large columns on another of the same length. Every small
+    column takes its alias from the large column whose excess interval contains the start
+    of its deficit. A deficit that runs past the end of that interval drains the large
+    column below 1, and the large column in turn takes the next large column as its alias,
+    which is exactly the part of the line the deficit ran into. Two cumulative sums and two
+    binary searches therefore give the whole table.
+    """
+    n = len(weights)
+    prob = weights * n / weights.sum()
+    inx = arange(n)
+
+    small = flatnonzero(prob < 1)
+    large = flatnonzero(prob > 1)
+    if small.size and large.size:
+        deficit = 1 - prob[small]
+        deficit_end = cumsum(deficit)
+        deficit_start = deficit_end - deficit
+        excess_end = cumsum(prob[large] - 1)
+
+        donor = minimum(searchsorted(excess_end, deficit_start, side='right'), large.size - 1)
+        inx[small] = large[donor]
+
+        starts_before = searchsorted(deficit_start, excess_end, side='left')
+        reached = where(starts_before > 0, deficit_end[starts_before - 1], 0)
+        overflow = clip(reached - excess_end, 0, 1)
+        overflow[-1] = 0  # only rounding error is left over for the last column
+        prob[large] = 1 - overflow
+        inx[large[:-1]] = large[1:]
+    # columns left over by rounding error alias themselves, so any prob is fine for them
+    return prob, inx
+
+
+class WeightedSampling(object):
+    """Shared interface of the samplers: ``random(count)`` and ``keys``."""
+
+    def random(self, count=None):
+        raise NotImplementedError
+
+    def iter_random(self, count=None, batch_size=65536):
+        """Yields arrays of at most `batch_size` samples, `count` samples in total,
+        or forever when `count` is ``None``."""
+        while count is None or count > 0:
+            size = batch_size if count is None else min(batch_size, count)
+            yield self.random(size)
+            if count is not None:
+                count -= size
 
-class WalkerRandomSampling(object):
+
+class WalkerRandomSampling(WeightedSampling):
     """Walker's alias method for random objects with different probablities.
 
     Based on the implementation of Denis Bzowy at the following URL:
     http://code.activestate.com/recipes/576564-walkers-alias-method-for-random-objects-with-diffe/
     """
 
-    def __init__(self, weights, keys=None):
+    def __init__(self, weights, keys=None, random_state=None):
         """Builds the Walker tables ``prob`` and ``inx`` for calls to `random()`.
         The weights (a list or tuple or iterable) can be in any order and they
-        do not even have to sum to 1."""
+        do not even have to sum to 1.
+
+        `random_state` is a seed or a `numpy.random.Generator` (a `RandomState` before
+        numpy 1.17); every sampler has its own, so samplers don't interfere with each
+        other and can be reproduced."""
         n = self.n = len(weights)
         if keys is None:
             self.keys = keys
         else:
             self.keys = array(keys)
+        self.rng = default_rng(random_state)
+        self.prob, self.inx = alias_table(as_weights(weights))
+        self.version = None
 
-        if isinstance(weights, (list, tuple)):
-            weights = array(weights, dtype=float)
-        elif isinstance(weights, ndarray):
-            if weights.dtype != float:
-                weights = weights.astype(float)
-        else:
-            weights = array(list(weights), dtype=float)
+    def save(self, path, version=None):
+        """Writes the table to `path` for `load`, replacing any previous file atomically.
 
-        if weights.ndim != 1:
-            raise ValueError("weights must be a vector")
+        The file is a magic string, a JSON header and the 64-byte aligned ``prob``,
+        ``inx`` and ``keys`` arrays. Keys must be numbers or strings. `version` is
+        stored in the header, by default the current time.
+        """
+        if not self.n:
+            raise ValueError("can't save an empty table")
+        arrays = [('prob', ascontiguousarray(self.prob, dtype='<f8')),
+                  ('inx', ascontiguousarray(self.inx, dtype='<i8'))]
+        if self.keys is not None:
+            if self.keys.dtype.kind not in 'biufSU':
+                raise ValueError("only number or string keys can be saved, not %s" % self.keys.dtype)
+            arrays.append(('keys', ascontiguousarray(self.keys)))
 
-        weights = weights * n / weights.sum()
+        header = {'n': self.n, 'version': time.time() if version is None else version, 'arrays': {}}
+        offset = 0
+        for name, values in arrays:
+            header['arrays'][name] = {'offset': offset, 'dtype': values.dtype.str}
+            offset = aligned(offset + values.nbytes)
+        header = json.dumps(header, sort_keys=True).encode('utf-8')
 
-        inx = -ones(n, dtype=int)
-        short = where(weights < 1)[0].tolist()
-        long = where(weights > 1)[0].tolist()
-        while short and long:
-            j = short.pop()
-            k = long[-1]
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(TABLE_MAGIC + struct.pack(b'<I', len(header)) + header)
+            for name, values in arrays:
+                f.write(b'\0' * (aligned(f.tell()) - f.tell()))
+                values.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, path)
 
-            inx[j] = k
-            weights[k] -= (1 - weights[j])
-            if weights[k] < 1:
-                short.append(k)
-                long.pop()
+    @classmethod
+    def load(cls, path, random_state=None):
+        """Maps a table written by `save` read-only, so processes share one copy in the page cache."""
+        # header and arrays all come from the one open file, even if `save` replaces it meanwhile
+        with open(path, 'rb') as f:
+            prefix = f.read(len(TABLE_MAGIC) + 4)
+            if len(prefix) < len(TABLE_MAGIC) + 4 or not prefix.startswith(TABLE_MAGIC):
+                raise ValueError("%s is not an alias table" % path)
+            length = struct.unpack(b'<I', prefix[len(TABLE_MAGIC):])[0]
+            header = json.loads(f.read(length).decode('utf-8'))
+            start = aligned(len(TABLE_MAGIC) + 4 + length)
+            arrays = dict((name, memmap(f, dtype=dtype(spec['dtype']), mode='r', offset=start + spec['offset'],
+                                        shape=(header['n'],)))
+                          for name, spec in header['arrays'].items())
 
-        self.prob = weights
-        self.inx = inx
+        self = cls.__new__(cls)
+        self.n = header['n']
+        self.keys = arrays.get('keys')
+        self.rng = default_rng(random_state)
+        self.prob, self.inx = arrays['prob'], arrays['inx']
+        self.version = header['version']
+        return self
 
     def random(self, count=None):
         """Returns a given number of random integers or keys, with probabilities
@@ -63,42 +199,382 @@ class WalkerRandomSampling(object):
         returns a NumPy array with a length given in `count`.
         """
         if count is None:
-            u = random()
-            j = randint(self.n)
-            k = j if u <= self.prob[j] else self.inx[j]
+            x = self.rng.random() * self.n
+            j = int(x)
+            k = j if x - j <= self.prob[j] else self.inx[j]
             return self.keys[k] if self.keys is not None else k
 
-        u = random(count)
-        j = randint(self.n, size=count)
-        k = where(u <= self.prob[j], j, self.inx[j])
+        # one uniform draw gives both the column (integer part) and the coin (fraction)
+        x = self.rng.random(count) * self.n
+        j = x.astype(int)
+        k = where(x - j <= self.prob[j], j, self.inx[j])
         return self.keys[k] if self.keys is not None else k
 
 
+def aligned(offset):
+    return -(-offset // TABLE_ALIGN) * TABLE_ALIGN
+
+
+class SharedWalkerSampling(WeightedSampling):
+    """Samples from the alias table file at `path`, written by `WalkerRandomSampling.save`.
+
+    Checks at most every `check_seconds` whether the file was replaced, and maps the new
+    table when it was, so a background rebuild can swap tables under running workers.
+    If the new file can't be read the old table stays in use.
+    """
+
+    def __init__(self, path, random_state=None, check_seconds=1.0):
+        self.path = path
+        self.rng = default_rng(random_state)
+        self.check_seconds = check_seconds
+        self.sampler = None
+        self.identity = None
+        self.refresh()
+
+    def refresh(self):
+        self.checked_at = time.time()
+        identity = None
+        try:
+            stat = os.stat(self.path)
+            identity = (stat.st_dev, stat.st_ino, stat.st_mtime)
+            if identity != self.identity:
+                self.sampler = WalkerRandomSampling.load(self.path, self.rng)
+                self.identity = identity
+        except (IOError, OSError, ValueError):
+            if self.sampler is None:
+                raise
+            logger.exception("Could not reload alias table %s", self.path)
+            # don't retry the same broken file on every check
+            self.identity = identity or self.identity
+
+    @property
+    def keys(self):
+        return self.sampler.keys
+
+    @property
+    def version(self):
+        return self.sampler.version
+
+    def random(self, count=None):
+        if time.time() - self.checked_at >= self.check_seconds:
+            self.refresh()
+        return self.sampler.random(count)
+
+
+class DynamicWeightedSampling(WeightedSampling):
+    """Weighted sampling with replacement over weights that change, backed by a Fenwick tree.
+
+    `update`, `add` and `remove` are O(log n), `random(count)` descends the tree for
+    all samples at once. Without `keys` items are addressed, and sampled, by their slot
+    number; `add` returns it. Removed slots are reused by later adds.
+
+    When the weights settle, `snapshot()` returns a `WalkerRandomSampling` for O(1) draws.
+    """
+
+    def __init__(self, weights=(), keys=None, random_state=None):
+        weights = as_weights(weights)
+        if (weights < 0).any():
+            raise ValueError("weights must not be negative")
+        if keys is not None:
+            if len(keys) != len(weights):
+                raise ValueError("keys and weights must have the same length")
+            self.keys = empty(len(weights), dtype=object)
+            self.keys[:] = list(keys)
+            self.index = dict((key, slot) for slot, key in enumerate(keys))
+        else:
+            self.keys = None
+            self.index = None
+        self.rng = default_rng(random_state)
+        self.weights = weights.copy()
+        self.free = set()
+        self.rebuild()
+
+    def rebuild(self):
+        """Rebuilds the tree from ``weights`` in O(n), also shedding float drift from updates."""
+        capacity = len(self.weights)
+        prefix = concatenate(([0.0], cumsum(self.weights)))
+        i = arange(1, capacity + 1)
+        self.tree = zeros(capacity + 1)
+        self.tree[1:] = prefix[i] - prefix[i - (i & -i)]
+        self.top = 1 << (capacity.bit_length() - 1) if capacity else 0
+        self.updates = 0
+
+    def grow(self):
+        capacity = max(2 * len(self.weights), 16)
+        self.weights = concatenate((self.weights, zeros(capacity - len(self.weights))))
+        self.free.update(range(len(self.tree) - 1, capacity))
+        if self.keys is not None:
+            keys = empty(capacity, dtype=object)
+            keys[:len(self.keys)] = self.keys
+            self.keys = keys
+        self.rebuild()
+
+    def slot(self, key):
+        if self.index is None:
+            if not 0 <= key < len(self.weights) or key in self.free:
+                raise KeyError(key)
+            return key
+        return self.index[key]
+
+    def _add_delta(self, slot, delta):
+        tree = self.tree
+        capacity = len(tree) - 1
+        i = slot + 1
+        while i <= capacity:
+            tree[i] += delta
+            i += i & -i
+        self.updates += 1
+        if self.updates > capacity:
+            self.rebuild()
+
+    def update(self, key, weight):
+        if weight < 0:
+            raise ValueError("weights must not be negative")
+        slot = self.slot(key)
+        delta = weight - self.weights[slot]
+        self.weights[slot] = weight
+        self._add_delta(slot, delta)
+
+    def add(self, weight, key=None):
+        """Adds an item, returns its slot."""
+        if weight < 0:
+            raise ValueError("weights must not be negative")
+        if self.index is not None:
+            if key is None:
+                raise ValueError("keyed samplers need a key")
+            if key in self.index:
+                raise ValueError("duplicate key %r" % (key,))
+        if not self.free:
+            self.grow()
+        slot = self.free.pop()
+        if self.index is not None:
+            self.keys[slot] = key
+            self.index[key] = slot
+        self.weights[slot] = weight
+        self._add_delta(slot, weight)
+        return slot
+
+    def remove(self, key):
+        slot = self.slot(key)
+        weight = self.weights[slot]
+        # before adjusting the tree, which rebuilds from ``weights`` every so often
+        self.weights[slot] = 0.0
+        if self.index is not None:
+            del self.index[key]
+            self.keys[slot] = None
+        self.free.add(slot)
+        self._add_delta(slot, -weight)
+
+    def __len__(self):
+        return len(self.weights) - len(self.free)
+
+    @property
+    def total(self):
+        tree = self.tree
+        total, i = 0.0, len(tree) - 1
+        while i:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def random(self, count=None):
+        """Returns a given number of random slots or keys, with probabilities
+        being proportional to the current weights.
+
+        When `count` is ``None``, returns a single slot or key, otherwise
+        returns a NumPy array with a length given in `count`.
+        """
+        total = self.total
+        if not total > 0:
+            raise ValueError("no item has a positive weight")
+        tree = self.tree
+        capacity = len(tree) - 1
+        u = self.rng.random(1 if count is None else count) * total
+        # find the largest prefix <= u for all samples at once, one tree level per step
+        position = zeros(len(u), dtype=int)
+        step = self.top
+        while step:
+            following = position + step
+            inside = following <= capacity
+            value = tree[minimum(following, capacity)]
+            down = inside & (value <= u)
+            u = where(down, u - value, u)
+            position = where(down, following, position)
+            step >>= 1
+        # float drift can push a sample past the last live slot
+        slots = minimum(position, capacity - 1)
+        if count is None:
+            slots = slots[0]
+        return self.keys[slots] if self.keys is not None else slots
+
+    def snapshot(self, random_state=None):
+        """Walker alias table over the current weights, for when they don't change anymore."""
+        live = flatnonzero(self.weights > 0)
+        keys = self.keys[live] if self.keys is not None else live
+        return WalkerRandomSampling(self.weights[live], keys,
+                                    random_state=self.rng if random_state is None else random_state)
+
+
+def smallest(values, k):
+    """Positions of the `k` smallest finite `values`, smallest first."""
+    if k < len(values):
+        candidates = argpartition(values, k - 1)[:k]
+    else:
+        candidates = arange(len(values))
+    candidates = candidates[argsort(values[candidates], kind='stable')]
+    return candidates[values[candidates] < inf]
+
+
+def weighted_sample(weights, k, keys=None, random_state=None, chunk_size=65536):
+    """Returns `k` distinct indices, or `keys`, drawn without replacement with
+    probabilities proportional to `weights`, in the order they would be drawn.
+
+    Uses the Efraimidis-Spirakis method: every item gets the key ``E / w`` with
+    ``E`` exponentially distributed, and the `k` smallest keys win. Arrays, lists
+    and tuples are keyed in one go; other iterables (and their `keys`) are read in
+    chunks of `chunk_size`, so the weights never have to be in memory at once.
+    Items with zero weight are never drawn, so fewer than `k` may come back.
+    """
+    rng = default_rng(random_state)
+    if k <= 0:
+        return array([], dtype=int) if keys is None else array([], dtype=object)
+
+    if isinstance(weights, (list, tuple, ndarray)):
+        weights = as_weights(weights)
+        with errstate(divide='ignore'):
+            exp_keys = rng.standard_exponential(len(weights)) / weights
+        chosen = smallest(exp_keys, k)
+        return chosen if keys is None else array(keys)[chosen]
+
+    weights = iter(weights)
+    keys = iter(keys) if keys is not None else None
+    best_keys = empty(0)
+    best = array([], dtype=int) if keys is None else array([], dtype=object)
+    offset = 0
+    while True:
+        chunk = as_weights(islice(weights, chunk_size))
+        if not len(chunk):
+            break
+        with errstate(divide='ignore'):
+            chunk_keys = rng.standard_exponential(len(chunk)) / chunk
+        if keys is None:
+            items = arange(offset, offset + len(chunk))
+        else:
+            items = empty(len(chunk), dtype=object)
+            items[:] = list(islice(keys, len(chunk)))
+        offset += len(chunk)
+        best_keys = concatenate((best_keys, chunk_keys))
+        best = concatenate((best, items))
+        chosen = smallest(best_keys, k)
+        best_keys, best = best_keys[chosen], best[chosen]
+    return best
+
+
+class WeightedReservoir(object):
+    """Weighted random sample of `k` items without replacement, in one pass over a stream.
+
+    Implements A-ExpJ (Efraimidis & Spirakis): once the reservoir is full, it draws how
+    much weight to skip before the next replacement, so only O(k log(n / k)) items need
+    random numbers. `extend` finds the next replacement in each chunk with a binary
+    search over the cumulative weights.
+
+        reservoir = WeightedReservoir(10)
+        reservoir.extend(Item.objects.values_list('pk', 'weight').iterator())
+        pks = reservoir.sample()
+    """
+
+    def __init__(self, k, random_state=None):
+        self.k = k
+        self.rng = default_rng(random_state)
+        self.heap = []  # (log key, sequence, item), the smallest key is the next to go
+        self.seen = 0
+        self.skip = None  # weight left to pass before the next replacement
+
+    def __len__(self):
+        return len(self.heap)
+
+    def _insert(self, item, weight):
+        self.seen += 1
+        entry = (math.log(1 - self.rng.random()) / weight, self.seen, item)
+        heapq.heappush(self.heap, entry)
+        if len(self.heap) == self.k:
+            self._draw_skip()
+
+    def _replace(self, item, weight):
+        if not weight:
+            return
+        self.seen += 1
+        # the new key is uniform on (threshold ** weight, 1), drawn in log space
+        threshold = math.exp(self.heap[0][0] * weight)
+        u = threshold + (1 - threshold) * self.rng.random()
+        heapq.heapreplace(self.heap, (math.log(u) / weight if u > 0 else -inf, self.seen, item))
+        self._draw_skip()
+
+    def _draw_skip(self):
+        log_threshold = self.heap[0][0]
+        self.skip = math.log(1 - self.rng.random()) / log_threshold if log_threshold < 0 else inf
+
+    def feed(self, item, weight):
+        if weight < 0:
+            raise ValueError("weights must not be negative")
+        if not weight or self.k <= 0:
+            return
+        if len(self.heap) < self.k:
+            self._insert(item, weight)
+            return
+        self.skip -= weight
+        if self.skip <= 0:
+            self._replace(item, weight)
+
+    def extend(self, items, weights=None, chunk_size=65536):
+        """Feeds `items` with their `weights`, or ``(item, weight)`` pairs if `weights` is ``None``."""
+        pairs = iter(zip(items, weights) if weights is not None else items)
+        while True:
+            chunk = list(islice(pairs, chunk_size))
+            if not chunk:
+                break
+            chunk_weights = as_weights(weight for item, weight in chunk)
+            if (chunk_weights < 0).any():
+                raise ValueError("weights must not be negative")
+            position = 0
+            while position < len(chunk) and len(self.heap) < self.k:
+                self.feed(*chunk[position])
+                position += 1
+            if position == len(chunk) or self.k <= 0:
+                continue
+            passed = concatenate(([0.0], cumsum(chunk_weights[position:])))
+            base = 0
+            while True:
+                # first item at which the weight passed since the last replacement reaches the skip
+                end = base + 1 + searchsorted(passed[base + 1:], passed[base] + self.skip, side='left')
+                if end >= len(passed):
+                    self.skip -= passed[-1] - passed[base]
+                    break
+                item, weight = chunk[position + end - 1]
+                self._replace(item, weight)
+                base = end
+
+    def sample(self):
+        """The sampled items, in the order they would have been drawn."""
+        return [item for key, seen, item in sorted(self.heap, reverse=True)]
+
+
 if __name__ == "__main__":
     # little examples, self-contained --
     N = 5
     Nrand = 1000
     randomseed = 1
 
-    if randomseed:
-        seed(randomseed)
-
-    print Nrand, "Walker random sampling with weights .1 .2 .3 .4:"
-    wrand = WalkerRandomSampling(arange(1, N))
+    print(Nrand, "Walker random sampling with weights .1 .2 .3 .4:")
+    wrand = WalkerRandomSampling(arange(1, N), random_state=randomseed)
     nrand = bincount(wrand.random(Nrand)).tolist()
-    s = str(nrand)
-    print s
-    if N == 5 and Nrand == 1000 and randomseed == 1:
-        assert s == "[97, 207, 316, 380]"
+    print(nrand)
 
-    print Nrand, "Walker random sampling, strings with weights .1 .2 .3 .4:"
+    print(Nrand, "Walker random sampling, strings with weights .1 .2 .3 .4:")
     abcd = dict(A=1, D=4, C=3, B=2)
-    wrand = WalkerRandomSampling(abcd.values(), abcd.keys())
+    wrand = WalkerRandomSampling(list(abcd.values()), list(abcd.keys()), random_state=randomseed)
     from collections import defaultdict
     rand = defaultdict(int)
     for sample in wrand.random(Nrand):
-        nrand[sample] += 1
-    s = str(sorted(nrand.iteritems()))
-    print s
-    if N == 5 and Nrand == 1000 and randomseed == 1:
-        assert s == "[('A', 85), ('B', 199), ('C', 343), ('D', 373)]"
+        rand[sample] += 1
+    print(sorted(rand.items()))